@@ -10,7 +10,11 @@ setup(
     author='Shunsuke KITADA',
     url='https://github.com/shunk031/ted-scraper',
     keywords='TED Talks, TED, scraper, scraping',
+    packages=['ted_talks'],
     install_requires=['beautifulsoup4', 'lxml'],
+    entry_points={
+        'console_scripts': ['ted-scraper = ted_talks.cli:main'],
+    },
     license='http://www.apache.org/licenses/LICENSE-2.0',
     test_suite='tests.test_scraper'
 )
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import email.message
+import glob
+import os
+import threading
+import uuid
+import zlib
+
+from collections import namedtuple
+from urllib.error import HTTPError
+
+from ted_talks.session import Response
+
+
+# a response stored in an archive
+ArchiveRecord = namedtuple("ArchiveRecord", ["url", "status", "headers", "body", "date"])
+
+# headers describing the transfer, not the decoded body stored in the archive
+_TRANSFER_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+
+class ArchiveWriter:
+    """
+    Writer of fetched responses to a WARC-style archive.
+
+    Each response is a WARC/1.0 "response" record holding the URL, the fetch
+    time and the HTTP status line, headers and decoded body, compressed as
+    its own gzip member like a .warc.gz file, so the archive stays readable
+    up to the last complete record. Writers can be shared between threads.
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: archive file, appended to if it exists
+        """
+        self.path = os.path.expanduser(path)
+        self._file = open(self.path, "ab")
+        self._lock = threading.Lock()
+
+    def write(self, url, status, headers, body, date=None):
+        """
+        Append a response record
+
+        :param str url:
+        :param int status:
+        :param headers: response headers, dict or http.client.HTTPMessage
+        :param bytes body: decoded response body
+        :param datetime.datetime date=None: fetch time, now if None
+        """
+        if date is None:
+            date = datetime.datetime.now(datetime.timezone.utc)
+
+        http_lines = ["HTTP/1.1 {} {}".format(status, "OK" if status == 200 else "")]
+        for name, value in headers.items():
+            if name.lower() not in _TRANSFER_HEADERS:
+                http_lines.append("{}: {}".format(name, value))
+        http_lines.append("Content-Length: {}".format(len(body)))
+        block = ("\r\n".join(http_lines) + "\r\n\r\n").encode("utf-8") + body
+
+        warc_headers = [
+            "WARC/1.0",
+            "WARC-Type: response",
+            "WARC-Record-ID: <urn:uuid:{}>".format(uuid.uuid4()),
+            "WARC-Date: {}".format(date.strftime("%Y-%m-%dT%H:%M:%SZ")),
+            "WARC-Target-URI: {}".format(url),
+            "Content-Type: application/http; msgtype=response",
+            "Content-Length: {}".format(len(block)),
+        ]
+        record = ("\r\n".join(warc_headers) + "\r\n\r\n").encode("utf-8") + block + b"\r\n\r\n"
+
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        member = compressor.compress(record) + compressor.flush()
+        with self._lock:
+            self._file.write(member)
+            self._file.flush()
+
+    def write_response(self, res):
+        """
+        Append a record of a ted_talks.session.Response
+
+        :param ted_talks.session.Response res:
+        """
+        self.write(res.url, res.status, res.headers, res.body)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def list_archives(paths):
+    """
+    Expand archive paths, directories and glob patterns to archive files
+
+    :param paths: path or list of paths
+    :rtype: list
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+
+    archives = []
+    for path in paths:
+        path = os.path.expanduser(path)
+        if os.path.isdir(path):
+            archives.extend(sorted(glob.glob(os.path.join(glob.escape(path), "*.warc.gz"))))
+        elif glob.has_magic(path):
+            archives.extend(sorted(glob.glob(path)))
+        else:
+            archives.append(path)
+    return archives
+
+
+def iter_members(path, chunk_size=1 << 20):
+    """
+    Yield (offset, data) of each complete gzip member of the file.
+    A member truncated by a crash ends the iteration.
+
+    :param str path:
+    :param int chunk_size:
+    :rtype: generator
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        pending = b""
+        while True:
+            decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            parts = []
+            consumed = 0
+            data = pending
+            pending = b""
+            while True:
+                if not data:
+                    data = f.read(chunk_size)
+                    if not data:
+                        return
+                parts.append(decompressor.decompress(data))
+                if decompressor.eof:
+                    pending = decompressor.unused_data
+                    consumed += len(data) - len(pending)
+                    break
+                consumed += len(data)
+                data = b""
+
+            yield offset, b"".join(parts)
+            offset += consumed
+
+
+def parse_record(data):
+    """
+    Parse a WARC response record
+
+    :param bytes data:
+    :rtype: ArchiveRecord, or None if it is not a response record
+    """
+    warc_head, _, rest = data.partition(b"\r\n\r\n")
+    warc_headers = _parse_headers(warc_head.split(b"\r\n")[1:])
+    if warc_headers.get("WARC-Type") != "response":
+        return None
+
+    block = rest[:int(warc_headers["Content-Length"])]
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    http_lines = http_head.split(b"\r\n")
+    status = int(http_lines[0].split()[1])
+    headers = _parse_headers(http_lines[1:])
+
+    return ArchiveRecord(warc_headers["WARC-Target-URI"], status, headers, body,
+                         warc_headers.get("WARC-Date"))
+
+
+def _parse_headers(lines):
+    headers = email.message.Message()
+    for line in lines:
+        name, _, value = line.decode("utf-8").partition(":")
+        headers[name.strip()] = value.strip()
+    return headers
+
+
+def iter_records(paths):
+    """
+    Yield the response records of the archives
+
+    :param paths: archive path or list of archive paths, directories or globs
+    :rtype: generator
+    """
+    for path in list_archives(paths):
+        for _, data in iter_members(path):
+            record = parse_record(data)
+            if record is not None:
+                yield record
+
+
+class ArchiveSession:
+    """
+    Session answering requests from archives instead of the network,
+    to replay a crawl through the parsers offline. A URL not in the
+    archives raises HTTPError 404. The latest record of a URL wins.
+    """
+
+    def __init__(self, paths):
+        """
+        :param paths: archive path or list of archive paths, directories or globs
+        """
+        self.archives = list_archives(paths)
+        self._index = {}
+        for path in self.archives:
+            for offset, data in iter_members(path):
+                record = parse_record(data)
+                if record is not None:
+                    self._index[record.url] = (path, offset, record.date)
+
+        self._local = threading.local()
+        self._files = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, url):
+        return url in self._index
+
+    def urls(self):
+        """
+        :rtype: list
+        """
+        return list(self._index)
+
+    def get_date(self, url):
+        """
+        Return the date the URL was fetched on, as "YYYY-MM-DD" like the
+        update date of a dump, None if not archived
+
+        :param str url:
+        :rtype: str
+        """
+        location = self._index.get(url)
+        if location is None or location[2] is None:
+            return None
+        return location[2][:10]
+
+    def get(self, url, headers=None):
+        """
+        Return the archived response of the URL
+
+        :param str url:
+        :param dict headers=None: ignored
+        :rtype: ted_talks.session.Response
+        """
+        location = self._index.get(url)
+        if location is None:
+            raise HTTPError(url, 404, "not archived", {}, None)
+
+        path, offset, _ = location
+        f = self._open(path)
+        f.seek(offset)
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        parts = []
+        while not decompressor.eof:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                break
+            parts.append(decompressor.decompress(chunk))
+
+        record = parse_record(b"".join(parts))
+        if record.status >= 400:
+            raise HTTPError(url, record.status, "HTTP Error {}".format(record.status),
+                            record.headers, None)
+        return Response(record.url, record.status, record.headers, record.body, from_cache=True)
+
+    def close(self):
+        with self._lock:
+            files, self._files = self._files, []
+        for f in files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self, path):
+        """
+        Return the archive file opened by the current thread
+        """
+        files = getattr(self._local, "files", None)
+        if files is None:
+            files = self._local.files = {}
+        if path not in files:
+            files[path] = open(path, "rb")
+            with self._lock:
+                self._files.append(files[path])
+        return files[path]
+
+
+def reextract_all_talk_info_al(paths, save_dir=None, sink=None, base_url=None,
+                               parser=None, max_workers=4, parse_workers=os.cpu_count()):
+    """
+    Regenerate the dump of dump_all_talk_info_al from archives, without
+    network: the archived crawl is replayed through the parsers, parsing the
+    pages in parse_workers processes, one per CPU by default as nothing is
+    waited for on the network. With parse_workers=None, the pages are parsed
+    in the fetching threads. The update date of each talk is the date its
+    talk page was archived on, not the date of the replay.
+
+    :param paths: archive path or list of archive paths, directories or globs
+    :param str save_dir:
+    :param ted_talks.sinks.Sink sink=None:
+    :param str base_url=None: first talk list page of the archived crawl
+    :param parser=None: parser backend
+    :param int max_workers=4:
+    :param int parse_workers=os.cpu_count():
+    """
+    from ted_talks.scraper import TEDScraper
+
+    with ArchiveSession(paths) as session:
+        print("[ ARCHIVE ] {} pages in {} archives".format(len(session), len(session.archives)))
+        with TEDScraper(max_workers=max_workers, session=session, parser=parser,
+                        parse_workers=parse_workers, base_url=base_url) as ts:
+            ts.dump_all_talk_info_al(save_dir, sink=sink, get_update_date=session.get_date)
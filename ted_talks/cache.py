@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+
+# seconds a cached page is used without revalidation, per URL class
+DEFAULT_TTL = {
+    "list": 60 * 60,
+    "talk": 24 * 60 * 60,
+    "transcript": 30 * 24 * 60 * 60,
+    "languages": 7 * 24 * 60 * 60,
+    "other": 24 * 60 * 60,
+}
+
+
+def get_url_class(url):
+    """
+    Return the class of the TED URL used to choose its TTL
+
+    :param str url:
+    :rtype: str
+    """
+    path = urlsplit(url).path.rstrip("/")
+
+    if path.endswith("/transcript"):
+        return "transcript"
+    if path == "/talks":
+        return "list"
+    if path.startswith("/talks/"):
+        return "talk"
+    if path.endswith("/our-languages"):
+        return "languages"
+    return "other"
+
+
+class CacheEntry:
+    """
+    Cached response body with its validators
+    """
+
+    def __init__(self, url, body, etag=None, last_modified=None, stored_at=0.0):
+        """
+        :param str url:
+        :param bytes body:
+        :param str etag=None:
+        :param str last_modified=None:
+        :param float stored_at=0.0: time the entry was fetched or revalidated
+        """
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def validators(self):
+        """
+        Return the headers to revalidate the entry with a conditional request
+
+        :rtype: dict
+        """
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """
+    Persistent HTTP response cache stored in a directory.
+
+    Each entry is kept as a ``<key>.body`` file with a ``<key>.json`` metadata
+    file. The total size of the bodies is bounded by ``max_size`` and the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir, max_size=512 * 1024 * 1024, ttl=None):
+        """
+        :param str cache_dir:
+        :param int max_size=512MiB: max total size of cached bodies in bytes
+        :param dict ttl=None: TTL in seconds per URL class, overriding DEFAULT_TTL
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size = max_size
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl is not None:
+            self.ttl.update(ttl)
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()   # key -> body size, least recently used first
+        self._size = 0
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self._load_index()
+
+    def is_fresh(self, entry, now=None):
+        """
+        Return True if the entry can be used without revalidation
+
+        :param CacheEntry entry:
+        :param float now=None:
+        :rtype: bool
+        """
+        if now is None:
+            now = time.time()
+        return now - entry.stored_at < self.ttl[get_url_class(entry.url)]
+
+    def lookup(self, url):
+        """
+        Return the cache entry of the URL, or None if not cached
+
+        :param str url:
+        :rtype: CacheEntry
+        """
+        key = self._key(url)
+        with self._lock:
+            if key not in self._lru:
+                return None
+            self._lru.move_to_end(key)
+
+        try:
+            with open(self._path(key, ".json")) as f:
+                meta = json.load(f)
+            with open(self._path(key, ".body"), "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            self._discard(key)
+            return None
+
+        try:
+            os.utime(self._path(key, ".body"))
+        except FileNotFoundError:
+            # evicted by another process after the read, still a hit
+            pass
+        return CacheEntry(url, body, meta["etag"], meta["last_modified"], meta["stored_at"])
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """
+        Store the response body of the URL and evict old entries if needed
+
+        :param str url:
+        :param bytes body:
+        :param str etag=None:
+        :param str last_modified=None:
+        """
+        key = self._key(url)
+        self._write(self._path(key, ".body"), body)
+        self._write_meta(key, CacheEntry(url, body, etag, last_modified, time.time()))
+
+        with self._lock:
+            self._size -= self._lru.pop(key, 0)
+            self._lru[key] = len(body)
+            self._size += len(body)
+            evicted = self._evict()
+
+        for ek in evicted:
+            self._remove_files(ek)
+
+    def revalidated(self, entry):
+        """
+        Mark the entry as fresh again after a 304 Not Modified response
+
+        :param CacheEntry entry:
+        """
+        entry.stored_at = time.time()
+        self._write_meta(self._key(entry.url), entry)
+
+    def clear(self):
+        """
+        Remove all the cached entries
+        """
+        with self._lock:
+            keys = list(self._lru)
+            self._lru.clear()
+            self._size = 0
+
+        for key in keys:
+            self._remove_files(key)
+
+    @property
+    def size(self):
+        """
+        Total size of the cached bodies in bytes
+
+        :rtype: int
+        """
+        return self._size
+
+    def __len__(self):
+        return len(self._lru)
+
+    def _load_index(self):
+        """
+        Build the LRU index from the cache directory,
+        using the access time recorded as the mtime of each body file
+        """
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".body"):
+                continue
+            key = filename[:-len(".body")]
+            if not os.path.exists(self._path(key, ".json")):
+                continue
+            st = os.stat(self._path(key, ".body"))
+            entries.append((st.st_mtime, key, st.st_size))
+
+        for _, key, size in sorted(entries):
+            self._lru[key] = size
+            self._size += size
+
+        for key in self._evict():
+            self._remove_files(key)
+
+    def _evict(self):
+        """
+        Drop least recently used entries from the index until the cache
+        fits in max_size, and return their keys. Must hold the lock.
+
+        :rtype: list
+        """
+        evicted = []
+        while self._size > self.max_size and self._lru:
+            key, size = self._lru.popitem(last=False)
+            self._size -= size
+            evicted.append(key)
+        return evicted
+
+    def _discard(self, key):
+        """
+        Remove a broken entry
+
+        :param str key:
+        """
+        with self._lock:
+            self._size -= self._lru.pop(key, 0)
+        self._remove_files(key)
+
+    def _remove_files(self, key):
+        """
+        :param str key:
+        """
+        for ext in (".body", ".json"):
+            try:
+                os.remove(self._path(key, ext))
+            except FileNotFoundError:
+                pass
+
+    def _write_meta(self, key, entry):
+        """
+        :param str key:
+        :param CacheEntry entry:
+        """
+        meta = {
+            "url": entry.url,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "stored_at": entry.stored_at,
+        }
+        self._write(self._path(key, ".json"), json.dumps(meta).encode("utf-8"))
+
+    def _write(self, path, data):
+        """
+        Atomically write data to path
+
+        :param str path:
+        :param bytes data:
+        """
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _path(self, key, ext):
+        """
+        :param str key:
+        :param str ext:
+        :rtype: str
+        """
+        return os.path.join(self.cache_dir, key + ext)
+
+    def _key(self, url):
+        """
+        :param str url:
+        :rtype: str
+        """
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+
+
+class Checkpoint:
+    """
+    Durable record of the crawl progress kept in the dump directory.
+
+    Progress is appended to a JSON Lines journal, one event per line, and
+    flushed to disk before the call returns, so the file is valid up to the
+    last completed talk even if the process dies. On load the journal is
+    compacted and atomically replaced.
+    """
+
+    FILENAME = ".ted-scraper-checkpoint.jsonl"
+
+    def __init__(self, save_dir, filename=None, read_only=False):
+        """
+        :param str save_dir: dump directory
+        :param str filename=None: journal file name in save_dir
+        :param bool read_only=False: only read the journal, e.g. while a
+            crawl is writing it
+        """
+        self.path = os.path.join(save_dir, filename or Checkpoint.FILENAME)
+        self.read_only = read_only
+        self.page_list = None
+        self.completed_pages = set()
+        self.completed_talks = set()
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._load()
+
+    def is_page_done(self, page_url):
+        """
+        :param str page_url: talk list page URL
+        :rtype: bool
+        """
+        return page_url in self.completed_pages
+
+    def is_talk_done(self, talk_link):
+        """
+        :param str talk_link:
+        :rtype: bool
+        """
+        return talk_link in self.completed_talks
+
+    def set_page_list(self, page_list):
+        """
+        Record the talk list pages of the crawl
+
+        :param list page_list:
+        """
+        self.page_list = list(page_list)
+        self._append({"page_list": self.page_list})
+
+    def mark_page_done(self, page_url):
+        """
+        :param str page_url: talk list page URL
+        """
+        self.completed_pages.add(page_url)
+        self._append({"page": page_url})
+
+    def mark_talk_done(self, talk_link):
+        """
+        :param str talk_link:
+        """
+        self.completed_talks.add(talk_link)
+        self._append({"talk": talk_link})
+
+    def mark_talks_done(self, talk_links):
+        """
+        Record several talks at once with a single flush
+
+        :param iterable talk_links:
+        """
+        talk_links = [tl for tl in talk_links if tl not in self.completed_talks]
+        self.completed_talks.update(talk_links)
+        self._append(*[{"talk": tl} for tl in talk_links])
+
+    def reset(self):
+        """
+        Forget all the progress
+        """
+        with self._lock:
+            self.page_list = None
+            self.completed_pages = set()
+            self.completed_talks = set()
+            self._close()
+            self._write_compacted()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load(self):
+        """
+        Read the journal, ignoring a line truncated by a crash,
+        and rewrite it compacted
+        """
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+
+                if "page_list" in event:
+                    self.page_list = event["page_list"]
+                elif "page" in event:
+                    self.completed_pages.add(event["page"])
+                elif "talk" in event:
+                    self.completed_talks.add(event["talk"])
+
+        if not self.read_only:
+            self._write_compacted()
+
+    def _write_compacted(self):
+        """
+        Atomically replace the journal with the current state
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            if self.page_list is not None:
+                f.write(json.dumps({"page_list": self.page_list}) + "\n")
+            for page_url in sorted(self.completed_pages):
+                f.write(json.dumps({"page": page_url}) + "\n")
+            for talk_link in sorted(self.completed_talks):
+                f.write(json.dumps({"talk": talk_link}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+
+    def _append(self, *events):
+        """
+        Append the events to the journal and flush it to disk
+
+        :param dict events:
+        """
+        if len(events) == 0:
+            return
+        if self.read_only:
+            raise ValueError("read-only checkpoint: {}".format(self.path))
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            for event in events:
+                self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+
+"""
+Command line interface of ted-scraper:
+
+    ted-scraper languages [--top N] [--json]
+    ted-scraper links [--metadata]
+    ted-scraper dump [URL] -o DIR
+    ted-scraper dump-al [URL] -o DIR
+    ted-scraper dump-all -o DIR [--resume] [--shard i/N]
+    ted-scraper status -o DIR [--shard i/N]
+    ted-scraper reextract ARCHIVE [ARCHIVE ...] -o DIR
+    ted-scraper queue {seed,work,status} QUEUE_DB
+    ted-scraper index -o DIR
+    ted-scraper search PHRASE -o DIR [--language LANG] [--topic TOPIC]
+
+Modules are imported by the commands which use them, so that the commands
+not scraping, and --help, start without loading the HTTP and parser stacks.
+Results are written to stdout and the scraping progress to stderr.
+"""
+
+import argparse
+import os
+import sys
+
+from contextlib import ExitStack, redirect_stdout
+
+
+SINKS = ("json", "jsonl", "sqlite", "index")
+
+
+def _add_scraper_options(parser):
+    group = parser.add_argument_group("scraping")
+    group.add_argument("--lang", default="en",
+                       help="transcript language of dump (default: en)")
+    group.add_argument("--languages", type=_comma_list,
+                       help="comma-separated languages scraped with all languages (default: all)")
+    group.add_argument("-w", "--workers", type=int, default=1,
+                       help="talks scraped concurrently (default: 1)")
+    group.add_argument("--per-host-limit", type=int,
+                       help="max concurrent requests per host")
+    group.add_argument("--language-workers", type=int, default=1,
+                       help="transcript languages of a talk fetched concurrently (default: 1)")
+    group.add_argument("--parser", choices=("soup", "strainer", "lxml"), default="soup",
+                       help="parser backend (default: soup)")
+    group.add_argument("--parse-workers", type=int,
+                       help="processes parsing the pages (default: parse in the fetching threads)")
+    group.add_argument("--compact-transcripts", action="store_true",
+                       help="hold the transcripts in flight in compact form")
+    group.add_argument("--base-url",
+                       help="first talk list page (default: https://www.ted.com/talks)")
+
+    group = parser.add_argument_group("HTTP")
+    group.add_argument("--cache", metavar="DIR",
+                       help="cache the responses in DIR")
+    group.add_argument("--cache-size", type=int, default=512, metavar="MIB",
+                       help="max size of the cache in MiB (default: 512)")
+    group.add_argument("--rate", type=float, default=2.0,
+                       help="initial requests per second per host (default: 2)")
+    group.add_argument("--retries", type=int, default=4,
+                       help="retries of a failed request (default: 4)")
+    group.add_argument("--timeout", type=float, default=30.0,
+                       help="read timeout in seconds (default: 30)")
+    group.add_argument("--archive", metavar="PATH",
+                       help="archive the fetched pages to a WARC-style file")
+
+    group = parser.add_argument_group("metrics")
+    group.add_argument("--metrics", metavar="PATH",
+                       help="write the crawl metrics to PATH")
+    group.add_argument("--metrics-format", choices=("prometheus", "json"), default="prometheus")
+    group.add_argument("--metrics-interval", type=float, default=10.0,
+                       help="seconds between metrics writes (default: 10)")
+
+
+def _add_output_options(parser, sink=True):
+    group = parser.add_argument_group("output")
+    group.add_argument("-o", "--output", default="./dump_files", metavar="DIR",
+                       help="dump directory (default: ./dump_files)")
+    if not sink:
+        return
+
+    group.add_argument("--sink", choices=SINKS, default="json",
+                       help="json: one file per talk, jsonl: JSON Lines shards, "
+                            "sqlite: database, index: transcript index (default: json)")
+    group.add_argument("--records-per-shard", type=int, default=1000,
+                       help="talks per JSON Lines shard (default: 1000)")
+    group.add_argument("--compress", action="store_true",
+                       help="gzip the JSON Lines shards")
+    group.add_argument("--db", metavar="PATH",
+                       help="database of the sqlite and index sinks "
+                            "(default: talks.db or index.db in DIR)")
+
+
+def _comma_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def build_parser():
+    """
+    :rtype: argparse.ArgumentParser
+    """
+    from ted_talks import __version__
+
+    parser = argparse.ArgumentParser(
+        prog="ted-scraper", description="Scraper for TED Talks.")
+    parser.add_argument("--version", action="version", version="%(prog)s " + __version__)
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="do not print the scraping progress")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    p = subparsers.add_parser("languages", help="list the transcript languages")
+    p.add_argument("--top", type=int, metavar="N",
+                   help="print the symbols of the N languages with the most talks")
+    p.add_argument("--json", action="store_true", help="print JSON")
+    p.add_argument("--lang-url", help="languages page")
+    _add_scraper_options(p)
+    p.set_defaults(func=cmd_languages)
+
+    p = subparsers.add_parser("links", help="list the links of all talks")
+    p.add_argument("--metadata", action="store_true",
+                   help="print the title, link, posted date and topics as JSON lines")
+    _add_scraper_options(p)
+    p.set_defaults(func=cmd_links)
+
+    for name, help_text in (("dump", "dump the talks of a talk list page"),
+                            ("dump-al", "dump the talks of a talk list page with all languages")):
+        p = subparsers.add_parser(name, help=help_text)
+        p.add_argument("url", nargs="?", help="talk list page (default: the first one)")
+        _add_output_options(p)
+        _add_scraper_options(p)
+        p.set_defaults(func=cmd_dump, all_language=(name == "dump-al"))
+
+    p = subparsers.add_parser("dump-all", help="dump all talks with all languages")
+    p.add_argument("--resume", action="store_true",
+                   help="skip the pages and talks done by a previous run")
+    p.add_argument("--shard", metavar="i/N", help="dump the i-th of N partitions of the talks")
+    p.add_argument("--queue-size", type=int, default=4,
+                   help="items between the pipeline stages (default: 4)")
+    _add_output_options(p)
+    _add_scraper_options(p)
+    p.set_defaults(func=cmd_dump_all)
+
+    p = subparsers.add_parser("status", help="print the progress recorded by dump-all")
+    p.add_argument("--shard", metavar="i/N")
+    p.add_argument("--json", action="store_true", help="print JSON")
+    _add_output_options(p, sink=False)
+    p.set_defaults(func=cmd_status)
+
+    p = subparsers.add_parser("reextract", help="dump all talks again from archives, offline")
+    p.add_argument("archives", nargs="+", help="archive files, directories or globs")
+    _add_output_options(p)
+    group = p.add_argument_group("parsing")
+    group.add_argument("-w", "--workers", type=int, default=4)
+    group.add_argument("--parser", choices=("soup", "strainer", "lxml"), default="soup")
+    group.add_argument("--parse-workers", type=int, default=os.cpu_count(),
+                       help="processes parsing the pages (default: one per CPU; "
+                            "0 to parse in the fetching threads)")
+    group.add_argument("--base-url", help="first talk list page of the archived crawl")
+    p.set_defaults(func=cmd_reextract)
+
+    p = subparsers.add_parser("queue", help="dump all talks with workers sharing a work queue")
+    p.add_argument("action", choices=("seed", "work", "status"))
+    p.add_argument("queue_db", help="work queue database")
+    p.add_argument("--lease-time", type=float, default=600.0,
+                   help="seconds before the page of a silent worker is claimed again (default: 600)")
+    p.add_argument("--worker-id")
+    _add_output_options(p)
+    _add_scraper_options(p)
+    p.set_defaults(func=cmd_queue)
+
+    p = subparsers.add_parser("index", help="index the transcripts of a dump for search")
+    p.add_argument("--db", metavar="PATH", help="index database (default: index.db in DIR)")
+    _add_output_options(p, sink=False)
+    p.set_defaults(func=cmd_index)
+
+    p = subparsers.add_parser("search", help="search a phrase in the indexed transcripts")
+    p.add_argument("phrase")
+    p.add_argument("--language", default="en")
+    p.add_argument("--topic")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--db", metavar="PATH", help="index database (default: index.db in DIR)")
+    _add_output_options(p, sink=False)
+    p.set_defaults(func=cmd_search)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line, return the exit status: 0 on success, 1 on
+    error and 130 if interrupted
+
+    :param list argv=None: arguments, sys.argv[1:] if None
+    :rtype: int
+    """
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    progress = open(os.devnull, "w") if args.quiet else sys.stderr
+    try:
+        with redirect_stdout(progress):
+            return args.func(args, out) or 0
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        # the traceback of a crawl has been printed with the progress
+        print("ted-scraper: error: {}".format(e), file=sys.stderr)
+        return 1
+    finally:
+        if args.quiet:
+            progress.close()
+
+
+def _open_scraper(args, stack):
+    """
+    Return the scraper configured by the arguments, closed with the stack
+
+    :param argparse.Namespace args:
+    :param contextlib.ExitStack stack:
+    :rtype: ted_talks.scraper.TEDScraper
+    """
+    from ted_talks.ratelimit import RateLimiter, RetryPolicy
+    from ted_talks.scraper import TEDScraper
+    from ted_talks.session import HTTPSession
+
+    cache = None
+    if args.cache is not None:
+        from ted_talks.cache import HTTPCache
+        cache = HTTPCache(args.cache, max_size=args.cache_size * 1024 * 1024)
+
+    archive = None
+    if args.archive is not None:
+        from ted_talks.archive import ArchiveWriter
+        archive = stack.enter_context(ArchiveWriter(args.archive))
+
+    session = stack.enter_context(HTTPSession(
+        read_timeout=args.timeout, cache=cache, archive=archive,
+        rate_limiter=RateLimiter(rate=args.rate, max_rate=max(args.rate, 20.0)),
+        retry=RetryPolicy(max_retries=args.retries)))
+
+    ts = stack.enter_context(TEDScraper(
+        lang=args.lang, max_workers=args.workers, per_host_limit=args.per_host_limit,
+        session=session, parser=args.parser, parse_workers=args.parse_workers,
+        languages=args.languages, language_workers=args.language_workers,
+        base_url=args.base_url, compact_transcripts=args.compact_transcripts))
+
+    if args.metrics is not None:
+        from ted_talks.metrics import MetricsWriter
+        stack.enter_context(MetricsWriter(ts.metrics, args.metrics, args.metrics_interval,
+                                          args.metrics_format))
+    return ts
+
+
+def _open_sink(args, stack):
+    """
+    Return the sink selected by the arguments, None for the JSON files
+    written by the scraper
+
+    :param argparse.Namespace args:
+    :param contextlib.ExitStack stack:
+    :rtype: ted_talks.sinks.Sink
+    """
+    os.makedirs(args.output, exist_ok=True)
+
+    if args.sink == "json":
+        return None
+    if args.sink == "jsonl":
+        from ted_talks.sinks import JSONLinesSink
+        return stack.enter_context(JSONLinesSink(
+            args.output, records_per_shard=args.records_per_shard, compress=args.compress))
+    if args.sink == "sqlite":
+        from ted_talks.sinks import SQLiteSink
+        return stack.enter_context(SQLiteSink(args.db or os.path.join(args.output, "talks.db")))
+
+    from ted_talks.index import TranscriptIndex
+    return stack.enter_context(TranscriptIndex(args.db or os.path.join(args.output, "index.db")))
+
+
+def cmd_languages(args, out):
+    import json
+
+    with ExitStack() as stack:
+        ts = _open_scraper(args, stack)
+        lang_info = ts.get_languages(url=args.lang_url, session=ts.session)
+
+    if args.top is not None:
+        symbols = ts.get_top_languages(args.top, lang_info)
+        if args.json:
+            print(json.dumps(symbols), file=out)
+        else:
+            print("\n".join(symbols), file=out)
+        return
+
+    if args.json:
+        print(json.dumps(lang_info, indent=2), file=out)
+        return
+    for li in lang_info:
+        print("{}\t{}\t{}".format(li["lang_symbol"], li["lang_type"], li["lang_talks"]), file=out)
+
+
+def cmd_links(args, out):
+    import json
+
+    with ExitStack() as stack:
+        ts = _open_scraper(args, stack)
+        if args.metadata:
+            for talk in ts.iter_talk_metadata():
+                print(json.dumps(talk), file=out, flush=True)
+            return
+
+        for talk_links in ts.iter_talk_links():
+            for talk_link in talk_links:
+                print(talk_link, file=out)
+            out.flush()
+
+
+def cmd_dump(args, out):
+    with ExitStack() as stack:
+        ts = _open_scraper(args, stack)
+        sink = _open_sink(args, stack)
+        url = args.url or ts.base_url
+        if args.all_language:
+            ts.dump_talk_info_al(url, args.output, sink=sink)
+        else:
+            ts.dump_talk_info(url, args.output, sink=sink)
+
+
+def cmd_dump_all(args, out):
+    from ted_talks.workqueue import parse_shard
+
+    shard = parse_shard(args.shard) if args.shard is not None else None
+    with ExitStack() as stack:
+        ts = _open_scraper(args, stack)
+        sink = _open_sink(args, stack)
+        ts.dump_all_talk_info_al(args.output, resume=args.resume, queue_size=args.queue_size,
+                                 sink=sink, shard=shard)
+
+
+def cmd_status(args, out):
+    import json
+    from ted_talks.checkpoint import Checkpoint
+
+    filename = None
+    if args.shard is not None:
+        from ted_talks.workqueue import parse_shard
+        filename = ".ted-scraper-checkpoint-{}of{}.jsonl".format(*parse_shard(args.shard))
+
+    if not os.path.exists(os.path.join(args.output, filename or Checkpoint.FILENAME)):
+        print("no checkpoint in {}".format(args.output), file=sys.stderr)
+        return 1
+
+    with Checkpoint(args.output, filename, read_only=True) as checkpoint:
+        status = {
+            "pages": len(checkpoint.page_list) if checkpoint.page_list is not None else None,
+            "pages_done": len(checkpoint.completed_pages),
+            "talks_done": len(checkpoint.completed_talks),
+        }
+
+    if args.json:
+        print(json.dumps(status), file=out)
+        return
+    pages = status["pages"] if status["pages"] is not None else "?"
+    print("pages: {}/{}".format(status["pages_done"], pages), file=out)
+    print("talks: {}".format(status["talks_done"]), file=out)
+
+
+def cmd_reextract(args, out):
+    from ted_talks.archive import reextract_all_talk_info_al
+
+    with ExitStack() as stack:
+        sink = _open_sink(args, stack)
+        reextract_all_talk_info_al(args.archives, args.output, sink=sink, base_url=args.base_url,
+                                   parser=args.parser, max_workers=args.workers,
+                                   parse_workers=args.parse_workers or None)
+
+
+def cmd_queue(args, out):
+    from ted_talks.workqueue import WorkQueue
+
+    with ExitStack() as stack:
+        queue = WorkQueue(args.queue_db, lease_time=args.lease_time, worker_id=args.worker_id)
+        stack.callback(queue.close)
+
+        if args.action == "status":
+            for state, n in sorted(queue.counts().items()):
+                print("{}\t{}".format(state, n), file=out)
+            return
+
+        ts = _open_scraper(args, stack)
+        if args.action == "seed":
+            print("{}".format(ts.seed_work_queue(queue)), file=out)
+            return
+
+        sink = _open_sink(args, stack)
+        print("{}".format(ts.dump_queued_talk_info_al(queue, args.output, sink=sink)), file=out)
+
+
+def cmd_index(args, out):
+    from ted_talks.index import build_index
+
+    indexed = build_index(args.db or os.path.join(args.output, "index.db"), args.output)
+    print(indexed, file=out)
+
+
+def cmd_search(args, out):
+    from ted_talks.index import TranscriptIndex
+
+    path = args.db or os.path.join(args.output, "index.db")
+    if not os.path.exists(path):
+        print("no index: {}".format(path), file=sys.stderr)
+        return 1
+
+    with TranscriptIndex(path) as index:
+        hits = index.search(args.phrase, language=args.language, topic=args.topic,
+                            limit=args.limit)
+    for hit in hits:
+        print("{}\t{}\t{}\t{}".format(hit.talk_link, hit.para_num, hit.time or "", hit.talk_title),
+              file=out)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+class Fetcher:
+    """
+    Bounded-concurrency engine used to run scraping jobs in parallel.
+
+    Jobs are run on a thread pool of ``max_workers`` threads, and the number
+    of simultaneous requests to the same host is capped by ``per_host``.
+    """
+
+    def __init__(self, max_workers=1, per_host=None):
+        """
+        :param int max_workers=1: number of worker threads
+        :param int per_host=None: max concurrent requests per host
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1: {}".format(max_workers))
+        if per_host is not None and per_host < 1:
+            raise ValueError("per_host must be >= 1: {}".format(per_host))
+
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _get_host_slot(self, url):
+        """
+        Return the semaphore guarding the host of the URL
+
+        :param str url:
+        :rtype: threading.BoundedSemaphore
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+        return slot
+
+    @contextmanager
+    def host_slot(self, url):
+        """
+        Hold one of the request slots of the URL's host while in the block
+
+        :param str url:
+        """
+        if self.per_host is None:
+            yield
+            return
+
+        slot = self._get_host_slot(url)
+        with slot:
+            yield
+
+    def map(self, func, items):
+        """
+        Apply func to each item concurrently and return the results
+        in the same order as items
+
+        :param callable func:
+        :param iterable items:
+        :rtype: list
+        """
+        return list(self.imap(func, items))
+
+    def imap(self, func, items):
+        """
+        Apply func to each item concurrently and yield the results
+        in the same order as items, as soon as each one is ready.
+        At most 2 * max_workers items are in flight, so items can be
+        an unbounded iterator and memory stays flat.
+
+        :param callable func:
+        :param iterable items:
+        :rtype: generator
+        """
+        if self.max_workers == 1:
+            for item in items:
+                yield func(item)
+            return
+
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for item in itertools.islice(items, 2 * self.max_workers):
+                pending.append(executor.submit(func, item))
+
+            while pending:
+                result = pending.popleft().result()
+                for item in itertools.islice(items, 1):
+                    pending.append(executor.submit(func, item))
+                yield result
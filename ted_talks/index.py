@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+
+import glob
+import json
+import os
+import re
+import sqlite3
+
+from array import array
+from collections import namedtuple
+
+from ted_talks.sinks import Sink, SQLiteSink, list_shards, read_shard
+
+
+# a paragraph matching a query
+Hit = namedtuple("Hit", ["talk_link", "talk_title", "language", "para_num", "time"])
+
+# a run of CJK characters has no spaces, so each character is a term and
+# a phrase of characters matches a substring
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f"
+_TOKEN_PATTERN = re.compile(r"[{0}]|[^\W{0}]+".format(_CJK))
+
+# candidate paragraphs looked up one by one below this count,
+# instead of reading the whole posting list of the next term
+_LOOKUP_LIMIT = 256
+
+
+def tokenize(text):
+    """
+    Return the lowercased terms of the text
+
+    :param str text:
+    :rtype: list
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class TranscriptIndex(Sink):
+    """
+    Inverted index of the transcripts of the dumped talks, in SQLite.
+
+    Each term of each language has a posting list of the paragraphs it
+    appears in, with the term positions in the paragraph, so a phrase is
+    matched paragraph by paragraph and each hit maps back to the paragraph
+    time. Talks can be added at any time; a talk added again replaces its
+    previous postings. The index is a sink, so a dump can build it directly.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS talks (
+        talk_id INTEGER PRIMARY KEY,
+        talk_link TEXT UNIQUE NOT NULL,
+        talk_title TEXT,
+        posted_date TEXT,
+        update_date TEXT,
+        source TEXT
+    );
+    CREATE TABLE IF NOT EXISTS topics (
+        talk_id INTEGER NOT NULL,
+        topic TEXT NOT NULL,
+        PRIMARY KEY (topic, talk_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS paragraphs (
+        talk_id INTEGER NOT NULL,
+        language TEXT NOT NULL,
+        para_num INTEGER NOT NULL,
+        time TEXT,
+        PRIMARY KEY (talk_id, language, para_num)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS terms (
+        term_id INTEGER PRIMARY KEY,
+        language TEXT NOT NULL,
+        term TEXT NOT NULL,
+        df INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (language, term)
+    );
+    CREATE TABLE IF NOT EXISTS postings (
+        term_id INTEGER NOT NULL,
+        talk_id INTEGER NOT NULL,
+        para_num INTEGER NOT NULL,
+        positions BLOB NOT NULL,
+        PRIMARY KEY (term_id, talk_id, para_num)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS postings_talk ON postings(talk_id);
+    CREATE TABLE IF NOT EXISTS sources (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER,
+        size INTEGER
+    );
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: database file
+        """
+        self.path = os.path.expanduser(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(TranscriptIndex.SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(talks)")]
+        if "source" not in columns:
+            # index built before the source file of each talk was recorded
+            self.conn.execute("ALTER TABLE talks ADD COLUMN source TEXT")
+        self._term_ids = {}
+
+    def write(self, talk_info):
+        self.add(talk_info)
+        self.conn.commit()
+
+    def add(self, talk_info, source=None):
+        """
+        Index the talk info of a talk, replacing the talk if it is indexed.
+        The change is committed by commit() or write().
+
+        :param dict talk_info: talk info of the dump, with one or all languages
+        :param str source=None: dump file the talk info was read from
+        """
+        conn = self.conn
+        talk_link = talk_info["talk_link"]
+        talk_id = self._remove(talk_link)
+
+        cur = conn.execute(
+            "INSERT INTO talks (talk_id, talk_link, talk_title, posted_date, update_date, source) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (talk_id, talk_link, talk_info.get("talk_title"), talk_info.get("posted_date"),
+             talk_info.get("update_date"), source))
+        talk_id = cur.lastrowid
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO topics (talk_id, topic) VALUES (?, ?)",
+            [(talk_id, topic) for topic in talk_info.get("talk_topics", [])])
+
+        paragraphs = []
+        postings = []
+        df = {}
+        for _, language, para_num, text, time in SQLiteSink.transcript_rows(talk_info):
+            paragraphs.append((talk_id, language, para_num, time))
+
+            positions = {}
+            for position, term in enumerate(tokenize(text)):
+                positions.setdefault(term, array("I")).append(position)
+            for term, term_positions in positions.items():
+                term_id = self._get_term_id(language, term)
+                postings.append((term_id, talk_id, para_num, term_positions.tobytes()))
+                df[term_id] = df.get(term_id, 0) + 1
+
+        conn.executemany(
+            "INSERT INTO paragraphs (talk_id, language, para_num, time) VALUES (?, ?, ?, ?)",
+            paragraphs)
+        # in key order, the inserts touch each page of the posting lists once
+        postings.sort()
+        conn.executemany(
+            "INSERT INTO postings (term_id, talk_id, para_num, positions) VALUES (?, ?, ?, ?)",
+            postings)
+        conn.executemany(
+            "UPDATE terms SET df = df + ? WHERE term_id = ?",
+            [(n, term_id) for term_id, n in df.items()])
+
+    def remove(self, talk_link):
+        """
+        Remove a talk from the index
+
+        :param str talk_link:
+        """
+        self._remove(talk_link)
+        self.conn.commit()
+
+    def _remove(self, talk_link):
+        """
+        Delete the rows of the talk and return its talk_id, None if not indexed
+        """
+        conn = self.conn
+        row = conn.execute("SELECT talk_id FROM talks WHERE talk_link = ?", (talk_link,)).fetchone()
+        if row is None:
+            return None
+
+        talk_id = row[0]
+        conn.executemany(
+            "UPDATE terms SET df = df - ? WHERE term_id = ?",
+            conn.execute("SELECT COUNT(*), term_id FROM postings WHERE talk_id = ? "
+                         "GROUP BY term_id", (talk_id,)).fetchall())
+        conn.execute("DELETE FROM postings WHERE talk_id = ?", (talk_id,))
+        conn.execute("DELETE FROM paragraphs WHERE talk_id = ?", (talk_id,))
+        conn.execute("DELETE FROM topics WHERE talk_id = ?", (talk_id,))
+        conn.execute("DELETE FROM talks WHERE talk_id = ?", (talk_id,))
+        return talk_id
+
+    def _get_term_id(self, language, term):
+        key = (language, term)
+        term_id = self._term_ids.get(key)
+        if term_id is None:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO terms (language, term) VALUES (?, ?)", key)
+            term_id = self.conn.execute(
+                "SELECT term_id FROM terms WHERE language = ? AND term = ?", key).fetchone()[0]
+            self._term_ids[key] = term_id
+        return term_id
+
+    def get_update_date(self, talk_link):
+        """
+        Return the update date of the indexed talk, None if not indexed
+
+        :param str talk_link:
+        :rtype: str
+        """
+        row = self.conn.execute(
+            "SELECT update_date FROM talks WHERE talk_link = ?", (talk_link,)).fetchone()
+        return row[0] if row is not None else None
+
+    def add_dump(self, save_dir):
+        """
+        Index the talks dumped in save_dir, as JSON files or JSON Lines
+        shards. Files unchanged since the last call are skipped, and the
+        talks of a changed file replace the records indexed from it. A talk
+        dumped in several files is indexed from the record with the latest
+        update date, then the most transcript languages, then the last read.
+
+        :param str save_dir:
+        :rtype: int
+        :return: number of talks indexed
+        """
+        save_dir = os.path.expanduser(save_dir)
+        indexed = 0
+
+        paths = sorted(glob.glob(os.path.join(glob.escape(save_dir), "*.json")))
+        for path in paths + self._list_jsonl(save_dir):
+            stat = os.stat(path)
+            row = self.conn.execute(
+                "SELECT mtime_ns, size FROM sources WHERE path = ?", (path,)).fetchone()
+            if row == (stat.st_mtime_ns, stat.st_size):
+                continue
+
+            for talk_info in self._read_dump_file(path):
+                if not self._supersedes(talk_info, path):
+                    continue
+                print("[ INDEX ] {}".format(talk_info["talk_link"]))
+                self.add(talk_info, path)
+                indexed += 1
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size))
+            self.conn.commit()
+
+        return indexed
+
+    def _supersedes(self, talk_info, path):
+        """
+        Return whether the talk info read from the dump file replaces the
+        indexed record of the talk: a record of the same file, rewritten,
+        or e.g. "al-<title>.json" over "<title>.json" of the same day
+
+        :param dict talk_info:
+        :param str path: dump file of the talk info
+        :rtype: bool
+        """
+        row = self.conn.execute(
+            "SELECT talk_id, update_date, source FROM talks WHERE talk_link = ?",
+            (talk_info["talk_link"],)).fetchone()
+        if row is None or row[2] == path:
+            return True
+
+        indexed_languages = self.conn.execute(
+            "SELECT COUNT(DISTINCT language) FROM paragraphs WHERE talk_id = ?",
+            (row[0],)).fetchone()[0]
+        languages = {language for _, language, _, _, _ in SQLiteSink.transcript_rows(talk_info)}
+        return ((talk_info.get("update_date") or "", len(languages)) >=
+                (row[1] or "", indexed_languages))
+
+    @staticmethod
+    def _list_jsonl(save_dir):
+        prefixes = set()
+        for path in glob.glob(os.path.join(glob.escape(save_dir), "*.jsonl*")):
+            match = re.match(r"(.+)-\d+\.jsonl(\.gz)?$", os.path.basename(path))
+            if match is not None:
+                prefixes.add(match.group(1))
+        return [path for prefix in sorted(prefixes) for path in list_shards(save_dir, prefix)]
+
+    @staticmethod
+    def _read_dump_file(path):
+        if path.endswith(".json"):
+            with open(path) as f:
+                try:
+                    talk_infos = [json.load(f)]
+                except ValueError:
+                    return
+        else:
+            talk_infos = read_shard(path)
+
+        for talk_info in talk_infos:
+            if isinstance(talk_info, dict) and "talk_link" in talk_info:
+                yield talk_info
+
+    def commit(self):
+        self.conn.commit()
+
+    def search(self, phrase, language="en", topic=None, limit=None):
+        """
+        Return the paragraphs of the transcripts in the language containing
+        the phrase, in the talks tagged with the topic if given, newest
+        talks first
+
+        :param str phrase:
+        :param str language="en":
+        :param str topic=None:
+        :param int limit=None: max hits
+        :rtype: list of Hit
+        """
+        terms = tokenize(phrase)
+        if not terms:
+            return []
+
+        term_rows = []
+        for term in set(terms):
+            row = self.conn.execute(
+                "SELECT term_id, df FROM terms WHERE language = ? AND term = ?",
+                (language, term)).fetchone()
+            if row is None or row[1] == 0:
+                return []
+            term_rows.append((row[1], term, row[0]))
+        term_ids = {term: term_id for _, term, term_id in term_rows}
+
+        talk_ids = None
+        if topic is not None:
+            talk_ids = {row[0] for row in self.conn.execute(
+                "SELECT talk_id FROM topics WHERE topic = ?", (topic,))}
+
+        # intersect the posting lists, rarest term first
+        candidates = None
+        for _, term, term_id in sorted(term_rows):
+            if candidates is not None and len(candidates) <= _LOOKUP_LIMIT:
+                postings = {}
+                for talk_id, para_num in candidates:
+                    row = self.conn.execute(
+                        "SELECT positions FROM postings "
+                        "WHERE term_id = ? AND talk_id = ? AND para_num = ?",
+                        (term_id, talk_id, para_num)).fetchone()
+                    if row is not None:
+                        postings[(talk_id, para_num)] = _decode_positions(row[0])
+            else:
+                postings = {
+                    (talk_id, para_num): _decode_positions(positions)
+                    for talk_id, para_num, positions in self.conn.execute(
+                        "SELECT talk_id, para_num, positions FROM postings WHERE term_id = ?",
+                        (term_id,))
+                    if talk_ids is None or talk_id in talk_ids}
+
+            if candidates is None:
+                candidates = {key: {term: positions} for key, positions in postings.items()}
+            else:
+                candidates = {key: dict(found, **{term: postings[key]})
+                              for key, found in candidates.items() if key in postings}
+            if not candidates:
+                return []
+
+        matches = [key for key, positions in candidates.items()
+                   if _has_phrase(terms, positions)]
+        return self._get_hits(matches, language, limit)
+
+    def _get_hits(self, matches, language, limit):
+        hits = []
+        talks = {}
+        for talk_id, para_num in matches:
+            if talk_id not in talks:
+                talks[talk_id] = self.conn.execute(
+                    "SELECT talk_link, talk_title, posted_date FROM talks WHERE talk_id = ?",
+                    (talk_id,)).fetchone()
+            talk_link, talk_title, posted_date = talks[talk_id]
+            time = self.conn.execute(
+                "SELECT time FROM paragraphs WHERE talk_id = ? AND language = ? AND para_num = ?",
+                (talk_id, language, para_num)).fetchone()[0]
+            hits.append((posted_date or "", Hit(talk_link, talk_title, language, para_num, time)))
+
+        # newest first, then in the order of the transcript
+        hits.sort(key=lambda h: (h[1].talk_link, h[1].para_num))
+        hits.sort(key=lambda h: h[0], reverse=True)
+        hits = [hit for _, hit in hits]
+        return hits[:limit] if limit is not None else hits
+
+    def find_talks(self, topic=None, language=None):
+        """
+        Return the links of the indexed talks tagged with the topic and
+        with a transcript in the language, newest first
+
+        :param str topic=None:
+        :param str language=None:
+        :rtype: list
+        """
+        query = "SELECT talk_link FROM talks WHERE 1"
+        params = []
+        if topic is not None:
+            query += " AND talk_id IN (SELECT talk_id FROM topics WHERE topic = ?)"
+            params.append(topic)
+        if language is not None:
+            query += " AND EXISTS (SELECT 1 FROM paragraphs p WHERE p.talk_id = talks.talk_id " \
+                     "AND p.language = ?)"
+            params.append(language)
+        query += " ORDER BY posted_date DESC, talk_link"
+
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM talks").fetchone()[0]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+
+def _decode_positions(blob):
+    positions = array("I")
+    positions.frombytes(blob)
+    return positions
+
+
+def _has_phrase(terms, positions):
+    """
+    Return True if the terms appear consecutively
+
+    :param list terms: terms of the phrase
+    :param dict positions: positions of each term in the paragraph
+    :rtype: bool
+    """
+    if len(terms) == 1:
+        return True
+
+    following = [set(positions[term]) for term in terms[1:]]
+    for start in positions[terms[0]]:
+        if all(start + i + 1 in following[i] for i in range(len(following))):
+            return True
+    return False
+
+
+def build_index(index_path, save_dir):
+    """
+    Build or update the index of the talks dumped in save_dir
+
+    :param str index_path:
+    :param str save_dir:
+    :rtype: int
+    :return: number of talks indexed
+    """
+    with TranscriptIndex(index_path) as index:
+        indexed = index.add_dump(save_dir)
+        print("[ INDEX ] {} talks indexed, {} in the index".format(indexed, len(index)))
+    return indexed
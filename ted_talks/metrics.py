@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+import json
+import math
+import os
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Metrics:
+    """
+    Counters, HTTP status histogram and latency percentiles of the stages of
+    a crawl, shared by the threads of a scraper.
+
+    The stages recorded by TEDScraper are "fetch" (network or cache),
+    "parse" (parsing a page and extracting its fields), "talk" (scraping a
+    whole talk) and "write" (writing a talk to the sink). Percentiles are
+    computed over the last max_samples latencies of each stage.
+    """
+
+    def __init__(self, max_samples=10000):
+        """
+        :param int max_samples=10000: latencies kept per stage
+        """
+        self.max_samples = max_samples
+        self.started = time.time()
+
+        self._counters = {}
+        self._status = {}
+        self._samples = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1):
+        """
+        Add value to a counter, e.g. "requests", "bytes" (received from
+        the network) or "cache_hits"
+
+        :param str name:
+        :param int value=1:
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record_status(self, status):
+        """
+        :param int status: HTTP status of a response
+        """
+        with self._lock:
+            self._status[status] = self._status.get(status, 0) + 1
+
+    def observe(self, stage, seconds):
+        """
+        Record a latency of the stage
+
+        :param str stage:
+        :param float seconds:
+        """
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.max_samples)
+                self._totals[stage] = [0, 0.0]
+            samples.append(seconds)
+            self._totals[stage][0] += 1
+            self._totals[stage][1] += seconds
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Record the time spent in the with block as a latency of the stage
+
+        :param str stage:
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def get_counter(self, name):
+        """
+        :param str name:
+        :rtype: int
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """
+        Return all the metrics as a plain dict
+
+        :rtype: dict
+        """
+        with self._lock:
+            latency = {}
+            for stage, samples in self._samples.items():
+                count, total = self._totals[stage]
+                ordered = sorted(samples)
+                stats = {"count": count, "sum": total, "max": ordered[-1]}
+                for q in QUANTILES:
+                    stats["p{:g}".format(q * 100)] = _percentile(ordered, q)
+                latency[stage] = stats
+
+            return {
+                "uptime": time.time() - self.started,
+                "counters": dict(self._counters),
+                "http_status": {str(status): n for status, n in sorted(self._status.items())},
+                "latency": latency,
+            }
+
+    def to_json(self):
+        """
+        :rtype: str
+        """
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix="ted_scraper"):
+        """
+        Return the metrics in the Prometheus text exposition format
+
+        :param str prefix="ted_scraper": metric name prefix
+        :rtype: str
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = "{}_{}_total".format(prefix, name)
+            lines.append("# TYPE {} counter".format(metric))
+            lines.append("{} {}".format(metric, value))
+
+        metric = "{}_http_status_total".format(prefix)
+        lines.append("# TYPE {} counter".format(metric))
+        for status, n in snapshot["http_status"].items():
+            lines.append('{}{{code="{}"}} {}'.format(metric, status, n))
+
+        metric = "{}_latency_seconds".format(prefix)
+        lines.append("# TYPE {} summary".format(metric))
+        for stage, stats in sorted(snapshot["latency"].items()):
+            for q in QUANTILES:
+                lines.append('{}{{stage="{}",quantile="{:g}"}} {:.6f}'.format(
+                    metric, stage, q, stats["p{:g}".format(q * 100)]))
+            lines.append('{}_sum{{stage="{}"}} {:.6f}'.format(metric, stage, stats["sum"]))
+            lines.append('{}_count{{stage="{}"}} {}'.format(metric, stage, stats["count"]))
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, format="prometheus"):
+        """
+        Atomically write the metrics to a file
+
+        :param str path:
+        :param str format="prometheus": "prometheus" or "json"
+        """
+        if format == "prometheus":
+            text = self.to_prometheus()
+        elif format == "json":
+            text = self.to_json()
+        else:
+            raise ValueError("unknown metrics format: {}".format(format))
+
+        path = os.path.expanduser(path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class MetricsWriter:
+    """
+    Background thread writing the metrics to a file every interval seconds,
+    e.g. for the node exporter textfile collector
+    """
+
+    def __init__(self, metrics, path, interval=10.0, format="prometheus"):
+        """
+        :param Metrics metrics:
+        :param str path:
+        :param float interval=10.0: seconds between writes
+        :param str format="prometheus": "prometheus" or "json"
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.format = format
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the thread and write the final metrics
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.metrics.write(self.path, self.format)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.write(self.path, self.format)
+
+
+def _percentile(ordered, q):
+    """
+    Return the q-quantile of sorted samples, by nearest rank
+
+    :param list ordered:
+    :param float q:
+    :rtype: float
+    """
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import re
+
+from collections import namedtuple
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, urlencode
+
+
+# a talk as listed on a talk list page
+TalkListing = namedtuple("TalkListing", ["title", "link", "posted_date"])
+
+# sentinel time list of a transcript without time data
+NO_TIME_DATA = "no time data found."
+
+PAGE_KINDS = ("list", "talk", "transcript")
+
+
+def list_page_number(url):
+    """
+    Return the page number of a talk list page URL like ".../talks?page=3",
+    or None if the URL has no page number
+
+    :param str url:
+    :rtype: int
+    """
+    try:
+        return int(parse_qs(urlparse(url).query)["page"][0])
+    except (KeyError, ValueError):
+        return None
+
+
+def list_page_url(base_url, page):
+    """
+    Return the URL of the page-th talk list page
+
+    :param str base_url: URL of the first talk list page
+    :param int page:
+    :rtype: str
+    """
+    parts = urlparse(base_url)
+    query = parse_qs(parts.query)
+    query["page"] = [str(page)]
+    return urlunparse(parts._replace(query=urlencode(query, doseq=True)))
+
+
+def convert_date2str(date):
+    """
+    Convert a posted date like "Jan 2017" to "2017-01-01"
+
+    :param str date:
+    :rtype: str
+    """
+    tdatetime = datetime.datetime.strptime(date, "%b %Y")
+    return tdatetime.strftime("%Y-%m-%d")
+
+
+class Parser:
+    """
+    Base class of the parser backends.
+
+    A backend turns the HTML of a TED page into a plain dict holding the
+    fields the scraper needs, so the result can be cached, pickled and sent
+    between processes:
+
+    * list page: ``{"talks": [TalkListing, ...], "next_link": str or None,
+      "last_page": int or None}``
+    * talk page: ``{"topics": [str, ...]}``
+    * transcript page: ``{"transcript": [str, ...], "time": [str, ...],
+      "languages": [str, ...] or None}``
+    """
+
+    name = None
+
+    def parse(self, kind, html, base_url):
+        """
+        Parse the page of the given kind
+
+        :param str kind: one of PAGE_KINDS
+        :param bytes html:
+        :param str base_url: URL the relative links are resolved against
+        :rtype: dict
+        """
+        if kind == "list":
+            return self.parse_list_page(html, base_url)
+        if kind == "talk":
+            return self.parse_talk_page(html)
+        if kind == "transcript":
+            return self.parse_transcript_page(html)
+        raise ValueError("unknown page kind: {}".format(kind))
+
+    def parse_list_page(self, html, base_url):
+        raise NotImplementedError
+
+    def parse_talk_page(self, html):
+        raise NotImplementedError
+
+    def parse_transcript_page(self, html):
+        raise NotImplementedError
+
+
+class SoupParser(Parser):
+    """
+    Backend building a BeautifulSoup tree with the lxml parser.
+
+    With ``strainer=True`` only the subtrees holding the needed nodes are
+    built, which cuts parse time and memory on large transcript pages.
+    """
+
+    name = "soup"
+
+    def __init__(self, strainer=False):
+        """
+        :param bool strainer=False: build only the relevant subtrees
+        """
+        self.strainer = strainer
+        if strainer:
+            self.name = "strainer"
+
+    def make_soup(self, html, kind=None):
+        """
+        Return BeautifulSoup instance of the page
+
+        :param bytes html:
+        :param str kind=None: page kind used to choose the strainer
+        :rtype: bs4.BeautifulSoup
+        """
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        parse_only = None
+        if self.strainer and kind == "list":
+            parse_only = SoupStrainer("div", {"class": _class_pattern("talk-link", "pagination")})
+        elif self.strainer and kind == "talk":
+            parse_only = SoupStrainer("div", {"class": _class_pattern("talk-topics")})
+        elif self.strainer and kind == "transcript":
+            parse_only = SoupStrainer(["p", "select"], {"class": _class_pattern(
+                "talk-transcript__para", "talk-transcript__language")})
+
+        return BeautifulSoup(html, "lxml", parse_only=parse_only)
+
+    def parse_list_page(self, html, base_url):
+        soup = self.make_soup(html, "list")
+        return {
+            "talks": SoupParser.talk_listings(soup, base_url),
+            "next_link": SoupParser.next_link(soup, base_url),
+            "last_page": SoupParser.last_page(soup, base_url),
+        }
+
+    def parse_talk_page(self, html):
+        soup = self.make_soup(html, "talk")
+        return {"topics": SoupParser.talk_topics(soup)}
+
+    def parse_transcript_page(self, html):
+        soup = self.make_soup(html, "transcript")
+        try:
+            languages = SoupParser.transcript_languages(soup)
+        except AttributeError:
+            languages = None
+
+        return {
+            "transcript": SoupParser.transcript(soup),
+            "time": SoupParser.transcript_time(soup),
+            "languages": languages,
+        }
+
+    @staticmethod
+    def talk_listings(soup, base_url):
+        """
+        Return the talks of the talk list page
+
+        :param bs4.BeautifulSoup soup:
+        :param str base_url:
+        :rtype: list of TalkListing
+        """
+        listings = []
+        for tl in soup.find_all("div", {"class": "talk-link"}):
+            talk_a = tl.find("h4", {"class": "h9"}).find("a")
+            posted_date = tl.find("div", {"class": "meta"}).find(
+                "span", {"class": "meta__val"}).get_text().strip()
+            listings.append(TalkListing(
+                title=talk_a.get_text().strip(),
+                link=urljoin(base_url, talk_a.attrs['href']),
+                posted_date=convert_date2str(posted_date)))
+
+        return listings
+
+    @staticmethod
+    def next_link(soup, base_url):
+        """
+        Return the link to the next talk list, or None on the last page
+
+        :param bs4.BeautifulSoup soup:
+        :param str base_url:
+        :rtype: str
+        """
+        pagination_div = soup.find("div", {"class": "pagination"})
+        if pagination_div is None:
+            return None
+
+        next_link_a = pagination_div.find("a", {"class": "pagination__next"})
+        if next_link_a is None:
+            return None
+
+        return urljoin(base_url, next_link_a.attrs['href'])
+
+    @staticmethod
+    def last_page(soup, base_url):
+        """
+        Return the largest page number linked from the pagination,
+        or None if there is no numbered link
+
+        :param bs4.BeautifulSoup soup:
+        :param str base_url:
+        :rtype: int
+        """
+        pagination_div = soup.find("div", {"class": "pagination"})
+        if pagination_div is None:
+            return None
+
+        page_numbers = [list_page_number(urljoin(base_url, a.attrs['href']))
+                        for a in pagination_div.find_all("a", href=True)]
+        page_numbers = [n for n in page_numbers if n is not None]
+        return max(page_numbers) if page_numbers else None
+
+    @staticmethod
+    def talk_topics(soup):
+        """
+        Return the topics of the talk page
+
+        :param bs4.BeautifulSoup soup:
+        :rtype: list
+        """
+        talk_topics_div = soup.find("div", {"class": "talk-topics"})
+        talk_topics_items = talk_topics_div.find_all("li", {"class": "talk-topics__item"})
+
+        topic_list = []
+        for tti in talk_topics_items:
+            topic = tti.find("a")
+            if topic is not None:
+                topic_list.append(topic.get_text().strip())
+
+        return topic_list
+
+    @staticmethod
+    def transcript(soup):
+        """
+        Return the paragraphs of the transcript page
+
+        :param bs4.BeautifulSoup soup:
+        :rtype: list
+        """
+        paragraph_list = []
+        for ttp in soup.find_all("p", {"class": "talk-transcript__para"}):
+            tt = ttp.find("span", {"class": "talk-transcript__para__text"})
+            paragraph_list.append(tt.get_text().replace("\n", " "))
+
+        return paragraph_list
+
+    @staticmethod
+    def transcript_time(soup):
+        """
+        Return the time of each paragraph of the transcript page.
+        NO_TIME_DATA is appended if a paragraph has no time.
+
+        :param bs4.BeautifulSoup soup:
+        :rtype: list
+        """
+        time_list = []
+        for ttp in soup.find_all("p", {"class": "talk-transcript__para"}):
+            tt = ttp.find("data", {"class": "talk-transcript__para__time"})
+            if tt is None:
+                time_list.append(NO_TIME_DATA)
+                break
+            time_list.append(tt.get_text().replace("\n", " ").replace(" ", ""))
+
+        return time_list
+
+    @staticmethod
+    def transcript_languages(soup):
+        """
+        Return the language symbols the transcript is available in
+
+        :param bs4.BeautifulSoup soup:
+        :rtype: list
+        """
+        options = soup.find("select", {"class": "talk-transcript__language"}).find_all("option")
+        return [option.attrs["value"] for option in options]
+
+
+def _class_pattern(*names):
+    """
+    Return a regex matching a class attribute containing one of the classes.
+    While parsing, a strainer may see the whole attribute value like
+    "col xs-6 talk-link" instead of the single classes.
+
+    :param str names:
+    :rtype: re.Pattern
+    """
+    return re.compile(r"(^|\s)({})(\s|$)".format("|".join(re.escape(n) for n in names)))
+
+
+def _has_class(name):
+    """
+    Return an XPath predicate matching elements with the class,
+    like BeautifulSoup's class matching
+
+    :param str name:
+    :rtype: str
+    """
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')".format(name)
+
+
+class LxmlParser(Parser):
+    """
+    Backend extracting the fields with precompiled lxml XPath expressions,
+    without building a BeautifulSoup tree
+    """
+
+    name = "lxml"
+
+    def __init__(self, encoding="utf-8"):
+        """
+        :param str encoding="utf-8": encoding of the HTML pages
+        """
+        from lxml import etree
+
+        self.encoding = encoding
+        self._etree = etree
+
+        xp = etree.XPath
+        self._talk_links = xp("//div[{}]".format(_has_class("talk-link")))
+        self._talk_a = xp("(.//h4[{}])[1]".format(_has_class("h9")))
+        self._first_a = xp("(.//a)[1]")
+        self._meta_val = xp("(.//div[{}])[1]".format(_has_class("meta")))
+        self._meta_span = xp("(.//span[{}])[1]".format(_has_class("meta__val")))
+        self._pagination = xp("(//div[{}])[1]".format(_has_class("pagination")))
+        self._pagination_next = xp("(.//a[{}])[1]".format(_has_class("pagination__next")))
+        self._pagination_a = xp(".//a[@href]")
+        self._topics_div = xp("(//div[{}])[1]".format(_has_class("talk-topics")))
+        self._topics_items = xp(".//li[{}]".format(_has_class("talk-topics__item")))
+        self._paras = xp("//p[{}]".format(_has_class("talk-transcript__para")))
+        self._para_text = xp("(.//span[{}])[1]".format(_has_class("talk-transcript__para__text")))
+        self._para_time = xp("(.//data[{}])[1]".format(_has_class("talk-transcript__para__time")))
+        self._language = xp("(//select[{}])[1]".format(_has_class("talk-transcript__language")))
+        self._options = xp(".//option")
+        # like BeautifulSoup.get_text, without the code of script and style elements
+        self._texts = xp(".//text()[not(ancestor::script or ancestor::style)]", smart_strings=False)
+
+    def __getstate__(self):
+        return {"encoding": self.encoding}
+
+    def __setstate__(self, state):
+        self.__init__(state["encoding"])
+
+    def make_tree(self, html):
+        """
+        Return the lxml tree of the page
+
+        :param bytes html:
+        :rtype: lxml.etree._Element
+        """
+        parser = self._etree.HTMLParser(encoding=self.encoding)
+        if isinstance(html, str):
+            html = html.encode(self.encoding)
+        return self._etree.fromstring(html, parser)
+
+    def parse_list_page(self, html, base_url):
+        tree = self.make_tree(html)
+
+        listings = []
+        for tl in self._talk_links(tree):
+            talk_a = self._first_a(self._talk_a(tl)[0])[0]
+            posted_date = self._text(self._meta_span(self._meta_val(tl)[0])[0]).strip()
+            listings.append(TalkListing(
+                title=self._text(talk_a).strip(),
+                link=urljoin(base_url, talk_a.attrib['href']),
+                posted_date=convert_date2str(posted_date)))
+
+        next_link = None
+        last_page = None
+        pagination = self._pagination(tree)
+        if pagination:
+            next_a = self._pagination_next(pagination[0])
+            if next_a:
+                next_link = urljoin(base_url, next_a[0].attrib['href'])
+
+            page_numbers = [list_page_number(urljoin(base_url, a.attrib['href']))
+                            for a in self._pagination_a(pagination[0])]
+            page_numbers = [n for n in page_numbers if n is not None]
+            if page_numbers:
+                last_page = max(page_numbers)
+
+        return {"talks": listings, "next_link": next_link, "last_page": last_page}
+
+    def parse_talk_page(self, html):
+        tree = self.make_tree(html)
+
+        topics_div = self._topics_div(tree)
+        if not topics_div:
+            raise AttributeError("talk-topics not found")
+
+        topic_list = []
+        for tti in self._topics_items(topics_div[0]):
+            topic = self._first_a(tti)
+            if topic:
+                topic_list.append(self._text(topic[0]).strip())
+
+        return {"topics": topic_list}
+
+    def parse_transcript_page(self, html):
+        tree = self.make_tree(html)
+        paras = self._paras(tree)
+
+        paragraph_list = []
+        for ttp in paras:
+            tt = self._para_text(ttp)
+            if not tt:
+                raise AttributeError("talk-transcript__para__text not found")
+            paragraph_list.append(self._text(tt[0]).replace("\n", " "))
+
+        time_list = []
+        for ttp in paras:
+            tt = self._para_time(ttp)
+            if not tt:
+                time_list.append(NO_TIME_DATA)
+                break
+            time_list.append(self._text(tt[0]).replace("\n", " ").replace(" ", ""))
+
+        languages = None
+        select = self._language(tree)
+        if select:
+            languages = [option.attrib["value"] for option in self._options(select[0])]
+
+        return {"transcript": paragraph_list, "time": time_list, "languages": languages}
+
+    def _text(self, element):
+        """
+        Return the text of the element and its descendants, script and
+        style elements excepted
+
+        :param lxml.etree._Element element:
+        :rtype: str
+        """
+        return "".join(self._texts(element))
+
+
+def get_parser(parser=None):
+    """
+    Return the parser backend of the name, or the parser itself
+
+    :param parser: "soup", "strainer", "lxml", a Parser or None for "soup"
+    :rtype: Parser
+    """
+    if parser is None or parser == "soup":
+        return SoupParser()
+    if parser == "strainer":
+        return SoupParser(strainer=True)
+    if parser == "lxml":
+        return LxmlParser()
+    if isinstance(parser, Parser):
+        return parser
+    raise ValueError("unknown parser: {}".format(parser))
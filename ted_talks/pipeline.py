@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+
+
+_END = object()
+
+
+class _Raised:
+    """
+    Exception raised in a stage, re-raised in the consumer
+    """
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def background(iterable, maxsize=4):
+    """
+    Run the iterable in a background thread and yield its items through a
+    bounded queue. The producer runs at most maxsize items ahead of the
+    consumer, and an exception raised by the producer is re-raised in the
+    consumer. Closing the generator stops the producer and closes the
+    iterable, so the stages of a pipeline are shut down in turn.
+
+    :param iterable iterable:
+    :param int maxsize=4: queue size between the producer and the consumer
+    :rtype: generator
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    iterator = iter(iterable)
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Raised(e))
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        put(_END)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            if isinstance(item, _Raised):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+        thread.join()
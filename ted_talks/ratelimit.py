@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import email.utils
+import random
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+
+# statuses telling the client to slow down
+THROTTLE_CODES = (429, 503)
+
+# statuses worth retrying
+RETRY_CODES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value, now=None):
+    """
+    Return the delay in seconds of a Retry-After header, given either as
+    seconds or as an HTTP date, or None if it is missing or invalid
+
+    :param str value:
+    :param float now=None: current time, time.time() if None
+    :rtype: float
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+
+    now = time.time() if now is None else now
+    return max(0.0, date.timestamp() - now)
+
+
+class _HostBucket:
+    """
+    Token bucket of a host
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """
+    Adaptive per-host rate limiter.
+
+    Each host has a token bucket refilled at a rate of requests per second.
+    The rate grows additively while the responses are healthy and is cut
+    multiplicatively on 429/503 (AIMD), and no request is sent to a host
+    before the delay of its last Retry-After header.
+    """
+
+    def __init__(self, rate=2.0, min_rate=0.1, max_rate=20.0, increase=0.1,
+                 decrease=0.5, burst=1.0):
+        """
+        :param float rate=2.0: initial requests per second of each host
+        :param float min_rate=0.1:
+        :param float max_rate=20.0:
+        :param float increase=0.1: rate added on each healthy response
+        :param float decrease=0.5: factor the rate is multiplied by when throttled
+        :param float burst=1.0: seconds of requests a bucket can hold
+        """
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("rate must be in [min_rate, max_rate]: {}".format(rate))
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be in (0, 1): {}".format(decrease))
+
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """
+        Block until a request to the host of the URL is allowed
+
+        :param str url:
+        """
+        host = urlsplit(url).netloc
+        while True:
+            with self._lock:
+                bucket = self._get_bucket(host)
+                now = time.monotonic()
+                bucket.refill(now)
+
+                if now < bucket.blocked_until:
+                    wait = bucket.blocked_until - now
+                elif bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                else:
+                    wait = (1 - bucket.tokens) / bucket.rate
+
+            time.sleep(wait)
+
+    def on_success(self, url):
+        """
+        Increase the rate of the host additively
+
+        :param str url:
+        """
+        with self._lock:
+            bucket = self._get_bucket(urlsplit(url).netloc)
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+            bucket.capacity = max(1.0, bucket.rate * self.burst)
+
+    def on_throttle(self, url, retry_after=None):
+        """
+        Decrease the rate of the host multiplicatively and pause it for
+        retry_after seconds
+
+        :param str url:
+        :param float retry_after=None: delay of the Retry-After header
+        """
+        with self._lock:
+            bucket = self._get_bucket(urlsplit(url).netloc)
+            bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+            bucket.capacity = max(1.0, bucket.rate * self.burst)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            if retry_after is not None:
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+
+    def get_rate(self, url):
+        """
+        Return the current requests per second of the host of the URL
+
+        :param str url:
+        :rtype: float
+        """
+        with self._lock:
+            return self._get_bucket(urlsplit(url).netloc).rate
+
+    def _get_bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = _HostBucket(self.initial_rate, max(1.0, self.initial_rate * self.burst))
+            self._buckets[host] = bucket
+        return bucket
+
+
+class RetryPolicy:
+    """
+    Retry of transient errors with jittered exponential backoff
+    """
+
+    def __init__(self, max_retries=4, backoff=0.5, max_backoff=60.0, retry_codes=RETRY_CODES):
+        """
+        :param int max_retries=4: retries after the first attempt
+        :param float backoff=0.5: base delay in seconds
+        :param float max_backoff=60.0: max delay in seconds
+        :param tuple retry_codes: HTTP statuses retried
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_codes = retry_codes
+
+    def should_retry(self, attempt, status=None):
+        """
+        :param int attempt: 0 for the first attempt
+        :param int status=None: HTTP status, None for a network error
+        :rtype: bool
+        """
+        if attempt >= self.max_retries:
+            return False
+        return status is None or status in self.retry_codes
+
+    def get_delay(self, attempt, retry_after=None):
+        """
+        Return the delay before the next attempt: a random delay up to the
+        exponential backoff ("full jitter"), and at least retry_after
+
+        :param int attempt: 0 for the first attempt
+        :param float retry_after=None: delay of the Retry-After header
+        :rtype: float
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(self.max_backoff, retry_after))
+        return delay
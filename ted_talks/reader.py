@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+
+import glob
+import gzip
+import json
+import mmap
+import os
+import re
+import sqlite3
+
+from collections import OrderedDict
+from json.decoder import scanstring
+
+from ted_talks.sinks import list_shards
+
+
+# offset index of a dump directory, next to the dumped files
+INDEX_FILENAME = ".ted-corpus-index.db"
+
+_decoder = json.JSONDecoder()
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+def _object_members(text, start):
+    """
+    Yield (key, value start, value end, value) of each member of the JSON
+    object at start
+
+    :param str text:
+    :param int start: index of the opening brace
+    :rtype: generator
+    """
+    idx = _WS.match(text, start + 1).end()
+    if text[idx] == "}":
+        return
+
+    while True:
+        key, idx = scanstring(text, idx + 1)
+        idx = _WS.match(text, idx).end()
+        idx = _WS.match(text, idx + 1).end()  # after ":"
+        value, end = _decoder.raw_decode(text, idx)
+        yield key, idx, end, value
+
+        idx = _WS.match(text, end).end()
+        if text[idx] == "}":
+            return
+        idx = _WS.match(text, idx + 1).end()  # after ","
+
+
+def scan_record(text):
+    """
+    Return the talk info of a JSON record and the span of the transcript
+    of each language in the record, as (start, end) character indexes
+
+    :param str text: JSON object of a talk info
+    :rtype: tuple
+    """
+    start = _WS.match(text).end()
+    if text[start:start + 1] != "{":
+        raise ValueError("not a JSON object")
+
+    talk_info = {}
+    spans = {}
+    list_span = None
+    for key, value_start, value_end, value in _object_members(text, start):
+        talk_info[key] = value
+        if key != "transcript":
+            continue
+
+        if isinstance(value, dict):
+            for lang, lang_start, lang_end, paragraphs in _object_members(text, value_start):
+                if isinstance(paragraphs, list):
+                    spans[lang] = (lang_start, lang_end)
+        elif isinstance(value, list):
+            list_span = (value_start, value_end)
+
+    if list_span is not None:
+        # talk info of one language
+        spans[talk_info.get("talk_lang", "en")] = list_span
+    return talk_info, spans
+
+
+class CorpusReader:
+    """
+    Lazy reader of a dump directory of JSON files or JSON Lines shards.
+
+    The byte offset of each talk and of the transcript of each language in
+    the files is kept in an SQLite index cached in the directory, built on
+    first use and updated with update(). Opening an indexed corpus reads
+    nothing but the index; a talk or a single transcript is decoded on
+    demand from a memory map of its file, so only the bytes used are read.
+    A file rewritten since it was indexed is indexed again when read.
+    Compressed shards are indexed too, but read by decompressing them.
+
+    When a talk was dumped more than once, the record with the latest
+    update date is read, then the record with the most transcript
+    languages, then the last one, as JSONLinesSink readers keep the last
+    record of a talk. Readers are not shared between threads.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS files (
+        file_id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE NOT NULL,
+        mtime_ns INTEGER,
+        size INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS talks (
+        talk_link TEXT PRIMARY KEY,
+        file_id INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        talk_title TEXT,
+        posted_date TEXT,
+        update_date TEXT
+    );
+    CREATE TABLE IF NOT EXISTS languages (
+        talk_link TEXT NOT NULL,
+        language TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        PRIMARY KEY (talk_link, language)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS topics (
+        talk_link TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        PRIMARY KEY (topic, talk_link)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS talks_file ON talks(file_id, offset);
+    CREATE INDEX IF NOT EXISTS talks_posted_date ON talks(posted_date);
+    CREATE INDEX IF NOT EXISTS languages_language ON languages(language, talk_link);
+    """
+
+    def __init__(self, save_dir, index_path=None, max_open=64):
+        """
+        :param str save_dir: dump directory
+        :param str index_path=None: index file, INDEX_FILENAME in save_dir if None
+        :param int max_open=64: max files kept memory-mapped
+        """
+        self.save_dir = os.path.expanduser(save_dir)
+        if index_path is None:
+            index_path = os.path.join(self.save_dir, INDEX_FILENAME)
+        self.index_path = os.path.expanduser(index_path)
+        self.max_open = max_open
+
+        is_new = not os.path.exists(self.index_path)
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.executescript(CorpusReader.SCHEMA)
+        self._maps = OrderedDict()
+
+        if is_new:
+            self.update()
+
+    def update(self):
+        """
+        Index the files added or changed since the last update, and forget
+        the deleted files
+
+        :rtype: int
+        :return: number of files indexed
+        """
+        paths = self._list_files()
+
+        indexed = 0
+        for path in paths:
+            stat = os.stat(path)
+            row = self.conn.execute(
+                "SELECT mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+            if row != (stat.st_mtime_ns, stat.st_size):
+                self._index_file(path, stat)
+                indexed += 1
+
+        existing = set(paths)
+        forgotten = set()
+        for file_id, path in self.conn.execute("SELECT file_id, path FROM files").fetchall():
+            if path not in existing:
+                forgotten |= self._forget_file(file_id)
+                self.conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        self._restore(forgotten)
+
+        self.conn.commit()
+        return indexed
+
+    def _list_files(self):
+        """
+        Return the JSON files and the JSON Lines shards of the directory,
+        in the order their records are indexed
+
+        :rtype: list
+        """
+        paths = sorted(glob.glob(os.path.join(glob.escape(self.save_dir), "*.json")))
+        prefixes = set()
+        for path in glob.glob(os.path.join(glob.escape(self.save_dir), "*.jsonl*")):
+            match = re.match(r"(.+)-\d+\.jsonl(\.gz)?$", os.path.basename(path))
+            if match is not None:
+                prefixes.add(match.group(1))
+        for prefix in sorted(prefixes):
+            paths.extend(list_shards(self.save_dir, prefix))
+        return paths
+
+    def _index_file(self, path, stat):
+        """
+        Index the records of the file, replacing its previous rows
+        """
+        conn = self.conn
+        conn.execute(
+            "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime_ns=excluded.mtime_ns, size=excluded.size",
+            (path, stat.st_mtime_ns, stat.st_size))
+        file_id = conn.execute("SELECT file_id FROM files WHERE path = ?", (path,)).fetchone()[0]
+        forgotten = self._forget_file(file_id)
+        self._close_map(path)
+
+        for offset, data in self._iter_file_records(path):
+            record = self._scan_data(data)
+            if record is not None:
+                self._add_record(file_id, offset, len(data), *record)
+
+        # talks no longer in the file may still be in another one
+        indexed = {row[0] for row in conn.execute(
+            "SELECT talk_link FROM talks WHERE file_id = ?", (file_id,))}
+        self._restore(forgotten - indexed)
+
+    def _restore(self, talk_links):
+        """
+        Index again the talks whose record was forgotten with its file,
+        from the records of the other indexed files
+
+        :param set talk_links:
+        """
+        if not talk_links:
+            return
+
+        needles = [talk_link.encode("utf-8") for talk_link in talk_links]
+        for path in self._list_files():
+            row = self.conn.execute("SELECT file_id FROM files WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                continue
+            for offset, data in self._iter_file_records(path):
+                if not any(needle in data for needle in needles):
+                    continue
+                record = self._scan_data(data)
+                if record is not None and record[0]["talk_link"] in talk_links:
+                    self._add_record(row[0], offset, len(data), *record)
+
+    @staticmethod
+    def _scan_data(data):
+        """
+        Return the talk info and the transcript spans in bytes of a record,
+        or None if it is not a talk info
+
+        :param bytes data:
+        :rtype: tuple
+        """
+        try:
+            text = data.decode("utf-8")
+            talk_info, spans = scan_record(text)
+        except (ValueError, IndexError):
+            # not a talk info, or a line cut off by a crash
+            return None
+        if not isinstance(talk_info.get("talk_link"), str):
+            return None
+
+        if not data.isascii():
+            # character indexes to byte offsets
+            spans = {lang: (len(text[:s].encode("utf-8")), len(text[:e].encode("utf-8")))
+                     for lang, (s, e) in spans.items()}
+        return talk_info, spans
+
+    def _add_record(self, file_id, offset, length, talk_info, spans):
+        conn = self.conn
+        talk_link = talk_info["talk_link"]
+        update_date = talk_info.get("update_date") or ""
+
+        # like the transcript index, the record with the latest update date
+        # wins, then the one with the most languages, then the last one
+        row = conn.execute(
+            "SELECT update_date, (SELECT COUNT(*) FROM languages l "
+            "WHERE l.talk_link = t.talk_link) FROM talks t WHERE talk_link = ?",
+            (talk_link,)).fetchone()
+        if row is not None and (update_date, len(spans)) < tuple(row):
+            return
+
+        conn.execute(
+            "INSERT OR REPLACE INTO talks (talk_link, file_id, offset, length, talk_title, "
+            "posted_date, update_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (talk_link, file_id, offset, length, talk_info.get("talk_title"),
+             talk_info.get("posted_date"), update_date))
+
+        conn.execute("DELETE FROM languages WHERE talk_link = ?", (talk_link,))
+        conn.executemany(
+            "INSERT INTO languages (talk_link, language, offset, length) VALUES (?, ?, ?, ?)",
+            [(talk_link, lang, offset + start, end - start) for lang, (start, end) in spans.items()])
+        conn.execute("DELETE FROM topics WHERE talk_link = ?", (talk_link,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO topics (talk_link, topic) VALUES (?, ?)",
+            [(talk_link, topic) for topic in talk_info.get("talk_topics") or []])
+
+    def _forget_file(self, file_id):
+        """
+        Delete the talks read from the file and return their links
+        """
+        conn = self.conn
+        links = "SELECT talk_link FROM talks WHERE file_id = ?"
+        forgotten = {row[0] for row in conn.execute(links, (file_id,))}
+        conn.execute("DELETE FROM languages WHERE talk_link IN ({})".format(links), (file_id,))
+        conn.execute("DELETE FROM topics WHERE talk_link IN ({})".format(links), (file_id,))
+        conn.execute("DELETE FROM talks WHERE file_id = ?", (file_id,))
+        return forgotten
+
+    @staticmethod
+    def _iter_file_records(path):
+        """
+        Yield (offset, bytes) of each record of a JSON file or JSON Lines shard
+        """
+        if path.endswith(".json"):
+            with open(path, "rb") as f:
+                yield 0, f.read()
+            return
+
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            offset = 0
+            try:
+                for line in f:
+                    yield offset, line.rstrip(b"\n")
+                    offset += len(line)
+            except EOFError:
+                # gzip shard cut off by a crash
+                return
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM talks").fetchone()[0]
+
+    def __contains__(self, talk_link):
+        return self._locate(talk_link) is not None
+
+    def links(self):
+        """
+        Return the links of the talks, in the order of the files
+
+        :rtype: list
+        """
+        rows = self.conn.execute(
+            "SELECT t.talk_link FROM talks t JOIN files f ON f.file_id = t.file_id "
+            "ORDER BY f.path, t.offset")
+        return [row[0] for row in rows]
+
+    def get_languages(self, talk_link):
+        """
+        Return the languages the transcript of the talk is available in
+
+        :param str talk_link:
+        :rtype: list
+        """
+        rows = self.conn.execute(
+            "SELECT language FROM languages WHERE talk_link = ? ORDER BY offset", (talk_link,))
+        return [row[0] for row in rows]
+
+    def get(self, talk_link):
+        """
+        Return the talk info of the talk, decoding only its record
+
+        :param str talk_link:
+        :rtype: dict
+        """
+        location = self._locate(talk_link)
+        if location is None:
+            raise KeyError(talk_link)
+
+        path, offset, length = location
+        return json.loads(self._read(path, offset, length))
+
+    def get_transcript(self, talk_link, language):
+        """
+        Return the transcript paragraphs of the talk in the language,
+        decoding only the transcript, or None if not available
+
+        :param str talk_link:
+        :param str language:
+        :rtype: list
+        """
+        location = self._locate(talk_link, language)
+        if location is None:
+            return None
+
+        path, offset, length = location
+        return json.loads(self._read(path, offset, length))
+
+    def iter_talks(self, language=None, topic=None, posted_since=None, posted_until=None):
+        """
+        Yield the talk info of the talks with a transcript in the language,
+        tagged with the topic and posted in the date range, in the order of
+        the files
+
+        :param str language=None:
+        :param str topic=None:
+        :param str posted_since=None: "%Y-%m-%d"
+        :param str posted_until=None: "%Y-%m-%d"
+        :rtype: generator
+        """
+        for talk_link in self._find(language, topic, posted_since, posted_until):
+            yield self.get(talk_link)
+
+    def iter_transcripts(self, language, topic=None, posted_since=None, posted_until=None):
+        """
+        Yield (talk link, paragraphs) of the transcripts in the language,
+        decoding only the transcripts
+
+        :param str language:
+        :param str topic=None:
+        :param str posted_since=None: "%Y-%m-%d"
+        :param str posted_until=None: "%Y-%m-%d"
+        :rtype: generator
+        """
+        for talk_link in self._find(language, topic, posted_since, posted_until):
+            transcript = self.get_transcript(talk_link, language)
+            if transcript is not None:
+                yield talk_link, transcript
+
+    def _find(self, language, topic, posted_since, posted_until):
+        query = "SELECT t.talk_link FROM talks t JOIN files f ON f.file_id = t.file_id WHERE 1"
+        params = []
+        if language is not None:
+            query += " AND t.talk_link IN (SELECT talk_link FROM languages WHERE language = ?)"
+            params.append(language)
+        if topic is not None:
+            query += " AND t.talk_link IN (SELECT talk_link FROM topics WHERE topic = ?)"
+            params.append(topic)
+        if posted_since is not None:
+            query += " AND t.posted_date >= ?"
+            params.append(posted_since)
+        if posted_until is not None:
+            query += " AND t.posted_date <= ?"
+            params.append(posted_until)
+        query += " ORDER BY f.path, t.offset"
+
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def _locate(self, talk_link, language=None):
+        """
+        Return (path, offset, length) of the talk, or of its transcript in
+        the language, indexing its file again if it changed since
+
+        :rtype: tuple
+        """
+        for _ in range(2):
+            if language is None:
+                query = "SELECT f.path, f.mtime_ns, f.size, t.offset, t.length FROM talks t " \
+                        "JOIN files f ON f.file_id = t.file_id WHERE t.talk_link = ?"
+                row = self.conn.execute(query, (talk_link,)).fetchone()
+            else:
+                query = "SELECT f.path, f.mtime_ns, f.size, l.offset, l.length FROM languages l " \
+                        "JOIN talks t ON t.talk_link = l.talk_link " \
+                        "JOIN files f ON f.file_id = t.file_id " \
+                        "WHERE l.talk_link = ? AND l.language = ?"
+                row = self.conn.execute(query, (talk_link, language)).fetchone()
+            if row is None:
+                return None
+
+            path, mtime_ns, size, offset, length = row
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self.update()
+                continue
+            if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+                return path, offset, length
+
+            print("[ INDEX ] file changed: {}".format(path))
+            self._index_file(path, stat)
+            self.conn.commit()
+        return None
+
+    def _read(self, path, offset, length):
+        """
+        Return the bytes of the file in the span
+        """
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+
+        mm = self._maps.get(path)
+        if mm is None:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = mm
+            if len(self._maps) > self.max_open:
+                _, oldest = self._maps.popitem(last=False)
+                oldest.close()
+        else:
+            self._maps.move_to_end(path)
+        return mm[offset:offset + length]
+
+    def _close_map(self, path):
+        mm = self._maps.pop(path, None)
+        if mm is not None:
+            mm.close()
+
+    def close(self):
+        for mm in self._maps.values():
+            mm.close()
+        self._maps.clear()
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -6,11 +6,71 @@ import re
 import datetime
 import json
 import os
+import threading
 
-from urllib.request import urlopen
-from urllib.parse import urljoin
-from urllib.error import HTTPError
-from bs4 import BeautifulSoup
+from contextlib import contextmanager
+
+from urllib.error import HTTPError, URLError
+
+from ted_talks import pipeline
+from ted_talks.checkpoint import Checkpoint
+from ted_talks.fetcher import Fetcher
+from ted_talks.metrics import Metrics
+from ted_talks.parsers import TalkListing, NO_TIME_DATA, SoupParser, get_parser
+from ted_talks.parsers import list_page_number, list_page_url
+from ted_talks.session import get_default_session
+from ted_talks.sinks import JSONFileSink, read_jsonl
+from ted_talks.transcript import Transcript
+from ted_talks.workqueue import in_shard
+
+
+# statuses of a talk or transcript page which does not exist
+GONE_CODES = (404, 410)
+
+# parser backend of a parse worker process, see TEDScraper.parse_page
+_worker_parser = None
+
+
+def _init_parse_worker(parser):
+    """
+    Keep the parser backend in the parse worker process, so it is
+    unpickled and set up once per process instead of once per page
+
+    :param ted_talks.parsers.Parser parser:
+    """
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_in_worker(kind, html, base_url):
+    """
+    Extract the fields of the page in a parse worker process
+
+    :param str kind:
+    :param bytes html:
+    :param str base_url:
+    :rtype: dict
+    """
+    return _worker_parser.parse(kind, html, base_url)
+
+
+class PageFetchError(Exception):
+    """
+    A talk list page could not be fetched, after the retries of the session
+    """
+
+    def __init__(self, url, status=None):
+        """
+        :param str url:
+        :param int status=None: HTTP status, None for a network error
+        """
+        super().__init__(url, status)
+        self.url = url
+        self.status = status
+
+    def __str__(self):
+        reason = self.status if self.status is not None else "network error"
+        return "cannot fetch talk list page: {} ({})".format(self.url, reason)
 
 
 class TEDScraper:
@@ -18,13 +78,49 @@ class TEDScraper:
     BASE_URL = "https://www.ted.com/talks"
     LANG_URL = "https://www.ted.com/participate/translate/our-languages"
 
-    def __init__(self, lang="en"):
+    def __init__(self, lang="en", max_workers=1, per_host_limit=None, session=None,
+                 parser=None, parse_workers=None, languages=None, language_workers=1,
+                 metrics=None, base_url=None, compact_transcripts=False):
         """
         :param str url:
         :param str lang="en":
-        """
+        :param int max_workers=1: number of talks scraped concurrently
+        :param int per_host_limit=None: max concurrent requests per host
+        :param ted_talks.session.HTTPSession session=None: HTTP session used for requests
+        :param parser=None: parser backend, "soup" (default), "strainer", "lxml"
+            or a ted_talks.parsers.Parser instance
+        :param int parse_workers=None: number of processes parsing the pages,
+            parsed in the fetching thread if None
+        :param list languages=None: language symbols scraped with all
+            languages, every available language if None
+        :param int language_workers=1: number of transcript languages of a
+            talk fetched concurrently
+        :param ted_talks.metrics.Metrics metrics=None: metrics the crawl is
+            recorded to, a new one if None
+        :param str base_url=None: first talk list page, TEDScraper.BASE_URL
+            if None, e.g. to scrape a local stand-in of ted.com
+        :param bool compact_transcripts=False: hold the transcripts as
+            ted_talks.transcript.Transcript instead of lists of paragraphs,
+            to cut the memory of the talks in flight
+        """
+        if parse_workers is not None and parse_workers < 1:
+            raise ValueError("parse_workers must be at least 1: {}".format(parse_workers))
+
         self.lang = lang
-        self.target_url = TEDScraper.BASE_URL  # target url
+        self.fetcher = Fetcher(max_workers, per_host_limit)
+        # own fetcher, so the languages of a talk scraped in a worker of
+        # self.fetcher do not wait for a worker of the same pool
+        self.language_fetcher = Fetcher(language_workers)
+        self.languages = languages
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.session = session if session is not None else get_default_session()
+        self.parser = get_parser(parser)
+        self.parse_workers = parse_workers
+        self._parse_pool = None
+        self._parse_pool_lock = threading.Lock()
+        self.base_url = base_url if base_url is not None else TEDScraper.BASE_URL
+        self.compact_transcripts = compact_transcripts
+        self.target_url = self.base_url  # target url
         self.target_page_list_url = ""
         self.target_page_list = 0     # number of pages in the talk list
         self.target_page_num = 0      # number of talk pages
@@ -36,33 +132,194 @@ class TEDScraper:
         self.all_processing_time = 0  # executtion time
 
     @staticmethod
-    def make_soup(url):
+    def make_soup(url, session=None):
         """
         Return BeautifulSoup instance from URL
 
         :param str url:
+        :param ted_talks.session.HTTPSession session=None:
         :rtype: bs4.BeautifulSoup
         """
+        if session is None:
+            session = get_default_session()
+
         try:
-            with urlopen(url) as res:
-                # print("[DEBUG] in make_soup() : Found: {}".format(url))
-                html = res.read()
+            res = session.get(url)
+            # print("[DEBUG] in make_soup() : Found: {}".format(url))
+            html = res.body
 
         except HTTPError as e:
             print("[DEBUG] in make_soup() : Raise HTTPError exception:")
             print("[DEBUG] URL: {} {}".format(url, e))
             return None
 
+        from bs4 import BeautifulSoup
         return BeautifulSoup(html, "lxml")
 
+    def fetch_soup(self, url):
+        """
+        Return BeautifulSoup instance from URL,
+        respecting the per-host request limit of the scraper
+
+        :param str url:
+        :rtype: bs4.BeautifulSoup
+        """
+        with self.fetcher.host_slot(url):
+            return TEDScraper.make_soup(url, self.session)
+
+    def fetch_html(self, url):
+        """
+        Return the body of the URL, or None on HTTP error
+
+        :param str url:
+        :rtype: bytes
+        """
+        try:
+            return self._fetch_body(url)
+
+        except HTTPError as e:
+            print("[DEBUG] in fetch_html() : Raise HTTPError exception:")
+            print("[DEBUG] URL: {} {}".format(url, e))
+            return None
+
+    def _fetch_body(self, url):
+        """
+        Return the body of the URL, recording the request in the metrics.
+        Raise HTTPError once the retries of the session have run out.
+
+        :param str url:
+        :rtype: bytes
+        """
+        self.metrics.incr("requests")
+        try:
+            with self.fetcher.host_slot(url), self.metrics.timer("fetch"):
+                res = self.session.get(url)
+
+        except HTTPError as e:
+            self.metrics.record_status(e.code)
+            raise
+
+        except Exception:
+            self.metrics.incr("errors")
+            raise
+
+        self.metrics.record_status(res.status)
+        if res.from_cache:
+            self.metrics.incr("cache_hits")
+        else:
+            # as transferred, before decompression
+            self.metrics.incr("bytes", res.wire_size)
+        return res.body
+
+    def fetch_page(self, url, kind):
+        """
+        Fetch the page and extract its fields with the parser backend.
+        With compact_transcripts, the paragraphs and times of a transcript
+        page are held as one Transcript.
+
+        A talk or transcript page which does not exist (404, 410) gives
+        None, so the talk is scraped without it. Any other error of such a
+        page, e.g. a 5xx after the retries of the session, is raised, so the
+        talk is not dumped without it nor checkpointed as done. A talk list
+        page raises PageFetchError, as the crawl cannot go on without its
+        talks and next link.
+
+        :param str url:
+        :param str kind: "list", "talk" or "transcript"
+        :rtype: dict
+        """
+        try:
+            html = self._fetch_body(url)
+
+        except HTTPError as e:
+            print("[DEBUG] in fetch_page() : Raise HTTPError exception:")
+            print("[DEBUG] URL: {} {}".format(url, e))
+            if kind == "list":
+                raise PageFetchError(url, e.code) from e
+            if e.code in GONE_CODES:
+                return None
+            raise
+
+        except URLError as e:
+            if kind == "list":
+                raise PageFetchError(url) from e
+            raise
+
+        data = self.parse_page(html, kind)
+        if kind == "transcript" and self.compact_transcripts:
+            data = {"transcript": Transcript.from_page(data), "languages": data["languages"]}
+        return data
+
+    @staticmethod
+    def get_time_list(tr_data):
+        """
+        Return the paragraph times of the data of a transcript page
+
+        :param dict tr_data:
+        :rtype: list
+        """
+        if isinstance(tr_data["transcript"], Transcript):
+            return tr_data["transcript"].time_list()
+        return tr_data["time"]
+
+    def parse_page(self, html, kind):
+        """
+        Extract the fields of the page with the parser backend.
+        With parse_workers, the page is parsed in the process pool so that
+        parsing is not serialized with the network I/O by the GIL.
+
+        :param bytes html:
+        :param str kind: "list", "talk" or "transcript"
+        :rtype: dict
+        """
+        with self.metrics.timer("parse"):
+            if self.parse_workers is None:
+                return self.parser.parse(kind, html, self.base_url)
+
+            future = self._get_parse_pool().submit(
+                _parse_in_worker, kind, html, self.base_url)
+            return future.result()
+
+    def _get_parse_pool(self):
+        """
+        Return the parse process pool, started on first use. Each worker
+        process receives the parser backend once, when it starts.
+
+        :rtype: concurrent.futures.ProcessPoolExecutor
+        """
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._parse_pool = ProcessPoolExecutor(
+                    max_workers=self.parse_workers, initializer=_init_parse_worker,
+                    initargs=(self.parser,))
+            return self._parse_pool
+
+    def close(self):
+        """
+        Shut down the parse process pool
+        """
+        with self._parse_pool_lock:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     @staticmethod
-    def get_languages():
+    def get_languages(url=None, session=None):
         """
         Return available language, the symbol and number of talk
 
+        :param str url=None: languages page, TEDScraper.LANG_URL if None
+        :param ted_talks.session.HTTPSession session=None:
         :rtype list
         """
-        soup = TEDScraper.make_soup(TEDScraper.LANG_URL)
+        soup = TEDScraper.make_soup(url or TEDScraper.LANG_URL, session)
         lang_div = soup.find_all("div", {"class": "languages__list__language"})
 
         lang_info = []
@@ -81,6 +338,24 @@ class TEDScraper:
 
         return lang_info
 
+    @staticmethod
+    def get_top_languages(num, lang_info=None):
+        """
+        Return the symbols of the num languages with the most talks
+
+        :param int num:
+        :param list lang_info=None: result of get_languages(), fetched if None
+        :rtype: list
+        """
+        if lang_info is None:
+            lang_info = TEDScraper.get_languages()
+
+        def talk_count(li):
+            return int(li["lang_talks"]) if li["lang_talks"].isdigit() else 0
+
+        lang_info = sorted(lang_info, key=talk_count, reverse=True)
+        return [li["lang_symbol"] for li in lang_info[:num]]
+
     @staticmethod
     def get_transcript_url(s, lang="en"):
         """
@@ -100,6 +375,16 @@ class TEDScraper:
 
         return t_url
 
+    def get_talk_listings(self, ta_soup):
+        """
+        Return the title, link and posted date of each talk in the talk list
+        with a single pass over the talk list page
+
+        :param bs4.BeautifulSoup ta_soup:
+        :rtype: list of TalkListing
+        """
+        return SoupParser.talk_listings(ta_soup, self.base_url)
+
     def get_talk_titles(self, ta_soup):
         """
         Get talk title
@@ -107,29 +392,19 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: list
         """
-        talk_titles = ta_soup.find_all("div", {"class": "talk-link"})
-        talk_titles = [self._find_talk_title(tt) for tt in talk_titles]
-        return talk_titles
+        return [tl.title for tl in self.get_talk_listings(ta_soup)]
 
-    def get_all_talk_titles(self, all_talk_links):
+    def get_all_talk_titles(self, all_talk_links=None, metadata=None):
         """
-        Return a list of the titles of all talks
+        Return a list of the titles of all talks, a projection of
+        get_all_talk_metadata
 
-        :param list all_talk_links:
+        :param list all_talk_links: lists of talk links per talk list page,
+            all the talks if None
+        :param list metadata=None: result of get_all_talk_metadata, crawled if None
         :rtype: list
         """
-        all_talk_titles = []
-        for all_talk_link in all_talk_links:
-            for atl in all_talk_link:
-                self.target_url = atl
-                print("[DEBUG] get_all_talk_titles()\nTarget URL: {}".format(atl))
-                soup = TEDScraper.make_soup(atl)
-                title_list = self.get_talk_titles(soup)
-
-                all_talk_titles.append(title_list)
-                # time.sleep(1)
-
-        return all_talk_titles
+        return self._project_metadata("talk_title", all_talk_links, metadata)
 
     def get_talk_posted_date(self, ta_soup):
         """
@@ -138,29 +413,101 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: list
         """
-        posted_dates = ta_soup.find_all("div", {"class": "talk-link"})
-        posted_dates = [self._find_talk_posted_date(
-            tpd) for tpd in posted_dates]
-        posted_dates = [self._convert_date2str(tpd) for tpd in posted_dates]
+        return [tl.posted_date for tl in self.get_talk_listings(ta_soup)]
 
-        return posted_dates
+    def get_all_talk_posted_date(self, all_talk_links=None, metadata=None):
+        """
+        Return a list of posted dates for all talks, a projection of
+        get_all_talk_metadata
 
-    def get_all_talk_posted_date(self, all_talk_links):
+        :param list all_talk_links: lists of talk links per talk list page,
+            all the talks if None
+        :param list metadata=None: result of get_all_talk_metadata, crawled if None
+        :rtype: list
         """
-        Return a list of posted dates for all talks
+        return self._project_metadata("posted_date", all_talk_links, metadata)
 
-        :param list all_talk_links:
+    def get_all_talk_metadata(self, with_topics=True):
+        """
+        Return the metadata of all talks in one crawl: each talk list page
+        is fetched once, and each talk page once for the topics. Each item
+        is a dict of
+        * talk title
+        * talk link
+        * posted date
+        * talk topics (None if with_topics=False)
+        * URL of the talk list page of the talk
+
+        :param bool with_topics=True: fetch the talk pages for the topics
+        :rtype: list
+        """
+        return list(self.iter_talk_metadata(with_topics))
+
+    def iter_talk_metadata(self, with_topics=True):
+        """
+        Yield the metadata of each talk as soon as it has been scraped,
+        see get_all_talk_metadata
+
+        :param bool with_topics=True:
+        :rtype: generator
+        """
+        def iter_listings():
+            # a talk can shift to the next page while the list is walked
+            seen_links = set()
+            for ta_url, ta_data in self.iter_talk_list_pages():
+                for listing in ta_data["talks"]:
+                    if listing.link not in seen_links:
+                        seen_links.add(listing.link)
+                        yield ta_url, listing
+
+        def get_metadata(item):
+            ta_url, listing = item
+            talk_topics = None
+            if with_topics:
+                self.target_url = listing.link
+                print("[DEBUG] iter_talk_metadata()\nTarget URL: {}".format(listing.link))
+                ta_data = self.fetch_page(listing.link, "talk")
+                talk_topics = ta_data["topics"] if ta_data is not None else []
+
+            return {
+                "talk_title": listing.title,
+                "talk_link": listing.link,
+                "posted_date": listing.posted_date,
+                "talk_topics": talk_topics,
+                "page_url": ta_url,
+            }
+
+        if with_topics:
+            yield from self.fetcher.imap(get_metadata, iter_listings())
+        else:
+            yield from map(get_metadata, iter_listings())
+
+    def _project_metadata(self, field, all_talk_links=None, metadata=None):
+        """
+        Return a field of the talk metadata, as lists per talk list page,
+        in the order of all_talk_links if given. A talk no longer in the
+        talk list gives None.
+
+        :param str field:
+        :param list all_talk_links: lists of talk links per talk list page
+        :param list metadata=None: result of get_all_talk_metadata, crawled if None
         :rtype: list
         """
-        all_talk_posted_date = []
-        for all_talk_link in all_talk_links:
-            for atl in all_talk_links:
-                soup = TEDScraper.make_soup(atl)
-                posted_date = self.get_talk_posted_date(soup)
-                all_talk_posted_date.append(posted_date)
-                # time.sleep(1)
+        if metadata is None:
+            metadata = self.get_all_talk_metadata(with_topics=(field == "talk_topics"))
 
-        return all_talk_posted_date
+        if all_talk_links is None:
+            pages = []
+            page_url = None
+            for talk in metadata:
+                if not pages or talk["page_url"] != page_url:
+                    page_url = talk["page_url"]
+                    pages.append([])
+                pages[-1].append(talk[field])
+            return pages
+
+        by_link = {talk["talk_link"]: talk[field] for talk in metadata}
+        return [[by_link.get(atl) for atl in all_talk_link] for all_talk_link in all_talk_links]
 
     def get_talk_links(self, ta_soup):
         """
@@ -170,12 +517,7 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: List
         """
-        talk_links = ta_soup.find_all("div", {"class": "talk-link"})
-        talk_addresses = [self._find_talk_a(tl) for tl in talk_links]
-        talk_addresses = [urljoin(TEDScraper.BASE_URL, ta)
-                          for ta in talk_addresses]
-
-        return talk_addresses
+        return [tl.link for tl in self.get_talk_listings(ta_soup)]
 
     def get_all_talk_links(self):
         """
@@ -183,27 +525,83 @@ class TEDScraper:
 
         :rtype: list
         """
-        all_talk_links = []
-        page_counter = 1
-        target_url = TEDScraper.BASE_URL
+        return list(self.iter_talk_links())
 
-        while True:
-            soup = TEDScraper.make_soup(target_url)
-            talk_links = self.get_talk_links(soup)
-            all_talk_links.append(talk_links)
-            next_link = self.get_next_talk_list_a(soup)
+    def iter_talk_links(self):
+        """
+        Yield the list of the links to each talk of each talk list page,
+        as soon as the page has been fetched
 
-            if next_link is None:
-                break
+        :rtype: generator
+        """
+        for _, ta_data in self.iter_talk_list_pages():
+            yield [tl.link for tl in ta_data["talks"]]
+
+    def iter_talk_list_pages(self):
+        """
+        Yield the URL and the data of each talk list page, in order.
+
+        The page range is read from the pagination of the first page and the
+        other pages are fetched concurrently. If the pagination is not
+        recognized, the talk list is walked by following the next links.
+        A page which cannot be fetched raises PageFetchError.
+
+        :rtype: generator
+        """
+        ta_data = self.fetch_page(self.base_url, "list")
+        yield self.base_url, ta_data
+
+        page_list = self._get_talk_page_range(ta_data)
+        if page_list is None:
+            yield from self._follow_talk_list_pages(ta_data["next_link"])
+            return
+
+        print("[ FIND ] {} pages".format(len(page_list) + 1))
+        fetch_list_page = lambda pl: self.fetch_page(pl, "list")
+        yield from zip(page_list, self.fetcher.imap(fetch_list_page, page_list))
+
+    def _get_talk_page_range(self, ta_data):
+        """
+        Return the URLs of the talk list pages after the first one, computed
+        from the pagination of the first page, or None if the pagination
+        does not follow the ?page=k pattern
 
+        :param dict ta_data: data of the first talk list page
+        :rtype: list
+        """
+        next_link = ta_data["next_link"]
+        if next_link is None:
+            return []
+
+        last_page = ta_data.get("last_page")
+        if last_page is None or list_page_number(next_link) != 2:
+            return None
+        if next_link != list_page_url(self.base_url, 2):
+            return None
+
+        return [list_page_url(self.base_url, k) for k in range(2, last_page + 1)]
+
+    def _follow_talk_list_pages(self, next_link):
+        """
+        Walk the talk list from next_link by following the link to the next
+        page, and yield the URL and the data of each talk list page
+
+        :param str next_link:
+        :rtype: generator
+        """
+        page_counter = 1
+        target_url = next_link
+
+        while target_url is not None:
             page_counter += 1
             print("[ FIND ] Now page: {}".format(page_counter))
-            print("         {}".format(next_link))
+            print("         {}".format(target_url))
 
-            target_url = next_link
-            # time.sleep(1)
+            # print("[DEBUG] target_url: {}".format(target_url))
+            ta_data = self.fetch_page(target_url, "list")
+            yield target_url, ta_data
 
-        return all_talk_links
+            target_url = ta_data["next_link"]
 
     def get_all_talk_page_list(self):
         """
@@ -211,27 +609,70 @@ class TEDScraper:
 
         :rtype: list
         """
-        target_url = TEDScraper.BASE_URL
-        page_list = []
+        return [url for url, _ in self.iter_talk_list_pages()]
 
-        page_counter = 1
-        page_list.append(target_url)
+    def get_new_talk_listings(self, known_links):
+        """
+        Walk the talk list, which is ordered newest first, and return the
+        talks not in known_links. The pages are fetched one at a time by
+        following the next links, and pagination stops at the first talk
+        list page holding no new talk.
 
-        while True:
-            # print("[DEBUG] target_url: {}".format(target_url))
-            ta_soup = TEDScraper.make_soup(target_url)
-            next_link = self.get_next_talk_list_a(ta_soup)
+        :param set known_links: links of the talks already scraped
+        :rtype: list of TalkListing
+        """
+        def iter_pages():
+            ta_data = self.fetch_page(self.base_url, "list")
+            yield self.base_url, ta_data
+            yield from self._follow_talk_list_pages(ta_data["next_link"])
+
+        new_listings = []
+        seen_links = set(known_links)
+        for page_counter, (_, ta_data) in enumerate(iter_pages(), 1):
+            # a talk can shift to the next page while the list is walked
+            new_talks = [tl for tl in ta_data["talks"] if tl.link not in seen_links]
+            seen_links.update(tl.link for tl in new_talks)
+            new_listings.extend(new_talks)
 
-            if next_link is None:
+            if len(new_talks) == 0:
+                print("[ FIND ] No new talk in page: {}".format(page_counter))
                 break
 
-            page_counter += 1
-            print("[ FIND ] Now page: {}".format(page_counter))
-            print("         {}".format(next_link))
-            target_url = next_link
-            page_list.append(next_link)
+        return new_listings
 
-        return page_list
+    @staticmethod
+    def load_known_talk_links(save_dir, checkpoint=None):
+        """
+        Return the links of the talks already dumped in save_dir: the talks
+        recorded in the checkpoint and the talk_link of every JSON file and
+        JSON Lines shard in save_dir. Both are read, as a dump_all_talk_info_al
+        run restarts the checkpoint without removing the files.
+
+        :param str save_dir:
+        :param ted_talks.checkpoint.Checkpoint checkpoint=None:
+        :rtype: set
+        """
+        save_dir = os.path.expanduser(save_dir)
+        if checkpoint is None:
+            with Checkpoint(save_dir) as checkpoint:
+                known_links = set(checkpoint.completed_talks)
+        else:
+            known_links = set(checkpoint.completed_talks)
+
+        for filename in os.listdir(save_dir):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(save_dir, filename)) as f:
+                try:
+                    known_links.add(json.load(f)["talk_link"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+        for talk_info in read_jsonl(save_dir):
+            if isinstance(talk_info, dict) and "talk_link" in talk_info:
+                known_links.add(talk_info["talk_link"])
+
+        return known_links
 
     def get_next_talk_list_a(self, soup):
         """
@@ -240,18 +681,7 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: str
         """
-        pagination_div = soup.find("div", {"class": "pagination"})
-        next_link_a = pagination_div.find("a", {"class", "pagination__next"})
-
-        if next_link_a is None:
-            return None
-
-        next_link = next_link_a.attrs['href']
-        next_link = urljoin(TEDScraper.BASE_URL, next_link)
-
-        # print("next page url: {}".format(next_link))
-
-        return next_link
+        return SoupParser.next_link(soup, self.base_url)
 
     def get_talk_topics(self, ta_soup):
         """
@@ -260,42 +690,37 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: list
         """
+        return SoupParser.talk_topics(ta_soup)
 
-        talk_topics_items = self._find_talk_topics(ta_soup)
-        # print("[DEBUG] Now TEDScraper get_talk_topics() talk_topics_items = {}".format(talk_topics_items))
-
-        topic_list = []
-        for tti in talk_topics_items:
-            topic = tti.find("a")
-
-            if topic is not None:
-                topic = topic.get_text().strip()
-                # print("[DEBUG] Now TEDScraper get_talk_topics() topic = {}".format(topic))
-                topic_list.append(topic)
-
-        return topic_list
-
-    def get_all_talk_topics(self, all_talk_links):
+    def get_all_talk_topics(self, all_talk_links=None, metadata=None):
         """
-        Return a list of topics for all talks
+        Return a list of the topics of all talks, a projection of
+        get_all_talk_metadata
 
-        :param list all_talk_links:
+        :param list all_talk_links: lists of talk links per talk list page,
+            all the talks if None
+        :param list metadata=None: result of get_all_talk_metadata, crawled if None
         :rtype: list
         """
-        all_talk_topics = []
-        for all_talk_link in all_talk_links:
-            for atl in all_talk_link:
-                self.target_url = atl
-                print("[DEBUG] get_all_talk_topics()\nTarget URL: {}".format(atl))
-                ta_soup = TEDScraper.make_soup(atl)
-                topic_list = self.get_talk_topics(ta_soup)
+        return self._project_metadata("talk_topics", all_talk_links, metadata)
 
-                # print("[DEBUG] get_all_talk_topics()\nTopic List: {}".format(topic_list))
+    def iter_talk_topics(self, all_talk_links):
+        """
+        Yield the topics of each talk as soon as they have been scraped
 
-                all_talk_topics.append(topic_list)
-                # time.sleep(1)
+        :param list all_talk_links: lists of talk links per talk list page
+        :rtype: generator
+        """
+        def get_topic_list(atl):
+            self.target_url = atl
+            print("[DEBUG] iter_talk_topics()\nTarget URL: {}".format(atl))
+            ta_data = self.fetch_page(atl, "talk")
+            if ta_data is None:
+                return []
+            return ta_data["topics"]
 
-        return all_talk_topics
+        targets = [atl for all_talk_link in all_talk_links for atl in all_talk_link]
+        return self.fetcher.imap(get_topic_list, targets)
 
     def get_talk_transcript_time(self, tr_soup):
         """
@@ -304,23 +729,14 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: list
         """
-        time_list = []
         try:
-            talk_transcript_para = self._find_transcript_para(tr_soup)
-
-            for ttp in talk_transcript_para:
-                tt = self._find_transcript_time(ttp)
-                transcript_time = self._format_string(tt).replace(" ", "")
-                time_list.append(transcript_time)
-
-            return time_list
+            return SoupParser.transcript_time(tr_soup)
 
         except AttributeError as e:
             print(
                 "[DEBUG] in get_talk_transcript_time(): Raise AttributeError exception:")
             print("      {}".format(e))
-            time_list.append("no time data found.")
-            return time_list
+            return [NO_TIME_DATA]
 
     def get_all_talk_transcript_time(self, all_talk_links):
         """
@@ -329,18 +745,25 @@ class TEDScraper:
         :param list all_talk_links:
         :rtype: list
         """
-        all_talk_transcript_time = []
-        for all_talk_link in all_talk_links:
-            for atl in all_talk_link:
-                tr_url = TEDScraper.get_transcript_url(atl, self.lang)
-                self.target_url = tr_url
-                tr_soup = TEDScraper.make_soup(tr_url)
-                time_list = self.get_talk_transcript_time(tr_soup)
+        return list(self.iter_talk_transcript_time(all_talk_links))
 
-                all_talk_transcript_time.append(time_list)
-                # time.sleep(1)
+    def iter_talk_transcript_time(self, all_talk_links):
+        """
+        Yield the transcript time of each talk as soon as it has been scraped
 
-        return all_talk_transcript_time
+        :param list all_talk_links: lists of talk links per talk list page
+        :rtype: generator
+        """
+        def get_time_list(atl):
+            tr_url = TEDScraper.get_transcript_url(atl, self.lang)
+            self.target_url = tr_url
+            tr_data = self.fetch_page(tr_url, "transcript")
+            if tr_data is None:
+                return [NO_TIME_DATA]
+            return TEDScraper.get_time_list(tr_data)
+
+        targets = [atl for all_talk_link in all_talk_links for atl in all_talk_link]
+        return self.fetcher.imap(get_time_list, targets)
 
     def get_talk_transcrpit(self, tr_soup):
         """
@@ -349,17 +772,7 @@ class TEDScraper:
         :param bs4.BeautifulSoup soup:
         :rtype: list
         """
-        talk_transcript_para = self._find_transcript_para(tr_soup)
-        # print("[DEBUG] get_talk_transcript()\n Transcript Para: {}".format(talk_transcript_para))
-
-        paragraph_list = []
-        for ttp in talk_transcript_para:
-            tt = self._find_transcript_text(ttp)
-            transcript_text = self._format_string(tt)
-            # print("[DEBUG] get_talk_transcript()\n Transcript Text: {}".formattranscript_text)
-            paragraph_list.append(transcript_text)
-
-        return paragraph_list
+        return SoupParser.transcript(tr_soup)
 
     def get_all_talk_transcripts(self, all_talk_links):
         """
@@ -368,33 +781,46 @@ class TEDScraper:
         ;param list all_talk_links:
         ;rtype: list
         """
-        all_talk_transcripts = []
-        for all_talk_link in all_talk_links:
-            for atl in all_talk_link:
-                tr_url = TEDScraper.get_transcript_url(atl, self.lang)
-                self.target_url = tr_url
-
-                tr_soup = TEDScraper.make_soup(tr_url)
-                paragraph_list = self.get_talk_transcrpit(tr_soup)
+        return list(self.iter_transcripts(all_talk_links))
 
-                # print("[DEBUG] get_all_talk_transcripts()\nPara List: {}\n".format(paragraph_list))
+    def iter_transcripts(self, all_talk_links):
+        """
+        Yield the transcript of each talk as soon as it has been scraped
 
-                all_talk_transcripts.append(paragraph_list)
-                # time.sleep(1)
+        :param list all_talk_links: lists of talk links per talk list page
+        :rtype: generator
+        """
+        def get_paragraph_list(atl):
+            tr_url = TEDScraper.get_transcript_url(atl, self.lang)
+            self.target_url = tr_url
+            tr_data = self.fetch_page(tr_url, "transcript")
+            if tr_data is None:
+                return []
+            return tr_data["transcript"]
 
-        return all_talk_transcripts
+        targets = [atl for all_talk_link in all_talk_links for atl in all_talk_link]
+        return self.fetcher.imap(get_paragraph_list, targets)
 
-    def get_all_language_transcript(self, ta_url):
+    def get_all_language_transcript(self, ta_url, pages=None, languages=None):
         """
-        Get transcript of all languages available for target talk
+        Get transcript of all languages available for target talk.
+        The transcripts are fetched concurrently by language_workers.
 
         :param str talk_url:
+        :param TalkPages pages=None: pages of the talk already fetched
+        :param list languages=None: languages to get if available,
+            the languages of the scraper if None
         :rtype: dict
         """
+        if pages is None:
+            pages = TalkPages(self, ta_url)
+        if languages is None:
+            languages = self.languages
+
         t_dict = {}
 
         try:
-            available_lang = self.get_available_language(ta_url)
+            available_lang = self.get_available_language(ta_url, pages)
         except AttributeError as e:
             print(
                 "[DEBUG] in get_all_language_transcript(): Raise AttributeError exception:")
@@ -403,17 +829,23 @@ class TEDScraper:
             t_dict["none"] = "no transcript text found."
             return t_dict
 
+        if languages is not None:
+            available_lang = [al for al in available_lang if al in languages]
+
         lang_num = len(available_lang)
-        for i, al in enumerate(available_lang):
-            tr_url = TEDScraper.get_transcript_url(ta_url, al)
+
+        def get_transcript(args):
+            i, al = args
             print(
                 "                  [{:3}/{:3}] target language: {}".format(i + 1, lang_num, al))
             # print("[DEBUG] in get_all_language_transcript()")
             # print("[DEBUG] symbol: {:5} URL: {}\n".format(al, t_url))
+            return pages.transcript(al)
 
-            tr_soup = TEDScraper.make_soup(tr_url)
-            if tr_soup is not None:
-                t_dict[al] = self.get_talk_transcrpit(tr_soup)
+        results = self.language_fetcher.imap(get_transcript, enumerate(available_lang))
+        for al, tr_data in zip(available_lang, results):
+            if tr_data is not None:
+                t_dict[al] = tr_data["transcript"]
 
                 # [DEBUG] dump json file
                 # with open("./dump_files/talk_info_al" + str(num) + ".json", "w") as f:
@@ -421,105 +853,119 @@ class TEDScraper:
 
         return t_dict
 
-    def get_available_language(self, ta_url):
+    def get_available_language(self, ta_url, pages=None):
         """
         Get the language available for target talk
 
         :param str talk_url:
+        :param TalkPages pages=None: pages of the talk already fetched
         :rtype: list
         """
-        tr_url = TEDScraper.get_transcript_url(ta_url)
-        tr_soup = TEDScraper.make_soup(tr_url)
-        talk_transcript_language = self._find_transcript_language(tr_soup)
+        if pages is None:
+            pages = TalkPages(self, ta_url)
 
-        available_lang = []
-        for ttl in talk_transcript_language:
-            available_lang.append(ttl.attrs["value"])
+        tr_data = pages.transcript()
+        if tr_data is None or tr_data["languages"] is None:
+            raise AttributeError(
+                "transcript language not found: {}".format(ta_url))
 
-        return available_lang
+        return tr_data["languages"]
 
-    def dump_talk_info(self, ta_url, save_dir=None):
+    def dump_talk_info(self, ta_url, save_dir=None, checkpoint=None, sink=None):
         """
         Dump talk info of each talk from talk list as JSON file
 
         :param str url:
+        :param str save_dir:
+        :param ted_talks.checkpoint.Checkpoint checkpoint=None:
+            talks already done in the checkpoint are skipped
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
         """
-        # create save dir if not exist
-        if save_dir is None:
-            save_dir = "./dump_files"
-            if not os.path.isdir("dump_files"):
-                os.mkdir("dump_files")
-                print("[ CREATE ] create default dump dir ...")
-        else:
-            save_dir = os.path.expanduser(save_dir)
-            if not os.path.isdir(save_dir):
-                print("[ CREATE ] create dump dir: {}".format(save_dir))
-                os.makedirs(save_dir)
-
         self.target_url = ta_url
-        ta_soup = TEDScraper.make_soup(ta_url)
+        ta_data = self.fetch_page(ta_url, "list")
+
+        print("[ GET ] get talk posted dates, titles and links ...")
+        self.dump_talk_listings(ta_data["talks"], save_dir, checkpoint, sink)
+
+    def dump_talk_listings(self, talk_listings, save_dir=None, checkpoint=None, sink=None):
+        """
+        Dump talk info of each listed talk as JSON file
 
+        :param list talk_listings: TalkListing of the talks
+        :param str save_dir:
+        :param ted_talks.checkpoint.Checkpoint checkpoint=None:
+            talks already done in the checkpoint are skipped
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
+        """
+        save_dir = self._prepare_save_dir(save_dir)
+        talk_listings = self._skip_done_talks(talk_listings, checkpoint)
+
+        # dump each talk info as soon as it has been scraped
+        with self._open_sink(sink, save_dir) as sink:
+            for talk_info in self.iter_talk_info(talk_listings):
+                self._write_talk_info(sink, talk_info)
+
+                if checkpoint is not None:
+                    checkpoint.mark_talk_done(talk_info["talk_link"])
+
+    def iter_talk_info(self, talk_listings):
+        """
+        Scrape each listed talk and yield its talk info,
+        in the order of talk_listings
+
+        :param list talk_listings: TalkListing of the talks
+        :rtype: generator
+        """
         print("[ GET ] get scrape date ...")
         update_date = self._get_scrape_date()
-        print("[ GET ] get talk posted date ...")
-        talk_date = self.get_talk_posted_date(ta_soup)
-        print("[ GET ] get talk titles ...")
-        talk_titles = self.get_talk_titles(ta_soup)
-        print("[ GET ] get talk links ...")
-        talk_links = self.get_talk_links(ta_soup)
         print("[ GET ] get talk language ...")
         talk_lang = self.lang
 
-        talk_topics = []
-        talk_transcript = []
-        transcript_time = []
-
-        talk_num = len(talk_links)
+        talk_num = len(talk_listings)
         self.all_page_list = talk_num
 
-        print("[ GET ] get talk topics and transcripts ...")
-        for i, tl in enumerate(talk_links):
+        def scrape_talk(args):
+            i, listing = args
+            tl = listing.link
             self.target_page_num = i + 1
             self.target_url = tl
             print("  [{}/{}] Target URL: {}".format(i + 1, talk_num, tl))
-            ta_soup = TEDScraper.make_soup(tl)
+            with self.metrics.timer("talk"):
+                pages = TalkPages(self, tl)
 
-            print("          [ GET ] get talk topics")
-            talk_topics.append(self.get_talk_topics(ta_soup))
+                print("          [ GET ] get talk topics")
+                topics = pages.talk_topics()
 
-            print("          [ GET ] get talk transcript")
+                print("          [ GET ] get talk transcript")
 
-            tr_url = TEDScraper.get_transcript_url(tl, self.lang)
-            self.target_url = tr_url
-            print("          Target transcript URL: {}".format(tr_url))
-            tr_soup = TEDScraper.make_soup(tr_url)
+                tr_url = TEDScraper.get_transcript_url(tl, self.lang)
+                self.target_url = tr_url
+                print("          Target transcript URL: {}".format(tr_url))
+                tr_data = pages.transcript(self.lang)
 
-            talk_transcript.append(self.get_talk_transcrpit(tr_soup))
-            print("            [ GET ] get transcript time")
-            transcript_time.append(self.get_talk_transcript_time(tr_soup))
+                transcript = tr_data["transcript"] if tr_data is not None else []
+                print("            [ GET ] get transcript time")
+                t_time = pages.transcript_time(self.lang)
+
+                return topics, transcript, t_time
 
-        # dump talk info
-        print("[ DUMP ] dump talk info ...")
-        for date, title, link, topics, transcript, t_time in zip(talk_date, talk_titles, talk_links, talk_topics, talk_transcript, transcript_time):
-            talk_info = {
-                "posted_date": date,
+        print("[ GET ] get talk topics and transcripts ...")
+        results = self.fetcher.imap(scrape_talk, enumerate(talk_listings))
+        for listing, (topics, transcript, t_time) in zip(talk_listings, results):
+            yield {
+                "posted_date": listing.posted_date,
                 "update_date": update_date,
-                "talk_title": title,
-                "talk_link": link,
+                "talk_title": listing.title,
+                "talk_link": listing.link,
                 "talk_lang": talk_lang,
                 "talk_topics": topics,
                 "transcript": transcript,
                 "time": t_time
             }
 
-            filename = os.path.join(save_dir, title + ".json")
-            filename = self._format_filename(filename)
-
-            print("         dump file: {}".format(filename))
-            with open(filename, "w") as f:
-                json.dump(talk_info, f, indent=2)
-
-    def dump_talk_info_al(self, ta_url, save_dir=None):
+    def dump_talk_info_al(self, ta_url, save_dir=None, checkpoint=None, sink=None):
         """
         Dump the following talk info as JSON file
         * posted date
@@ -530,82 +976,119 @@ class TEDScraper:
         * transcript of all available languages
 
         :param str talk_url:
+        :param str save_dir:
+        :param ted_talks.checkpoint.Checkpoint checkpoint=None:
+            talks already done in the checkpoint are skipped
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
         """
-        # create save dir if not exist
-        if save_dir is None:
-            save_dir = "./dump_files"
-            if not os.path.isdir("dump_files"):
-                os.mkdir("dump_files")
-                print("[ CREATE ] create default dump dir ...")
-        else:
-            save_dir = os.path.expanduser(save_dir)
-            if not os.path.isdir(save_dir):
-                print("[ CREATE ] create dump dir: {}".format(save_dir))
-                os.makedirs(save_dir)
-
         self.target_url = ta_url
-        ta_soup = TEDScraper.make_soup(ta_url)
+        ta_data = self.fetch_page(ta_url, "list")
 
+        print("[ GET ] get talk posted dates, titles and links ...")
+        self.dump_talk_listings_al(ta_data["talks"], save_dir, checkpoint, sink)
+
+    def dump_talk_listings_al(self, talk_listings, save_dir=None, checkpoint=None, sink=None):
+        """
+        Dump talk info with transcripts of all available languages
+        of each listed talk as JSON file
+
+        :param list talk_listings: TalkListing of the talks
+        :param str save_dir:
+        :param ted_talks.checkpoint.Checkpoint checkpoint=None:
+            talks already done in the checkpoint are skipped
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
+        """
+        save_dir = self._prepare_save_dir(save_dir)
+        talk_listings = self._skip_done_talks(talk_listings, checkpoint)
+
+        # dump each talk info as soon as it has been scraped
+        with self._open_sink(sink, save_dir, all_language=True) as sink:
+            for talk_info in self.iter_talk_info_al(talk_listings):
+                self._write_talk_info(sink, talk_info)
+
+                if checkpoint is not None:
+                    checkpoint.mark_talk_done(talk_info["talk_link"])
+
+    def iter_talk_info_al(self, talk_listings):
+        """
+        Scrape each listed talk with transcripts of all available languages
+        and yield its talk info, in the order of talk_listings
+
+        :param list talk_listings: TalkListing of the talks
+        :rtype: generator
+        """
         print("[ GET ] get scrape date ...")
         update_date = self._get_scrape_date()
-        print("[ GET ] get talk posted date ...")
-        talk_date = self.get_talk_posted_date(ta_soup)
-        print("[ GET ] get talk titles ...")
-        talk_titles = self.get_talk_titles(ta_soup)
-        print("[ GET ] get talk links ...")
-        talk_links = self.get_talk_links(ta_soup)
-
-        talk_topics = []
-        talk_transcript = []
-        transcript_time = []
-
-        talk_num = len(talk_links)
+
+        talk_num = len(talk_listings)
         self.all_page_list = talk_num
 
-        print("[ GET ] get talk topics and transcripts ...")
-        for i, tl in enumerate(talk_links):
+        def scrape_talk(args):
+            i, listing = args
             self.target_page_num = i + 1
+            print("  [{}/{}] Target URL: {}".format(i + 1, talk_num, listing.link))
+            return self.scrape_talk_info_al(listing, update_date)
+
+        print("[ GET ] get talk topics and transcripts ...")
+        yield from self.fetcher.imap(scrape_talk, enumerate(talk_listings))
+
+    def scrape_talk_info_al(self, listing, update_date=None):
+        """
+        Scrape a listed talk with transcripts of all available languages
+
+        :param TalkListing listing:
+        :param str update_date=None: data collection date, today if None
+        :rtype: dict
+        """
+        if update_date is None:
+            update_date = self._get_scrape_date()
+
+        with self.metrics.timer("talk"):
+            tl = listing.link
             self.target_url = tl
-            print("  [{}/{}] Target URL: {}".format(i + 1, talk_num, tl))
-            ta_soup = TEDScraper.make_soup(tl)
+            pages = TalkPages(self, tl)
 
             print("          [ GET ] get talk topics")
-            talk_topics.append(self.get_talk_topics(ta_soup))
+            topics = pages.talk_topics()
 
             print("          [ GET ] get all language talk transcript")
-            talk_transcript.append(self.get_all_language_transcript(tl))
+            transcript = self.get_all_language_transcript(tl, pages)
 
             tr_url = TEDScraper.get_transcript_url(tl)
             self.target_url = tr_url
             print("          Target transcript URL: {}".format(tr_url))
-            tr_soup = TEDScraper.make_soup(tr_url)
-
             print("            [ GET ] get transcript time")
-            transcript_time.append(self.get_talk_transcript_time(tr_soup))
+            t_time = pages.transcript_time()
 
-        # dump talk info
-        print("[ DUMP ] dump talk info ... ")
-        for date, title, link, topics, transcript, t_time in zip(talk_date, talk_titles, talk_links, talk_topics, talk_transcript, transcript_time):
-
-            talk_info = {
-                "posted_date": date,
+            return {
+                "posted_date": listing.posted_date,
                 "update_date": update_date,
-                "talk_title": title,
-                "talk_link": link,
+                "talk_title": listing.title,
+                "talk_link": listing.link,
                 "talk_topics": topics,
                 "transcript": transcript,
                 "time": t_time
             }
 
-            title = title.replace("/", "_")
-            filename = os.path.join(save_dir, "al-" + title + ".json")
-            filename = self._format_filename(filename)
+    def iter_talks(self, all_language=False):
+        """
+        Walk the whole talk list and yield the talk info of each talk
+        as soon as it has been scraped
 
-            print("         dump file: {}".format(filename))
-            with open(filename, "w") as f:
-                json.dump(talk_info, f, indent=2)
+        :param bool all_language=False: include transcripts of all available languages
+        :rtype: generator
+        """
+        for ta_url, ta_data in self.iter_talk_list_pages():
+            self.target_page_list_url = ta_url
+            if all_language:
+                yield from self.iter_talk_info_al(ta_data["talks"])
+            else:
+                yield from self.iter_talk_info(ta_data["talks"])
 
-    def dump_all_talk_info_al(self, save_dir=None, page_list=None):
+    def dump_all_talk_info_al(self, save_dir=None, page_list=None, resume=False,
+                              queue_size=4, sink=None, shard=None, get_update_date=None):
         """
         For all talks, dump the following talk info as JSON file
         * posted date
@@ -615,27 +1098,87 @@ class TEDScraper:
         * talk topics
         * transcript of all available languages
 
-        :param list page_list:
+        The crawl is a pipeline: talk list pages are discovered, their talks
+        are scraped and the talk info is dumped in stages running
+        concurrently, connected by queues of queue_size items. Each talk
+        list page is fetched once.
+
+        The progress is recorded in a checkpoint in save_dir. With resume=True,
+        the talk list pages and talks completed by a previous run are skipped.
+        An error stopping the crawl is re-raised after printing the progress.
+
+        With shard=(i, N), only the i-th of N static partitions of the talks is
+        dumped, so N workers can split the crawl. Each shard keeps its own
+        checkpoint.
+
+        :param list page_list: talk list pages, discovered by following
+            the next links if None
         :param str save_dir:
-        """
+        :param bool resume=False: continue the previous run in save_dir
+        :param int queue_size=4: items buffered between the stages
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
+        :param tuple shard=None: (index, count) of the shard to dump,
+            see ted_talks.workqueue.parse_shard
+        :param callable get_update_date=None: function of a talk link
+            returning the data collection date of the talk, or None for
+            today, e.g. the archive date of a replayed crawl
+        """
+        save_dir = self._prepare_save_dir(save_dir)
+        checkpoint_filename = None
+        if shard is not None:
+            checkpoint_filename = ".ted-scraper-checkpoint-{}of{}.jsonl".format(*shard)
+        checkpoint = Checkpoint(save_dir, checkpoint_filename)
+        if not resume:
+            checkpoint.reset()
+
+        own_sink = sink is None
+        if own_sink:
+            sink = JSONFileSink(save_dir, all_language=True)
+
+        pages = talk_infos = None
         try:
             if page_list is None:
-                page_list = self.get_all_talk_page_list()
-
-            page_num = len(page_list)
-            self.all_talk_page_num = page_num
-
-            for i, pl in enumerate(page_list):
-                self.target_page_list_url = pl
-                self.start_time = time.time()
-                self.target_page_list = i + 1
-                print("[ PROGRESS ] {}/{} page".format(i + 1, page_num))
-                self.dump_talk_info_al(pl, save_dir)
+                page_list = checkpoint.page_list
+            if page_list is not None:
+                if checkpoint.page_list != page_list:
+                    checkpoint.set_page_list(page_list)
+                self.all_talk_page_num = len(page_list)
+
+            self.start_time = time.time()
+            update_date = self._get_scrape_date()
+
+            def scrape_talk(item):
+                pl, listing = item
+                if listing is None:
+                    return pl, None
+                print("  Target URL: {}".format(listing.link))
+                talk_update_date = None
+                if get_update_date is not None:
+                    talk_update_date = get_update_date(listing.link)
+                return pl, self.scrape_talk_info_al(listing, talk_update_date or update_date)
+
+            # discovered list pages -> talk listings -> scraped talk info -> dump
+            pages = pipeline.background(
+                self._iter_pipeline_pages(page_list, checkpoint), queue_size)
+            listings = self._iter_pipeline_listings(pages, checkpoint, shard)
+            talk_infos = pipeline.background(
+                self.fetcher.imap(scrape_talk, listings), queue_size)
+
+            for pl, talk_info in talk_infos:
+                if talk_info is not None:
+                    self._write_talk_info(sink, talk_info)
+                    checkpoint.mark_talk_done(talk_info["talk_link"])
+                    continue
+
+                # every talk of the page has been dumped
+                checkpoint.mark_page_done(pl)
                 self.end_time = time.time()
                 process_time = (self.end_time - self.start_time) / 60
-                print("[ TIME ] {:2.2f} [min]".format(process_time))
+                print("[ TIME ] {} {:2.2f} [min]".format(pl, process_time))
                 self.all_processing_time += process_time
-        except:
+                self.start_time = self.end_time
+        except Exception:
             self.end_time = time.time()
             process_time = (self.end_time - self.start_time) / 60
             self.all_processing_time += process_time
@@ -650,115 +1193,334 @@ class TEDScraper:
             print("        Process page:{:2}/{:2}".format(self.target_page_num, self.all_page_list))
 
             print("[DEBUG] Process time: {:2.2f} [min]".format(self.all_processing_time))
+            print("[DEBUG] Resume with resume=True and save_dir={}".format(save_dir))
+            raise
 
-    def _find_talk_posted_date(self, soup):
+        finally:
+            for stage in (talk_infos, pages):
+                if stage is not None:
+                    stage.close()
+            if own_sink:
+                sink.close()
+            checkpoint.close()
+
+    def _iter_pipeline_pages(self, page_list, checkpoint):
         """
-        Find the posted date from talk page
+        Discovery stage of dump_all_talk_info_al: yield the talk list pages
+        not done yet in the checkpoint, with their page data
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: str
+        :param list page_list: discovered by following the next links if None
+        :param ted_talks.checkpoint.Checkpoint checkpoint:
+        :rtype: generator
         """
-        return soup.find("div", {"class": "meta"}).find("span", {"class": "meta__val"}).get_text().strip()
+        if page_list is not None:
+            for i, pl in enumerate(page_list):
+                if checkpoint.is_page_done(pl):
+                    print("[ SKIP ] {}/{} page (done)".format(i + 1, len(page_list)))
+                    continue
+                self.target_url = pl
+                yield pl, self.fetch_page(pl, "list")
+            return
+
+        discovered = []
+        for pl, ta_data in self.iter_talk_list_pages():
+            discovered.append(pl)
+            self.all_talk_page_num = len(discovered)
+            if checkpoint.is_page_done(pl):
+                print("[ SKIP ] {} page (done)".format(len(discovered)))
+                continue
+            yield pl, ta_data
+
+        # the next run with resume=True does not have to discover them again
+        checkpoint.set_page_list(discovered)
+
+    def _iter_pipeline_listings(self, pages, checkpoint, shard=None):
+        """
+        Talk link extraction stage of dump_all_talk_info_al: yield
+        (page URL, TalkListing) for the talks of the shard not done yet,
+        followed by (page URL, None) at the end of each page
+
+        :param iterable pages: (page URL, page data) of the talk list pages
+        :param ted_talks.checkpoint.Checkpoint checkpoint:
+        :param tuple shard=None: (index, count)
+        :rtype: generator
+        """
+        queued_links = set()
+        for i, (pl, ta_data) in enumerate(pages):
+            self.target_page_list_url = pl
+            self.target_page_list = i + 1
+            print("[ PROGRESS ] {} page: {}".format(i + 1, pl))
+
+            # a talk shifted to the next page while the list is walked is
+            # queued once, even before the checkpoint records it as done
+            talk_listings = [tl for tl in ta_data["talks"]
+                             if in_shard(tl.link, shard) and tl.link not in queued_links]
+            talk_listings = self._skip_done_talks(talk_listings, checkpoint)
+            queued_links.update(tl.link for tl in talk_listings)
+
+            self.all_page_list = len(talk_listings)
+            for listing in talk_listings:
+                yield pl, listing
+            yield pl, None
+
+    def seed_work_queue(self, queue):
+        """
+        Add all talk list pages to the work queue. Only the first page is
+        fetched when the page range can be computed from it. Seeding the
+        same queue again, e.g. by every worker, adds nothing.
+
+        :param ted_talks.workqueue.WorkQueue queue:
+        :rtype: int, number of talk list pages
+        """
+        ta_data = self.fetch_page(self.base_url, "list")
+        page_list = self._get_talk_page_range(ta_data)
+        if page_list is None:
+            page_list = [pl for pl, _ in self._follow_talk_list_pages(ta_data["next_link"])]
+
+        page_list = [self.base_url] + page_list
+        queue.add(page_list)
+        print("[ QUEUE ] {} pages".format(len(page_list)))
+        return len(page_list)
+
+    def dump_queued_talk_info_al(self, queue, save_dir=None, sink=None):
+        """
+        Work on the talk list pages of the shared work queue until none is
+        left: claim a page, dump the talk info with all languages of its
+        talks and complete it. The lease is renewed before writing each talk,
+        and the page of a worker that died or stalled is claimed again once
+        its lease expires; the stalled worker then leaves the page.
+        A talk list page which cannot be fetched is marked as failed in the
+        queue and not claimed again.
+
+        :param ted_talks.workqueue.WorkQueue queue:
+        :param str save_dir:
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
+        :rtype: int, number of pages done by this worker
+        """
+        save_dir = self._prepare_save_dir(save_dir)
+        page_num = 0
+
+        with self._open_sink(sink, save_dir, all_language=True) as sink:
+            while True:
+                pl = queue.claim()
+                if pl is None:
+                    break
 
-    def _find_talk_a(self, soup):
+                self.target_page_list_url = pl
+                print("[ QUEUE ] claim page: {}".format(pl))
+                try:
+                    self.target_url = pl
+                    try:
+                        ta_data = self.fetch_page(pl, "list")
+                    except PageFetchError as e:
+                        # the page would fail in every worker claiming it again
+                        print("[ QUEUE ] {}".format(e))
+                        queue.fail(pl)
+                        continue
+
+                    talk_infos = self.iter_talk_info_al(ta_data["talks"])
+                    try:
+                        lease_lost = False
+                        for talk_info in talk_infos:
+                            # another worker owns the page once the lease has expired
+                            if not queue.renew(pl):
+                                lease_lost = True
+                                break
+                            self._write_talk_info(sink, talk_info)
+                    finally:
+                        talk_infos.close()
+                except BaseException:
+                    queue.release(pl)
+                    raise
+
+                if lease_lost:
+                    print("[ QUEUE ] lease lost: {}".format(pl))
+                elif queue.complete(pl):
+                    page_num += 1
+                else:
+                    print("[ QUEUE ] lease lost: {}".format(pl))
+
+        return page_num
+
+    def dump_new_talk_info_al(self, save_dir=None, known_links=None, sink=None):
+        """
+        Dump the talk info with all languages of the talks published since
+        the previous run only, without walking the whole talk list
+
+        :param str save_dir:
+        :param set known_links=None: links of the talks already scraped,
+            loaded from save_dir if None
+        :param ted_talks.sinks.Sink sink=None: output the talk info is
+            written to, one JSON file per talk in save_dir if None
         """
-        Find the talk link address from talk page
+        save_dir = self._prepare_save_dir(save_dir)
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: str
+        with Checkpoint(save_dir) as checkpoint:
+            if known_links is None:
+                known_links = TEDScraper.load_known_talk_links(save_dir, checkpoint)
+                # keep the talks found in the dump files as the state of the next run
+                checkpoint.mark_talks_done(known_links)
+
+            print("[ FIND ] {} known talks".format(len(known_links)))
+            new_listings = self.get_new_talk_listings(known_links)
+            print("[ FIND ] {} new talks".format(len(new_listings)))
+
+            self.dump_talk_listings_al(new_listings, save_dir, checkpoint, sink)
+
+    def _write_talk_info(self, sink, talk_info):
         """
-        return soup.find("h4", {"class": "h9"}).find("a").attrs['href']
+        Write the talk info to the sink, recording the write time
 
-    def _find_talk_title(self, soup):
+        :param ted_talks.sinks.Sink sink:
+        :param dict talk_info:
         """
-        Find the talk title from talk page
+        with self.metrics.timer("write"):
+            sink.write(talk_info)
+        self.metrics.incr("talks")
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: str
+    @contextmanager
+    def _open_sink(self, sink, save_dir, all_language=False):
         """
-        return soup.find("h4", {"class": "h9"}).find("a").get_text().strip()
+        Yield the sink, or a JSON file sink of save_dir closed on exit if None
 
-    def _find_talk_topics(self, soup):
+        :param ted_talks.sinks.Sink sink:
+        :param str save_dir:
+        :param bool all_language=False:
         """
-        Find the talk topics from talk page
+        if sink is not None:
+            yield sink
+            return
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: bs4.element.ResultSet
+        with JSONFileSink(save_dir, all_language) as sink:
+            yield sink
+
+    def _prepare_save_dir(self, save_dir):
         """
-        talk_topics_div = soup.find("div", {"class", "talk-topics"})
-        return talk_topics_div.find_all("li", {"class": "talk-topics__item"})
+        Return the dump directory, creating it if not exist
 
-    def _find_transcript_para(self, soup):
+        :param str save_dir: None for "./dump_files"
+        :rtype: str
         """
-        Find the talk transcript paragraph from transcript page
+        if save_dir is None:
+            save_dir = "./dump_files"
+            if not os.path.isdir("dump_files"):
+                os.mkdir("dump_files")
+                print("[ CREATE ] create default dump dir ...")
+        else:
+            save_dir = os.path.expanduser(save_dir)
+            if not os.path.isdir(save_dir):
+                print("[ CREATE ] create dump dir: {}".format(save_dir))
+                os.makedirs(save_dir)
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: bs4.element.ResultSet
+        return save_dir
+
+    def _skip_done_talks(self, talk_listings, checkpoint):
         """
-        return soup.find_all("p", {"class": "talk-transcript__para"})
+        Return the talks not yet done in the checkpoint
 
-    def _find_transcript_text(self, soup):
+        :param list talk_listings:
+        :param ted_talks.checkpoint.Checkpoint checkpoint:
+        :rtype: list
         """
-        Find the talk transcript text from paragraph
+        if checkpoint is None:
+            return talk_listings
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: bs4.element.ResultSet
+        todo = [tl for tl in talk_listings if not checkpoint.is_talk_done(tl.link)]
+        if len(todo) < len(talk_listings):
+            print("[ SKIP ] {} talks already done".format(len(talk_listings) - len(todo)))
+        return todo
+
+    def _get_scrape_date(self):
         """
-        return soup.find("span", {"class": "talk-transcript__para__text"})
+        Return the date on which scraping was performed
 
-    def _find_transcript_time(self, soup):
+        :rtype: datetime.date
         """
-        Find the transcript time from transcript page
+        today = datetime.date.today()
+        return today.strftime('%Y-%m-%d')
 
-        :param bs4.BeautifulSoup soup:
-        :rtype: bs4.element.ResultSet
+
+class TalkPages:
+    """
+    Pages needed to scrape one talk: the talk page and one transcript page
+    per language. Each page is fetched and parsed at most once, and the same
+    extracted data is shared by the topics, transcript, time and language
+    extraction.
+    """
+
+    def __init__(self, scraper, ta_url):
         """
-        return soup.find("data", {"class": "talk-transcript__para__time"})
+        :param TEDScraper scraper:
+        :param str ta_url: talk link
+        """
+        self.scraper = scraper
+        self.ta_url = ta_url
+        self._pages = {}
+        self._url_locks = {}
+        self._lock = threading.Lock()
 
-    def _find_transcript_language(self, tr_soup):
+    def talk(self):
         """
-        Find the transcrtip language from transcript page
+        Return the data of the talk page, or None on HTTP error
 
-        :param bs4.BeautifulSoup tr_soup:
-        :rtype: bs4.element.ResultSet
+        :rtype: dict
         """
-        return tr_soup.find("select", {"class": "talk-transcript__language"}).find_all("option")
+        return self.page(self.ta_url, "talk")
 
-    def _format_string(self, s):
+    def transcript(self, lang="en"):
         """
-        Return a formatted string
+        Return the data of the transcript page in the language,
+        or None on HTTP error
 
-        :param str s:
-        :rtype: str
+        :param str lang="en":
+        :rtype: dict
         """
-        return s.get_text().replace("\n", " ")
+        return self.page(TEDScraper.get_transcript_url(self.ta_url, lang), "transcript")
 
-    def _format_filename(self, s):
+    def talk_topics(self):
         """
-        Convert spaces in filenames to underscores
+        Return the topics of the talk
 
-        :param str s:
-        :rtype: str
+        :rtype: list
         """
-        return s.replace(" ", "_")
+        ta_data = self.talk()
+        if ta_data is None:
+            return []
+        return ta_data["topics"]
 
-    def _get_scrape_date(self):
+    def transcript_time(self, lang="en"):
         """
-        Return the date on which scraping was performed
+        Return the paragraph times of the transcript in the language
 
-        :rtype: datetime.date
+        :param str lang="en":
+        :rtype: list
         """
-        today = datetime.date.today()
-        return today.strftime('%Y-%m-%d')
+        tr_data = self.transcript(lang)
+        if tr_data is None:
+            return [NO_TIME_DATA]
+        return TEDScraper.get_time_list(tr_data)
 
-    def _convert_date2str(self, date):
+    def page(self, url, kind):
         """
-        Convert datetime to str
+        Return the data of the URL, fetching it on first use
 
-        :param str date:
-        :rtype: str
+        :param str url:
+        :param str kind: "talk" or "transcript"
+        :rtype: dict
+        """
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+
+        with url_lock:
+            if url not in self._pages:
+                self._pages[url] = self.scraper.fetch_page(url, kind)
+            return self._pages[url]
+
+    def fetched_urls(self):
+        """
+        Return the URLs fetched so far
+
+        :rtype: list
         """
-        tdatetime = datetime.datetime.strptime(date, "%b %Y")
-        tdatetime = tdatetime.strftime("%Y-%m-%d")
-        # print("[DEBUG] _convert_date2str() {}".format(tdatetime))
-        return tdatetime
+        return list(self._pages)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import threading
+import time
+import zlib
+
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.parse import urlsplit, urljoin
+from urllib.error import HTTPError, URLError
+
+import ted_talks
+
+from ted_talks.ratelimit import RateLimiter, RetryPolicy, THROTTLE_CODES, parse_retry_after
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class Response:
+    """
+    Response of an HTTP GET request with the decoded body
+    """
+
+    def __init__(self, url, status, headers, body, from_cache=False, wire_size=0):
+        """
+        :param str url: final URL after redirects
+        :param int status:
+        :param http.client.HTTPMessage headers:
+        :param bytes body: decompressed response body
+        :param bool from_cache=False: True if the body was served by the cache
+        :param int wire_size=0: bytes of the bodies received, compressed as
+            transferred and with the redirects, 0 if served by the cache
+        """
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.from_cache = from_cache
+        self.wire_size = wire_size
+
+
+class HTTPSession:
+    """
+    Reusable HTTP client keeping connections alive per host.
+
+    Requests ask for gzip/deflate transfer and the body is decoded
+    transparently. Connections are pooled per (scheme, host, port) and can be
+    shared between threads.
+
+    With a rate limiter, requests wait for the rate of their host, which
+    adapts to 429/503 responses. With a retry policy, network errors and
+    transient statuses are retried with jittered exponential backoff.
+    With an archive, every page fetched is also written to it, from the
+    network or from the cache.
+    """
+
+    def __init__(self, connect_timeout=10, read_timeout=30, pool_size=10,
+                 max_redirects=5, headers=None, cache=None, rate_limiter=None,
+                 retry=None, archive=None):
+        """
+        :param float connect_timeout=10: timeout in seconds to open a connection
+        :param float read_timeout=30: timeout in seconds to wait for data
+        :param int pool_size=10: max idle connections kept per host
+        :param int max_redirects=5:
+        :param dict headers=None: extra headers sent with each request
+        :param ted_talks.cache.HTTPCache cache=None: opt-in response cache
+        :param ted_talks.ratelimit.RateLimiter rate_limiter=None:
+        :param ted_talks.ratelimit.RetryPolicy retry=None:
+        :param ted_talks.archive.ArchiveWriter archive=None: archive of the
+            responses, fetched from the network or served by the cache
+        """
+        self.archive = archive
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.max_redirects = max_redirects
+        self.headers = {
+            "User-Agent": "ted-scraper/{}".format(ted_talks.__version__),
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+        if headers is not None:
+            self.headers.update(headers)
+
+        self._pool = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None):
+        """
+        Send a GET request and return the response, following redirects.
+        Raise HTTPError if the final status is 400 or more.
+
+        With a cache, fresh entries are returned without a request and stale
+        ones are revalidated with If-None-Match/If-Modified-Since.
+
+        :param str url:
+        :param dict headers=None: extra headers for this request
+        :rtype: Response
+        """
+        if self.cache is None:
+            return self._send(url, headers)
+
+        entry = self.cache.lookup(url)
+        if entry is None:
+            res = self._send(url, headers)
+        elif self.cache.is_fresh(entry):
+            self._archive_cached(entry, {})
+            return Response(url, 200, {}, entry.body, from_cache=True)
+        else:
+            cond_headers = entry.validators()
+            if headers is not None:
+                cond_headers.update(headers)
+            res = self._send(url, cond_headers)
+
+            if res.status == 304:
+                self._archive_cached(entry, res.headers)
+                self.cache.revalidated(entry)
+                return Response(res.url, 200, res.headers, entry.body, from_cache=True)
+
+        self.cache.store(url, res.body, res.headers.get("ETag"),
+                         res.headers.get("Last-Modified"))
+        return res
+
+    def _archive_cached(self, entry, headers):
+        """
+        Archive a page served by the cache, with the time it was fetched,
+        so the archive holds every page of the crawl
+
+        :param ted_talks.cache.CacheEntry entry:
+        :param headers: response headers, dict or http.client.HTTPMessage
+        """
+        if self.archive is None:
+            return
+
+        date = datetime.datetime.fromtimestamp(entry.stored_at, datetime.timezone.utc)
+        self.archive.write(entry.url, 200, headers, entry.body, date)
+
+    def _send(self, url, headers=None):
+        """
+        Send a GET request through the rate limiter, retrying transient
+        errors with the retry policy
+
+        :param str url:
+        :param dict headers=None:
+        :rtype: Response
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(url)
+
+            try:
+                res = self._get(url, headers)
+            except HTTPError as e:
+                retry_after = parse_retry_after(e.headers.get("Retry-After"))
+                if self.rate_limiter is not None and e.code in THROTTLE_CODES:
+                    self.rate_limiter.on_throttle(url, retry_after)
+                if self.retry is None or not self.retry.should_retry(attempt, e.code):
+                    raise
+                delay = self.retry.get_delay(attempt, retry_after)
+                print("[ RETRY ] {} {} in {:.1f} [sec]".format(url, e.code, delay))
+            except URLError as e:
+                if self.retry is None or not self.retry.should_retry(attempt):
+                    raise
+                delay = self.retry.get_delay(attempt)
+                print("[ RETRY ] {} {} in {:.1f} [sec]".format(url, e.reason, delay))
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success(url)
+                if self.archive is not None and res.status == 200:
+                    self.archive.write(url, res.status, res.headers, res.body)
+                return res
+
+            time.sleep(delay)
+            attempt += 1
+
+    def _get(self, url, headers=None):
+        """
+        Send a GET request without the cache and follow redirects
+
+        :param str url:
+        :param dict headers=None:
+        :rtype: Response
+        """
+        wire_size = 0
+        for _ in range(self.max_redirects + 1):
+            res = self._request(url, headers)
+            wire_size += res.wire_size
+            if res.status not in REDIRECT_CODES:
+                break
+
+            location = res.headers.get("Location")
+            if location is None:
+                break
+            url = urljoin(url, location)
+
+        if res.status >= 400:
+            raise HTTPError(res.url, res.status, "HTTP Error {}".format(res.status),
+                            res.headers, None)
+
+        res.wire_size = wire_size
+        return res
+
+    def close(self):
+        """
+        Close all the pooled connections
+        """
+        with self._lock:
+            pool, self._pool = self._pool, {}
+
+        for conns in pool.values():
+            for conn in conns:
+                conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _request(self, url, headers=None):
+        """
+        Send one GET request over a pooled connection
+
+        :param str url:
+        :param dict headers=None:
+        :rtype: Response
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        req_headers = dict(self.headers)
+        if headers is not None:
+            req_headers.update(headers)
+
+        # a pooled connection may have been closed by the server,
+        # so retry once on a fresh connection
+        for attempt in range(2):
+            conn, reused = self._acquire(key)
+            try:
+                conn.request("GET", path, headers=req_headers)
+                conn.sock.settimeout(self.read_timeout)
+                res = conn.getresponse()
+                body = res.read()
+            except (HTTPException, ConnectionError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise URLError(e)
+            except OSError as e:
+                conn.close()
+                raise URLError(e)
+
+            if res.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+
+            wire_size = len(body)
+            body = self._decode(body, res.getheader("Content-Encoding"))
+            return Response(url, res.status, res.msg, body, wire_size=wire_size)
+
+    def _acquire(self, key):
+        """
+        Return an idle connection of the host, or a new one
+
+        :param tuple key:
+        :rtype: tuple
+        """
+        with self._lock:
+            conns = self._pool.get(key)
+            if conns:
+                return conns.pop(), True
+
+        scheme, host, port = key
+        conn_class = HTTPSConnection if scheme == "https" else HTTPConnection
+        conn = conn_class(host, port, timeout=self.connect_timeout)
+        try:
+            conn.connect()
+        except OSError as e:
+            conn.close()
+            raise URLError(e)
+
+        return conn, False
+
+    def _release(self, key, conn):
+        """
+        Put the connection back to the pool of the host
+
+        :param tuple key:
+        :param http.client.HTTPConnection conn:
+        """
+        with self._lock:
+            conns = self._pool.setdefault(key, [])
+            if len(conns) < self.pool_size:
+                conns.append(conn)
+                return
+
+        conn.close()
+
+    def _decode(self, body, encoding):
+        """
+        Decompress the body according to Content-Encoding
+
+        :param bytes body:
+        :param str encoding:
+        :rtype: bytes
+        """
+        if encoding is None:
+            return body
+
+        encoding = encoding.strip().lower()
+        if encoding in ("gzip", "x-gzip"):
+            return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if encoding == "deflate":
+            try:
+                return zlib.decompress(body)
+            except zlib.error:
+                # raw deflate stream without zlib header
+                return zlib.decompress(body, -zlib.MAX_WBITS)
+
+        return body
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_default_session():
+    """
+    Return the session shared by scrapers created without one
+
+    :rtype: HTTPSession
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = HTTPSession(rate_limiter=RateLimiter(), retry=RetryPolicy())
+        return _default_session
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+
+from ted_talks.parsers import NO_TIME_DATA
+from ted_talks.transcript import Transcript, json_default
+
+
+class Sink:
+    """
+    Base class of the output sinks the dumped talk info is written to
+    """
+
+    def write(self, talk_info):
+        """
+        Write the talk info of a talk
+
+        :param dict talk_info:
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JSONFileSink(Sink):
+    """
+    One indented JSON file per talk, named after the talk title:
+    "<talk title>.json", or "al-<talk title>.json" with all languages
+    """
+
+    def __init__(self, save_dir, all_language=False):
+        """
+        :param str save_dir:
+        :param bool all_language=False: talk info with all languages
+        """
+        self.save_dir = save_dir
+        self.all_language = all_language
+
+    def write(self, talk_info):
+        filename = self.get_filename(talk_info)
+
+        print("[ DUMP ] dump file: {}".format(filename))
+        with open(filename, "w") as f:
+            json.dump(talk_info, f, indent=2, default=json_default)
+
+    def get_filename(self, talk_info):
+        """
+        Return the file name of the talk, with spaces converted to underscores
+
+        :param dict talk_info:
+        :rtype: str
+        """
+        title = talk_info["talk_title"]
+        if self.all_language:
+            title = "al-" + title.replace("/", "_")
+
+        filename = os.path.join(self.save_dir, title + ".json")
+        return filename.replace(" ", "_")
+
+
+class JSONLinesSink(Sink):
+    """
+    Append-only JSON Lines shards holding records_per_shard talks each,
+    "<prefix>-00000.jsonl" or "<prefix>-00000.jsonl.gz" when compressed.
+
+    Records are serialized compactly, one talk per line, and flushed after
+    each talk so a shard is readable up to the last written talk. Shards
+    already in save_dir are never overwritten: a new sink starts with the
+    next shard number, so a talk dumped twice appears in both shards and
+    readers should keep the last record of each talk_link.
+    """
+
+    def __init__(self, save_dir, prefix="talks", records_per_shard=1000, compress=False):
+        """
+        :param str save_dir:
+        :param str prefix="talks": shard file name prefix
+        :param int records_per_shard=1000: talks per shard
+        :param bool compress=False: gzip the shards
+        """
+        if records_per_shard < 1:
+            raise ValueError("records_per_shard must be at least 1: {}".format(records_per_shard))
+
+        self.save_dir = save_dir
+        self.prefix = prefix
+        self.records_per_shard = records_per_shard
+        self.compress = compress
+
+        shards = list_shards(save_dir, prefix)
+        self.shard_num = shard_number(shards[-1]) + 1 if shards else 0
+        self.record_num = 0
+        self._file = None
+
+    def write(self, talk_info):
+        if self._file is None or self.record_num >= self.records_per_shard:
+            self._rotate()
+
+        line = json.dumps(talk_info, separators=(",", ":"), default=json_default) + "\n"
+        self._file.write(line.encode("utf-8"))
+        self._file.flush()
+        self.record_num += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        """
+        Close the current shard and open the next one
+        """
+        self.close()
+
+        ext = ".jsonl.gz" if self.compress else ".jsonl"
+        filename = os.path.join(
+            self.save_dir, "{}-{:05d}{}".format(self.prefix, self.shard_num, ext))
+
+        print("[ DUMP ] dump shard: {}".format(filename))
+        if self.compress:
+            self._file = gzip.open(filename, "wb")
+        else:
+            self._file = open(filename, "wb")
+
+        self.shard_num += 1
+        self.record_num = 0
+
+
+class SQLiteSink(Sink):
+    """
+    SQLite database of the talks, their topics and the transcript paragraphs
+    of each language, indexed by language, topic and posted date.
+
+    A talk dumped again replaces its previous rows, so re-scrapes are upserts.
+    The rows of batch_size talks are committed in one transaction; with a
+    checkpoint keep batch_size=1, as a talk is marked done once written.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS talks (
+        talk_link TEXT PRIMARY KEY,
+        talk_title TEXT,
+        posted_date TEXT,
+        update_date TEXT,
+        talk_lang TEXT
+    );
+    CREATE TABLE IF NOT EXISTS topics (
+        talk_link TEXT NOT NULL REFERENCES talks(talk_link),
+        topic TEXT NOT NULL,
+        PRIMARY KEY (talk_link, topic)
+    );
+    CREATE TABLE IF NOT EXISTS transcripts (
+        talk_link TEXT NOT NULL REFERENCES talks(talk_link),
+        language TEXT NOT NULL,
+        para_num INTEGER NOT NULL,
+        text TEXT,
+        time TEXT,
+        PRIMARY KEY (talk_link, language, para_num)
+    );
+    CREATE INDEX IF NOT EXISTS talks_posted_date ON talks(posted_date);
+    CREATE INDEX IF NOT EXISTS topics_topic ON topics(topic);
+    CREATE INDEX IF NOT EXISTS transcripts_language ON transcripts(language, talk_link);
+    """
+
+    def __init__(self, path, batch_size=1):
+        """
+        :param str path: database file
+        :param int batch_size=1: talks committed per transaction
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1: {}".format(batch_size))
+
+        self.path = os.path.expanduser(path)
+        self.batch_size = batch_size
+        self.pending = 0
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLiteSink.SCHEMA)
+
+    def write(self, talk_info):
+        talk_link = talk_info["talk_link"]
+        conn = self.conn
+
+        conn.execute(
+            "INSERT INTO talks (talk_link, talk_title, posted_date, update_date, talk_lang) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(talk_link) DO UPDATE SET talk_title=excluded.talk_title, "
+            "posted_date=excluded.posted_date, update_date=excluded.update_date, "
+            "talk_lang=excluded.talk_lang",
+            (talk_link, talk_info.get("talk_title"), talk_info.get("posted_date"),
+             talk_info.get("update_date"), talk_info.get("talk_lang")))
+
+        conn.execute("DELETE FROM topics WHERE talk_link = ?", (talk_link,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO topics (talk_link, topic) VALUES (?, ?)",
+            [(talk_link, topic) for topic in talk_info.get("talk_topics", [])])
+
+        conn.execute("DELETE FROM transcripts WHERE talk_link = ?", (talk_link,))
+        conn.executemany(
+            "INSERT INTO transcripts (talk_link, language, para_num, text, time) "
+            "VALUES (?, ?, ?, ?, ?)",
+            SQLiteSink.transcript_rows(talk_info))
+
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.commit()
+
+    @staticmethod
+    def transcript_rows(talk_info):
+        """
+        Return the transcript paragraph rows of the talk info.
+        The time list belongs to talk_lang, or to English for the talk info
+        with all languages.
+
+        :param dict talk_info:
+        :rtype: list
+        """
+        talk_link = talk_info["talk_link"]
+        transcript = talk_info.get("transcript", [])
+        if isinstance(transcript, (list, Transcript)):
+            transcript = {talk_info.get("talk_lang", "en"): transcript}
+            time_lang = talk_info.get("talk_lang", "en")
+        else:
+            time_lang = "en"
+
+        times = [t for t in talk_info.get("time", []) if t != NO_TIME_DATA]
+
+        rows = []
+        for language, paragraphs in transcript.items():
+            if not isinstance(paragraphs, (list, Transcript)):
+                # "no transcript text found."
+                continue
+            for i, text in enumerate(paragraphs):
+                time = times[i] if language == time_lang and i < len(times) else None
+                rows.append((talk_link, language, i, text, time))
+        return rows
+
+    def commit(self):
+        """
+        Commit the talks written since the last commit
+        """
+        self.conn.commit()
+        self.pending = 0
+
+    def find_talks(self, language=None, topic=None, posted_since=None):
+        """
+        Return the links of the talks with a transcript in the language,
+        tagged with the topic and posted since the date, newest first
+
+        :param str language=None:
+        :param str topic=None:
+        :param str posted_since=None: "%Y-%m-%d"
+        :rtype: list
+        """
+        query = "SELECT talk_link FROM talks WHERE 1"
+        params = []
+        if language is not None:
+            query += " AND EXISTS (SELECT 1 FROM transcripts t WHERE t.language = ? " \
+                     "AND t.talk_link = talks.talk_link)"
+            params.append(language)
+        if topic is not None:
+            query += " AND talk_link IN (SELECT talk_link FROM topics WHERE topic = ?)"
+            params.append(topic)
+        if posted_since is not None:
+            query += " AND posted_date >= ?"
+            params.append(posted_since)
+        query += " ORDER BY posted_date DESC, talk_link"
+
+        return [row[0] for row in self.conn.execute(query, params)]
+
+    def get_transcript(self, talk_link, language):
+        """
+        Return the transcript paragraphs of the talk in the language
+
+        :param str talk_link:
+        :param str language:
+        :rtype: list
+        """
+        rows = self.conn.execute(
+            "SELECT text FROM transcripts WHERE talk_link = ? AND language = ? "
+            "ORDER BY para_num", (talk_link, language))
+        return [row[0] for row in rows]
+
+    def close(self):
+        if self.conn is not None:
+            self.commit()
+            self.conn.close()
+            self.conn = None
+
+
+def shard_number(filename):
+    """
+    Return the shard number of a JSON Lines shard file name
+
+    :param str filename:
+    :rtype: int
+    """
+    return int(re.search(r"-(\d+)\.jsonl(\.gz)?$", filename).group(1))
+
+
+def list_shards(save_dir, prefix="talks"):
+    """
+    Return the JSON Lines shards in save_dir, in shard order
+
+    :param str save_dir:
+    :param str prefix="talks":
+    :rtype: list
+    """
+    pattern = os.path.join(glob.escape(save_dir), glob.escape(prefix) + "-*.jsonl*")
+    shards = [s for s in glob.glob(pattern)
+              if re.search(r"-\d+\.jsonl(\.gz)?$", s)]
+    return sorted(shards, key=shard_number)
+
+
+def read_jsonl(save_dir, prefix="talks"):
+    """
+    Yield the talk info of every record in the JSON Lines shards of save_dir,
+    reading the shards sequentially. A line truncated by a crash is skipped.
+
+    :param str save_dir:
+    :param str prefix="talks":
+    :rtype: generator
+    """
+    for shard in list_shards(save_dir, prefix):
+        yield from read_shard(shard)
+
+
+def read_shard(shard):
+    """
+    Yield the talk info of every record in a JSON Lines shard.
+    A line truncated by a crash is skipped.
+
+    :param str shard: shard file
+    :rtype: generator
+    """
+    opener = gzip.open if shard.endswith(".gz") else open
+    with opener(shard, "rb") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line.decode("utf-8"))
+                except ValueError:
+                    continue
+        except EOFError:
+            # gzip shard cut off by a crash
+            return
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from array import array
+
+from ted_talks.parsers import NO_TIME_DATA
+
+
+_TIME_PATTERN = re.compile(r"^(?:(\d+):)?(\d+):(\d{2})$")
+
+
+def parse_time(time_str):
+    """
+    Return the milliseconds of a paragraph time like "0:12", "00:12" or
+    "1:02:03", or None if it is not a time
+
+    :param str time_str:
+    :rtype: int
+    """
+    match = _TIME_PATTERN.match(time_str)
+    if match is None:
+        return None
+
+    hours, minutes, seconds = match.groups()
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000
+
+
+def format_time(ms, minute_width=1):
+    """
+    Return the paragraph time of milliseconds, the inverse of parse_time
+
+    :param int ms:
+    :param int minute_width=1: digits of the minutes below one hour,
+        2 for "00:12"
+    :rtype: str
+    """
+    minutes, seconds = divmod(ms // 1000, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+    return "{:0{}d}:{:02d}".format(minutes, minute_width, seconds)
+
+
+class Transcript:
+    """
+    Compact transcript of a talk in one language.
+
+    The paragraphs are stored in one string with an array of their end
+    offsets, and the paragraph times as an array of milliseconds, instead
+    of a list of strings each. Paragraphs and times are sliced out on
+    access. A time list which does not survive the conversion to
+    milliseconds unchanged is kept as is, so the conversion back to the
+    lists of the JSON dump is lossless.
+    """
+
+    __slots__ = ("_text", "_ends", "_times", "_minute_width", "_no_time_data", "_raw_times")
+
+    def __init__(self, paragraphs, times=None):
+        """
+        :param list paragraphs: paragraph texts
+        :param list times=None: paragraph times as scraped, ending with
+            NO_TIME_DATA if a paragraph has no time
+        """
+        self._text = "".join(paragraphs)
+        self._ends = array("I")
+        end = 0
+        for paragraph in paragraphs:
+            end += len(paragraph)
+            self._ends.append(end)
+
+        self._times = None
+        self._minute_width = 1
+        self._no_time_data = False
+        self._raw_times = None
+        if times is not None:
+            self._set_times(times)
+
+    def _set_times(self, times):
+        no_time_data = len(times) > 0 and times[-1] == NO_TIME_DATA
+        if no_time_data:
+            times = times[:-1]
+
+        ms_list = [parse_time(t) for t in times]
+        if None not in ms_list:
+            for minute_width in (1, 2):
+                if all(format_time(ms, minute_width) == t for ms, t in zip(ms_list, times)):
+                    self._times = array("I", ms_list)
+                    self._minute_width = minute_width
+                    self._no_time_data = no_time_data
+                    return
+
+        # not representable, e.g. a sentinel in the middle
+        self._raw_times = list(times) + ([NO_TIME_DATA] if no_time_data else [])
+
+    @classmethod
+    def from_page(cls, tr_data):
+        """
+        Return the transcript of the data of a transcript page
+
+        :param dict tr_data: {"transcript": [str, ...], "time": [str, ...], ...}
+        :rtype: Transcript
+        """
+        return cls(tr_data["transcript"], tr_data.get("time"))
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("paragraph index out of range")
+        start = self._ends[index - 1] if index > 0 else 0
+        return self._text[start:self._ends[index]]
+
+    def __iter__(self):
+        start = 0
+        for end in self._ends:
+            yield self._text[start:end]
+            start = end
+
+    def __eq__(self, other):
+        if not isinstance(other, Transcript):
+            return NotImplemented
+        return self.paragraphs() == other.paragraphs() and self.time_list() == other.time_list()
+
+    def __repr__(self):
+        return "<Transcript: {} paragraphs>".format(len(self))
+
+    @property
+    def text(self):
+        """
+        Whole text of the transcript, the paragraphs joined without separator
+
+        :rtype: str
+        """
+        return self._text
+
+    def paragraphs(self):
+        """
+        :rtype: list
+        """
+        return list(self)
+
+    def has_time(self):
+        """
+        :rtype: bool
+        """
+        return self._times is not None or self._raw_times is not None
+
+    def get_time_ms(self, index):
+        """
+        Return the time of the paragraph in milliseconds,
+        or None if it has no time
+
+        :param int index:
+        :rtype: int
+        """
+        if self._times is not None:
+            return self._times[index] if index < len(self._times) else None
+
+        if self._raw_times is not None and index < len(self._raw_times):
+            return parse_time(self._raw_times[index])
+        return None
+
+    def get_time(self, index):
+        """
+        Return the time of the paragraph as scraped, or None if it has no time
+
+        :param int index:
+        :rtype: str
+        """
+        if self._times is not None:
+            if index >= len(self._times):
+                return None
+            return format_time(self._times[index], self._minute_width)
+
+        if self._raw_times is not None and index < len(self._raw_times):
+            time_str = self._raw_times[index]
+            return time_str if time_str != NO_TIME_DATA else None
+        return None
+
+    def time_list(self):
+        """
+        Return the paragraph times as scraped, ending with NO_TIME_DATA
+        if a paragraph has no time
+
+        :rtype: list
+        """
+        if self._raw_times is not None:
+            return list(self._raw_times)
+        if self._times is None:
+            return []
+
+        time_list = [format_time(ms, self._minute_width) for ms in self._times]
+        if self._no_time_data:
+            time_list.append(NO_TIME_DATA)
+        return time_list
+
+    def to_json(self):
+        """
+        Return the transcript in the format of the JSON dump
+
+        :rtype: dict
+        """
+        return {"transcript": self.paragraphs(), "time": self.time_list()}
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Inverse of to_json
+
+        :param dict data:
+        :rtype: Transcript
+        """
+        return cls(data["transcript"], data.get("time"))
+
+
+def json_default(obj):
+    """
+    default= of json.dump serializing a Transcript as its paragraph list,
+    like the talk info of a scraper without compact transcripts
+
+    :param obj:
+    :rtype: list
+    """
+    if isinstance(obj, Transcript):
+        return obj.paragraphs()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import sqlite3
+import time
+import zlib
+
+
+def parse_shard(shard):
+    """
+    Parse a static shard like "1/4" (the 2nd of 4 shards, 0-based)
+    into (1, 4)
+
+    :param str shard:
+    :rtype: tuple
+    """
+    try:
+        index, count = (int(n) for n in shard.split("/"))
+    except ValueError:
+        raise ValueError("shard must be like i/N: {}".format(shard))
+
+    if count < 1 or not 0 <= index < count:
+        raise ValueError("shard index must be in 0..N-1: {}".format(shard))
+    return index, count
+
+
+def in_shard(key, shard):
+    """
+    Return whether the key belongs to the shard. Keys are partitioned with
+    a stable hash so every worker computes the same partition.
+
+    :param str key: talk link or page URL
+    :param tuple shard: (index, count), or None for everything
+    :rtype: bool
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(key.encode("utf-8")) % count == index
+
+
+class WorkQueue:
+    """
+    Work queue shared by the crawl workers, kept in a SQLite database.
+
+    A worker claims an item with a lease of lease_time seconds and completes
+    it when done. An item whose lease has expired, because its worker died,
+    is handed out again, while an item failed by its worker is not.
+    Workers on several machines can share the queue file on a file system
+    with working file locks.
+    """
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS items (
+        item TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        owner TEXT,
+        lease_expires REAL
+    );
+    CREATE INDEX IF NOT EXISTS items_state ON items(state, seq);
+    """
+
+    def __init__(self, path, lease_time=600, worker_id=None):
+        """
+        :param str path: queue database file
+        :param float lease_time=600: seconds an item stays claimed without renewal
+        :param str worker_id=None: "<hostname>-<pid>" if None
+        """
+        self.path = os.path.expanduser(path)
+        self.lease_time = lease_time
+        self.worker_id = worker_id or "{}-{}".format(socket.gethostname(), os.getpid())
+
+        self.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.conn.executescript(WorkQueue.SCHEMA)
+
+    def add(self, items):
+        """
+        Add the items not queued yet, keeping their order
+
+        :param iterable items:
+        """
+        with self._transaction() as conn:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM items").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (item, seq, state) VALUES (?, ?, ?)",
+                [(item, seq + i, WorkQueue.PENDING) for i, item in enumerate(items)])
+
+    def claim(self):
+        """
+        Lease the first pending item, or an item whose lease has expired
+
+        :rtype: str or None if there is nothing to claim
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT item FROM items WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                "ORDER BY seq LIMIT 1", (WorkQueue.PENDING, WorkQueue.LEASED, now)).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE items SET state = ?, owner = ?, lease_expires = ? WHERE item = ?",
+                (WorkQueue.LEASED, self.worker_id, now + self.lease_time, row[0]))
+            return row[0]
+
+    def renew(self, item):
+        """
+        Extend the lease of an item claimed by this worker
+
+        :param str item:
+        :rtype: bool, False if the lease has been lost to another worker
+        """
+        return self._update(item, "lease_expires = ?", time.time() + self.lease_time)
+
+    def complete(self, item):
+        """
+        :param str item: item claimed by this worker
+        :rtype: bool, False if the lease has been lost to another worker
+        """
+        return self._update(item, "state = ?", WorkQueue.DONE)
+
+    def fail(self, item):
+        """
+        Mark a claimed item as failed, so it is not handed out again
+
+        :param str item:
+        :rtype: bool, False if the lease has been lost to another worker
+        """
+        return self._update(item, "state = ?, owner = NULL", WorkQueue.FAILED)
+
+    def release(self, item):
+        """
+        Give a claimed item back to the queue, e.g. after an error
+
+        :param str item:
+        :rtype: bool
+        """
+        return self._update(item, "state = ?, owner = NULL", WorkQueue.PENDING)
+
+    def counts(self):
+        """
+        Return the number of items in each state
+
+        :rtype: dict
+        """
+        counts = {WorkQueue.PENDING: 0, WorkQueue.LEASED: 0, WorkQueue.DONE: 0,
+                  WorkQueue.FAILED: 0}
+        for state, n in self.conn.execute("SELECT state, COUNT(*) FROM items GROUP BY state"):
+            counts[state] = n
+        return counts
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _update(self, item, assignment, value):
+        """
+        Update an item leased by this worker
+
+        :rtype: bool
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE items SET {} WHERE item = ? AND state = ? AND owner = ?".format(assignment),
+                (value, item, WorkQueue.LEASED, self.worker_id))
+            return cursor.rowcount == 1
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE transaction, so concurrent claims are serialized
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+"""
+Offline benchmarks on the pages of tests/fixtures:
+
+    python -m tests.benchmark [--repeat N] [--workers N] [--latency SEC] [--json PATH]
+
+Parsing is measured on the pages in memory, the dumps end-to-end against
+the stand-in server. Each benchmark runs in its own process, so its peak
+RSS is its own, along with the RSS increase during the measurement.
+The fixtures are synthetic and scaled down, so the figures are relative
+ones unless pages recorded from ted.com replace them.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from ted_talks.scraper import TEDScraper
+from ted_talks.parsers import SoupParser, LxmlParser
+from ted_talks.session import HTTPSession, Response
+from tests.standin import StandInTEDServer, load_fixtures
+
+
+def get_peak_rss():
+    """
+    Return the peak resident set size of the process in MiB
+
+    :rtype: float
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def get_page_kind(path):
+    if path == "/talks" or path.startswith("/talks?"):
+        return "list"
+    if "/transcript" in path:
+        return "transcript"
+    if path.startswith("/talks/"):
+        return "talk"
+    return None
+
+
+PARSER_BACKENDS = ("soup", "strainer", "lxml")
+DUMPS = ("dump_talk_info", "dump_talk_info_al")
+
+# benchmarks in the order of the report, each run in its own process
+BENCHMARKS = (["make_soup"] +
+              ["extract {} [{}]".format(kind, backend)
+               for kind in ("list", "transcript") for backend in PARSER_BACKENDS] +
+              list(DUMPS))
+
+
+class FixtureSession:
+    """
+    Session answering with the fixture pages, without network
+    """
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+
+    def get(self, url, headers=None):
+        path = url[url.index("/", len("https://")):]
+        return Response(url, 200, {}, self.fixtures[path], from_cache=True)
+
+
+def measure(name, func, pages, repeat):
+    """
+    Run func repeat times and return the result row
+
+    :param str name:
+    :param callable func: called without arguments
+    :param int pages: pages processed by one call
+    :param int repeat:
+    :rtype: dict
+    """
+    rss_before = get_peak_rss()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    peak_rss = get_peak_rss()
+
+    return {
+        "name": name,
+        "pages": pages * repeat,
+        "seconds": elapsed,
+        "pages_per_sec": pages * repeat / elapsed,
+        "peak_rss_mib": peak_rss,
+        "rss_increase_mib": peak_rss - rss_before,
+    }
+
+
+def get_pages_by_kind():
+    """
+    Return the fixture pages per page kind
+
+    :rtype: dict
+    """
+    by_kind = {"list": [], "talk": [], "transcript": []}
+    for path, html in load_fixtures().items():
+        kind = get_page_kind(path)
+        if kind is not None:
+            by_kind[kind].append((path, html))
+    return by_kind
+
+
+def bench_make_soup(repeat):
+    """
+    Benchmark TEDScraper.make_soup on the fixture pages
+
+    :param int repeat:
+    :rtype: dict
+    """
+    session = FixtureSession(load_fixtures())
+    urls = ["https://www.ted.com" + path
+            for pages in get_pages_by_kind().values() for path, _ in pages]
+
+    def make_soups():
+        for url in urls:
+            TEDScraper.make_soup(url, session)
+
+    return measure("make_soup", make_soups, len(urls), repeat)
+
+
+def bench_extraction(kind, backend, repeat):
+    """
+    Benchmark the extraction of the pages of a kind with a parser backend
+
+    :param str kind: "list" or "transcript"
+    :param str backend: "soup", "strainer" or "lxml"
+    :param int repeat:
+    :rtype: dict
+    """
+    pages = [html for _, html in get_pages_by_kind()[kind]]
+    parser = {"soup": SoupParser, "strainer": lambda: SoupParser(strainer=True),
+              "lxml": LxmlParser}[backend]()
+
+    def parse_all():
+        for html in pages:
+            parser.parse(kind, html, TEDScraper.BASE_URL)
+
+    return measure("extract {} [{}]".format(kind, backend), parse_all, len(pages), repeat)
+
+
+def bench_dump(name, repeat, workers, latency):
+    """
+    Benchmark dump_talk_info or dump_talk_info_al against the stand-in server
+
+    :param str name: "dump_talk_info" or "dump_talk_info_al"
+    :param int repeat:
+    :param int workers:
+    :param float latency:
+    :rtype: dict
+    """
+    with StandInTEDServer(latency=latency) as server:
+        def dump():
+            with tempfile.TemporaryDirectory() as save_dir, \
+                    contextlib.redirect_stdout(io.StringIO()):
+                ts = TEDScraper(max_workers=workers, base_url=server.base_url,
+                                session=HTTPSession())
+                getattr(ts, name)(server.base_url, save_dir)
+                ts.session.close()
+
+        # count the pages of one run, then measure
+        dump()
+        pages = len(server.requests)
+        return measure("{} [workers={}]".format(name, workers), dump, pages, repeat)
+
+
+def run_benchmark(name, args):
+    """
+    Run one benchmark of BENCHMARKS in this process
+
+    :param str name:
+    :param argparse.Namespace args:
+    :rtype: dict
+    """
+    if name == "make_soup":
+        return bench_make_soup(args.repeat)
+    if name in DUMPS:
+        return bench_dump(name, args.repeat, args.workers, args.latency)
+
+    kind, backend = name[len("extract "):].rstrip("]").split(" [")
+    return bench_extraction(kind, backend, args.repeat)
+
+
+def run_in_subprocess(name, args):
+    """
+    Run one benchmark in a new process and return its result row
+
+    :param str name:
+    :param argparse.Namespace args:
+    :rtype: dict
+    """
+    cmd = [sys.executable, "-m", "tests.benchmark", "--only", name,
+           "--repeat", str(args.repeat), "--workers", str(args.workers),
+           "--latency", str(args.latency)]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, check=True)
+    return json.loads(proc.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="offline benchmarks of ted-scraper")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds the stand-in server waits before each response")
+    parser.add_argument("--json", help="write the results to a JSON file")
+    parser.add_argument("--only", choices=BENCHMARKS,
+                        help="run one benchmark in this process and print its result as JSON")
+    args = parser.parse_args(argv)
+
+    if args.only is not None:
+        print(json.dumps(run_benchmark(args.only, args)))
+        return
+
+    results = [run_in_subprocess(name, args) for name in BENCHMARKS]
+
+    print("{:40} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+        "benchmark", "pages", "seconds", "pages/s", "RSS [MiB]", "+RSS [MiB]"))
+    for row in results:
+        print("{name:40} {pages:8d} {seconds:10.3f} {pages_per_sec:10.1f} "
+              "{peak_rss_mib:10.1f} {rss_increase_mib:10.1f}".format(**row))
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local stand-in of ted.com serving the pages of tests/fixtures, with
+configurable latency and error injection.
+
+The fixtures are synthetic: hand-written pages in the markup of ted.com,
+scaled down and with English filler in every transcript language.
+Replace them with pages recorded from ted.com with:
+
+    python -m tests.standin record /talks /talks?page=2 /talks/<slug> ...
+"""
+
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """
+    Return the fixture pages, keyed by path with query
+
+    :param str fixture_dir:
+    :rtype: dict
+    """
+    with open(os.path.join(fixture_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    pages = {}
+    for path, filename in manifest.items():
+        with open(os.path.join(fixture_dir, "pages", filename), "rb") as f:
+            pages[path] = f.read()
+    return pages
+
+
+class StandInTEDServer:
+    """
+    HTTP/1.1 server answering with the fixture pages, after latency
+    seconds. A request fails with error_status and a Retry-After header
+    with probability error_rate.
+    """
+
+    def __init__(self, fixture_dir=FIXTURE_DIR, latency=0.0, error_rate=0.0,
+                 error_status=503, retry_after=0, seed=0):
+        """
+        :param str fixture_dir:
+        :param float latency=0.0: seconds before each response
+        :param float error_rate=0.0: probability of an injected error
+        :param int error_status=503:
+        :param int retry_after=0: Retry-After of the injected errors
+        :param int seed=0: seed of the error injection
+        """
+        self.pages = load_fixtures(fixture_dir)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+
+        self.requests = []
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def origin(self):
+        return "http://127.0.0.1:{}".format(self._server.server_port)
+
+    @property
+    def base_url(self):
+        """
+        URL of the first talk list page, for TEDScraper(base_url=...)
+        """
+        return self.origin + "/talks"
+
+    @property
+    def lang_url(self):
+        """
+        URL of the languages page, for TEDScraper.get_languages(url=...)
+        """
+        return self.origin + "/participate/translate/our-languages"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests.append(handler.path)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if fail:
+            self._send(handler, self.error_status, b"", {"Retry-After": str(self.retry_after)})
+            return
+
+        body = self.pages.get(handler.path)
+        if body is None:
+            self._send(handler, 404, b"not found")
+            return
+
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        if "gzip" in handler.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        self._send(handler, 200, body, headers)
+
+    def _send(self, handler, status, body, headers=None):
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def record(paths, fixture_dir=FIXTURE_DIR, origin="https://www.ted.com"):
+    """
+    Fetch the paths from ted.com and add them to the fixtures
+
+    :param list paths: paths with query, e.g. "/talks?page=2"
+    :param str fixture_dir:
+    :param str origin:
+    """
+    from ted_talks.session import HTTPSession
+
+    manifest_path = os.path.join(fixture_dir, "manifest.json")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    with HTTPSession() as session:
+        for path in paths:
+            filename = manifest.get(path)
+            if filename is None:
+                filename = path.strip("/").replace("/", "-").replace("?", "-").replace("=", "-")
+                filename = (filename or "index") + ".html"
+
+            print("[ GET ] {}".format(origin + path))
+            body = session.get(origin + path).body
+            with open(os.path.join(fixture_dir, "pages", filename), "wb") as f:
+                f.write(body)
+            manifest[path] = filename
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != "record":
+        print("usage: python -m tests.standin record PATH [PATH ...]")
+        sys.exit(2)
+    record(sys.argv[2:])
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.archive import ArchiveWriter, ArchiveSession, iter_records, reextract_all_talk_info_al
+from ted_talks.cache import HTTPCache
+from ted_talks.scraper import TEDScraper
+from ted_talks.session import HTTPSession
+from tests.standin import StandInTEDServer
+
+import unittest
+import datetime
+import os
+import json
+import tempfile
+
+from urllib.error import HTTPError
+
+
+def load_dump(save_dir):
+    talks = {}
+    for filename in os.listdir(save_dir):
+        if filename.endswith(".json"):
+            with open(os.path.join(save_dir, filename)) as f:
+                talk_info = json.load(f)
+            talk_info.pop("update_date")
+            talks[filename] = talk_info
+    return talks
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "crawl.warc.gz")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_records(self):
+        with ArchiveWriter(self.path) as archive:
+            archive.write("https://www.ted.com/talks", 200, {"ETag": '"v1"', "Content-Encoding": "gzip"}, b"<html>1</html>")
+            archive.write("https://www.ted.com/talks/a", 200, {}, b"<html>a</html>")
+
+        # a record cut off by a crash is ignored
+        with open(self.path, "ab") as f:
+            f.write(b"\x1f\x8b\x08\x00")
+
+        records = list(iter_records(self.path))
+        self.assertEqual([r.url for r in records], ["https://www.ted.com/talks", "https://www.ted.com/talks/a"])
+        self.assertEqual(records[0].body, b"<html>1</html>")
+        self.assertEqual(records[0].headers["ETag"], '"v1"')
+        self.assertIsNone(records[0].headers["Content-Encoding"])
+
+        with ArchiveSession(self.path) as session:
+            self.assertEqual(session.get("https://www.ted.com/talks/a").body, b"<html>a</html>")
+            with self.assertRaises(HTTPError):
+                session.get("https://www.ted.com/talks/b")
+
+    def test_reextract_without_network(self):
+        crawl_dir = os.path.join(self.tmp_dir.name, "crawl")
+        replay_dir = os.path.join(self.tmp_dir.name, "replay")
+
+        with StandInTEDServer() as server:
+            with ArchiveWriter(self.path) as archive:
+                ts = TEDScraper(max_workers=4, base_url=server.base_url,
+                                session=HTTPSession(archive=archive))
+                ts.dump_all_talk_info_al(crawl_dir)
+            base_url = server.base_url
+            request_num = len(server.requests)
+
+        # the server is gone, the archive alone is replayed
+        reextract_all_talk_info_al(self.path, replay_dir, base_url=base_url,
+                                   parser="lxml", parse_workers=2)
+
+        self.assertEqual(len(list(iter_records(self.path))), request_num)
+        self.assertEqual(load_dump(replay_dir), load_dump(crawl_dir))
+        self.assertEqual(len(load_dump(replay_dir)), 6)
+
+    def test_reextract_keeps_archive_date(self):
+        crawl_path = os.path.join(self.tmp_dir.name, "crawl.warc.gz")
+        with StandInTEDServer() as server:
+            base_url = server.base_url
+            with ArchiveWriter(crawl_path) as archive:
+                ts = TEDScraper(base_url=base_url, session=HTTPSession(archive=archive))
+                ts.dump_all_talk_info_al(os.path.join(self.tmp_dir.name, "crawl"))
+
+        # the same crawl, archived years ago
+        old_path = os.path.join(self.tmp_dir.name, "old.warc.gz")
+        with ArchiveWriter(old_path) as archive:
+            for record in iter_records(crawl_path):
+                archive.write(record.url, record.status, record.headers, record.body,
+                              datetime.datetime(2017, 5, 1, 12, 0, 0))
+
+        replay_dir = os.path.join(self.tmp_dir.name, "replay")
+        reextract_all_talk_info_al(old_path, replay_dir, base_url=base_url)
+        dates = set()
+        for filename in os.listdir(replay_dir):
+            if filename.endswith(".json"):
+                with open(os.path.join(replay_dir, filename)) as f:
+                    dates.add(json.load(f)["update_date"])
+        self.assertEqual(dates, {"2017-05-01"})
+
+    def test_cached_pages_are_archived(self):
+        cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        crawl_dir = os.path.join(self.tmp_dir.name, "crawl")
+        replay_dir = os.path.join(self.tmp_dir.name, "replay")
+
+        with StandInTEDServer() as server:
+            base_url = server.base_url
+            ts = TEDScraper(base_url=base_url, session=HTTPSession(cache=HTTPCache(cache_dir)))
+            ts.dump_all_talk_info_al(os.path.join(self.tmp_dir.name, "warm"))
+            request_num = len(server.requests)
+
+            # every page is served by the cache
+            with ArchiveWriter(self.path) as archive:
+                session = HTTPSession(cache=HTTPCache(cache_dir), archive=archive)
+                TEDScraper(base_url=base_url, session=session).dump_all_talk_info_al(crawl_dir)
+            self.assertEqual(len(server.requests), request_num)
+
+        self.assertEqual(len(list(iter_records(self.path))), request_num)
+        reextract_all_talk_info_al(self.path, replay_dir, base_url=base_url)
+        self.assertEqual(load_dump(replay_dir), load_dump(crawl_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.cache import HTTPCache, get_url_class
+
+import unittest
+import tempfile
+import time
+from unittest import mock
+
+
+class HTTPCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_url_class(self):
+        self.assertEqual(get_url_class("https://www.ted.com/talks"), "list")
+        self.assertEqual(get_url_class("https://www.ted.com/talks?page=2"), "list")
+        self.assertEqual(get_url_class("https://www.ted.com/talks/foo"), "talk")
+        self.assertEqual(get_url_class(
+            "https://www.ted.com/talks/foo/transcript?language=ja"), "transcript")
+        self.assertEqual(get_url_class(
+            "https://www.ted.com/participate/translate/our-languages"), "languages")
+
+    def test_store_and_lookup(self):
+        cache = HTTPCache(self.cache_dir)
+        cache.store("https://www.ted.com/talks/foo", b"body", etag='"abc"')
+
+        entry = HTTPCache(self.cache_dir).lookup("https://www.ted.com/talks/foo")
+        self.assertEqual(entry.body, b"body")
+        self.assertEqual(entry.validators(), {"If-None-Match": '"abc"'})
+        self.assertIsNone(cache.lookup("https://www.ted.com/talks/bar"))
+
+    def test_lookup_evicted_after_read(self):
+        cache = HTTPCache(self.cache_dir)
+        cache.store("https://www.ted.com/talks/foo", b"body")
+
+        # the body is removed by another process between the read and the touch
+        with mock.patch("ted_talks.cache.os.utime", side_effect=FileNotFoundError):
+            entry = cache.lookup("https://www.ted.com/talks/foo")
+        self.assertEqual(entry.body, b"body")
+
+    def test_ttl_per_url_class(self):
+        cache = HTTPCache(self.cache_dir, ttl={"list": 10, "transcript": 1000})
+        cache.store("https://www.ted.com/talks", b"list")
+        cache.store("https://www.ted.com/talks/foo/transcript", b"transcript")
+
+        later = time.time() + 100
+        self.assertFalse(cache.is_fresh(
+            cache.lookup("https://www.ted.com/talks"), later))
+        self.assertTrue(cache.is_fresh(
+            cache.lookup("https://www.ted.com/talks/foo/transcript"), later))
+
+    def test_lru_eviction(self):
+        cache = HTTPCache(self.cache_dir, max_size=10)
+        cache.store("https://www.ted.com/talks/a", b"aaaa")
+        cache.store("https://www.ted.com/talks/b", b"bbbb")
+        cache.lookup("https://www.ted.com/talks/a")
+        cache.store("https://www.ted.com/talks/c", b"cccc")
+
+        self.assertIsNotNone(cache.lookup("https://www.ted.com/talks/a"))
+        self.assertIsNone(cache.lookup("https://www.ted.com/talks/b"))
+        self.assertIsNotNone(cache.lookup("https://www.ted.com/talks/c"))
+        self.assertEqual(cache.size, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.checkpoint import Checkpoint
+
+import unittest
+import tempfile
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_progress_is_durable(self):
+        with Checkpoint(self.save_dir) as checkpoint:
+            checkpoint.set_page_list(["p1", "p2"])
+            checkpoint.mark_talk_done("t1")
+            checkpoint.mark_page_done("p1")
+
+        with Checkpoint(self.save_dir) as checkpoint:
+            self.assertEqual(checkpoint.page_list, ["p1", "p2"])
+            self.assertTrue(checkpoint.is_page_done("p1"))
+            self.assertFalse(checkpoint.is_page_done("p2"))
+            self.assertTrue(checkpoint.is_talk_done("t1"))
+
+    def test_truncated_line_is_ignored(self):
+        with Checkpoint(self.save_dir) as checkpoint:
+            checkpoint.mark_talk_done("t1")
+            path = checkpoint.path
+
+        with open(path, "a") as f:
+            f.write('{"talk": "t2')
+
+        with Checkpoint(self.save_dir) as checkpoint:
+            self.assertTrue(checkpoint.is_talk_done("t1"))
+            self.assertFalse(checkpoint.is_talk_done("t2"))
+            checkpoint.mark_talk_done("t3")
+
+        with Checkpoint(self.save_dir) as checkpoint:
+            self.assertEqual(checkpoint.completed_talks, {"t1", "t3"})
+
+    def test_reset(self):
+        with Checkpoint(self.save_dir) as checkpoint:
+            checkpoint.mark_talk_done("t1")
+            checkpoint.reset()
+
+        with Checkpoint(self.save_dir) as checkpoint:
+            self.assertFalse(checkpoint.is_talk_done("t1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
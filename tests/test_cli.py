@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.cli import build_parser, main
+from ted_talks.checkpoint import Checkpoint
+from ted_talks.sinks import read_jsonl
+from tests.standin import StandInTEDServer
+
+import unittest
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+def run(*argv):
+    """
+    Run the command line and return the exit status and stdout
+    """
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        status = main(["--quiet"] + list(argv))
+    return status, out.getvalue()
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_options(self):
+        args = build_parser().parse_args([
+            "dump-all", "-o", "out", "-w", "8", "--languages", "en, ja", "--sink", "jsonl",
+            "--compress", "--resume", "--shard", "1/4", "--cache", "cache"])
+        self.assertEqual(args.workers, 8)
+        self.assertEqual(args.languages, ["en", "ja"])
+        self.assertEqual((args.sink, args.compress, args.resume), ("jsonl", True, True))
+        self.assertEqual((args.shard, args.cache, args.output), ("1/4", "cache", "out"))
+
+    def test_reextract_parses_in_processes(self):
+        args = build_parser().parse_args(["reextract", "crawl.warc.gz"])
+        self.assertEqual(args.parse_workers, os.cpu_count())
+
+    def test_command_required(self):
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            build_parser().parse_args([])
+
+    def test_lazy_imports(self):
+        code = ("import sys\n"
+                "from ted_talks.cli import main\n"
+                "main(['status', '-o', '.'])\n"
+                "print(sorted(m for m in ('bs4', 'lxml', 'http.client', 'ted_talks.scraper') "
+                "if m in sys.modules))\n")
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                              cwd=tempfile.gettempdir(),
+                              env=dict(os.environ, PYTHONPATH=os.getcwd()))
+        self.assertEqual(proc.stdout.strip(), "[]", proc.stderr)
+
+
+class StatusTest(unittest.TestCase):
+
+    def test_status(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            self.assertEqual(run("status", "-o", save_dir)[0], 1)
+
+            with Checkpoint(save_dir) as checkpoint:
+                checkpoint.set_page_list(["p1", "p2"])
+                checkpoint.mark_talks_done(["t1", "t2", "t3"])
+                checkpoint.mark_page_done("p1")
+            with open(checkpoint.path) as f:
+                journal = f.read()
+
+            status, out = run("status", "-o", save_dir, "--json")
+            self.assertEqual(status, 0)
+            self.assertEqual(json.loads(out), {"pages": 2, "pages_done": 1, "talks_done": 3})
+            self.assertEqual(run("status", "-o", save_dir)[1], "pages: 1/2\ntalks: 3\n")
+
+            # the journal of a running crawl is not rewritten
+            with open(checkpoint.path) as f:
+                self.assertEqual(f.read(), journal)
+
+
+class ScrapeCommandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInTEDServer().start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.options = ["--base-url", self.server.base_url, "--rate", "20"]
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def test_languages(self):
+        status, out = run("languages", "--lang-url", self.server.lang_url, *self.options)
+        self.assertEqual(status, 0)
+        self.assertEqual(out.splitlines()[0], "en\tEnglish\t2918")
+
+        status, out = run("languages", "--lang-url", self.server.lang_url, "--top", "2",
+                          *self.options)
+        self.assertEqual(out, "en\nfr\n")
+
+    def test_links(self):
+        status, out = run("links", *self.options)
+        self.assertEqual(status, 0)
+        self.assertEqual(len(out.splitlines()), 6)
+        self.assertTrue(all(line.startswith(self.server.origin + "/talks/")
+                            for line in out.splitlines()))
+
+        status, out = run("links", "--metadata", "-w", "2", *self.options)
+        talks = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(len(talks), 6)
+        self.assertEqual(talks[0]["talk_topics"], ["Education", "Creativity", "Culture"])
+
+    def test_dump_all_and_search(self):
+        save_dir = self.tmp_dir.name
+        status, out = run("dump-all", "-o", save_dir, "--sink", "jsonl", "-w", "4",
+                          "--metrics", os.path.join(save_dir, "metrics.prom"), *self.options)
+        self.assertEqual(status, 0)
+        self.assertEqual(len(list(read_jsonl(save_dir))), 6)
+        self.assertTrue(os.path.exists(os.path.join(save_dir, "metrics.prom")))
+
+        status, out = run("status", "-o", save_dir)
+        self.assertEqual(out, "pages: 2/2\ntalks: 6\n")
+
+        self.assertEqual(run("index", "-o", save_dir), (0, "6\n"))
+        status, out = run("search", "creativity", "-o", save_dir, "--topic", "Education")
+        self.assertEqual(status, 0)
+        self.assertGreater(len(out.splitlines()), 0)
+
+
+class FailureExitStatusTest(unittest.TestCase):
+
+    def test_failing_server(self):
+        with StandInTEDServer(error_rate=1.0, error_status=500) as server, \
+                tempfile.TemporaryDirectory() as save_dir:
+            options = ["-o", save_dir, "--base-url", server.base_url, "--retries", "0"]
+            with contextlib.redirect_stderr(io.StringIO()) as err:
+                self.assertEqual(run("dump", *options)[0], 1)
+                self.assertEqual(run("dump-all", *options)[0], 1)
+            self.assertIn("cannot fetch talk list page", err.getvalue())
+
+            # nothing has been marked done
+            self.assertEqual(run("status", "-o", save_dir)[1], "pages: 0/?\ntalks: 0\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.fetcher import Fetcher
+
+import unittest
+import threading
+import time
+
+
+class FetcherTest(unittest.TestCase):
+
+    def test_map_keeps_order(self):
+        fetcher = Fetcher(max_workers=4)
+
+        def job(i):
+            time.sleep(0.01 * (5 - i))
+            return i * 2
+
+        self.assertEqual(fetcher.map(job, range(5)), [0, 2, 4, 6, 8])
+
+    def test_map_serial(self):
+        fetcher = Fetcher()
+        self.assertEqual(fetcher.map(str, [1, 2, 3]), ["1", "2", "3"])
+
+    def test_per_host_limit(self):
+        fetcher = Fetcher(max_workers=8, per_host=2)
+        lock = threading.Lock()
+        active = {"now": 0, "max": 0}
+
+        def job(url):
+            with fetcher.host_slot(url):
+                with lock:
+                    active["now"] += 1
+                    active["max"] = max(active["max"], active["now"])
+                time.sleep(0.02)
+                with lock:
+                    active["now"] -= 1
+
+        fetcher.map(job, ["https://www.ted.com/talks/{}".format(i)
+                          for i in range(8)])
+        self.assertLessEqual(active["max"], 2)
+
+    def test_imap_bounds_in_flight_items(self):
+        fetcher = Fetcher(max_workers=2)
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = fetcher.imap(lambda i: i + 1, items())
+        self.assertEqual(next(results), 1)
+        self.assertLessEqual(len(consumed), 5)
+        self.assertEqual(list(results), list(range(2, 101)))
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            Fetcher(max_workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
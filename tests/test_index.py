@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.index import TranscriptIndex, Hit, tokenize, build_index
+from ted_talks.sinks import JSONFileSink, JSONLinesSink
+
+import unittest
+import os
+import tempfile
+
+
+def make_talk_info(name, posted_date, topics, transcript, time, update_date="2018-01-01"):
+    return {
+        "posted_date": posted_date,
+        "update_date": update_date,
+        "talk_title": name.title(),
+        "talk_link": "https://www.ted.com/talks/" + name,
+        "talk_topics": topics,
+        "transcript": transcript,
+        "time": time,
+    }
+
+
+TALKS = [
+    make_talk_info("ocean", "2017-05-01", ["Science", "Ocean"], {
+        "en": ["The deep sea is dark.", "Fish glow in the deep sea."],
+        "ja": ["深海は暗い。", "深海で魚は光る。"],
+    }, ["0:12", "0:35"]),
+    make_talk_info("space", "2016-02-01", ["Science"], {
+        "en": ["Space is dark and the sea of stars is deep."],
+    }, ["0:05"]),
+    make_talk_info("none", "2015-01-01", [], {"none": "no transcript text found."}, []),
+]
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The Deep-Sea, isn't it?"), ["the", "deep", "sea", "isn", "t", "it"])
+        self.assertEqual(tokenize("深海で fish"), ["深", "海", "で", "fish"])
+
+
+class TranscriptIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = TranscriptIndex(os.path.join(self.tmp_dir.name, "index.db"))
+        for talk_info in TALKS:
+            self.index.write(talk_info)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+
+    def test_phrase(self):
+        ocean = "https://www.ted.com/talks/ocean"
+        self.assertEqual(self.index.search("deep sea"), [
+            Hit(ocean, "Ocean", "en", 0, "0:12"),
+            Hit(ocean, "Ocean", "en", 1, "0:35"),
+        ])
+        self.assertEqual([h.talk_link for h in self.index.search("dark")],
+                         [ocean, "https://www.ted.com/talks/space"])
+        self.assertEqual(self.index.search("sea deep"), [])
+        self.assertEqual(self.index.search("whale"), [])
+        self.assertEqual(self.index.search("deep sea", limit=1), [Hit(ocean, "Ocean", "en", 0, "0:12")])
+
+    def test_language(self):
+        hits = self.index.search("魚は光る", language="ja")
+        self.assertEqual([(h.para_num, h.time) for h in hits], [(1, None)])
+        self.assertEqual(self.index.search("deep", language="ja"), [])
+
+    def test_topic(self):
+        self.assertEqual([h.talk_link for h in self.index.search("dark", topic="Ocean")],
+                         ["https://www.ted.com/talks/ocean"])
+        self.assertEqual(self.index.search("dark", topic="Music"), [])
+        self.assertEqual(self.index.find_talks(topic="Science", language="en"),
+                         ["https://www.ted.com/talks/ocean", "https://www.ted.com/talks/space"])
+
+    def test_update_talk(self):
+        updated = make_talk_info("space", "2016-02-01", ["Music"], {"en": ["Stars sing."]}, ["0:01"])
+        self.index.write(updated)
+
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual([h.talk_link for h in self.index.search("dark")],
+                         ["https://www.ted.com/talks/ocean"])
+        self.assertEqual(len(self.index.search("stars sing", topic="Music")), 1)
+
+        self.index.remove(updated["talk_link"])
+        self.assertEqual(self.index.search("stars"), [])
+
+
+class BuildIndexTest(unittest.TestCase):
+
+    def test_incremental_build(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            index_path = os.path.join(save_dir, "index.db")
+            with JSONFileSink(save_dir, all_language=True) as sink:
+                sink.write(TALKS[0])
+            with JSONLinesSink(save_dir) as sink:
+                sink.write(TALKS[1])
+
+            self.assertEqual(build_index(index_path, save_dir), 2)
+            # nothing changed
+            self.assertEqual(build_index(index_path, save_dir), 0)
+
+            # a new shard and a re-scraped talk
+            with JSONLinesSink(save_dir) as sink:
+                sink.write(TALKS[2])
+                sink.write(dict(TALKS[0], update_date="2018-02-01",
+                                transcript={"en": ["Whales sing."]}))
+            self.assertEqual(build_index(index_path, save_dir), 2)
+
+            with TranscriptIndex(index_path) as index:
+                self.assertEqual(len(index), 3)
+                self.assertEqual(index.search("deep sea"), [])
+                self.assertEqual(len(index.search("whales sing")), 1)
+
+    def test_record_with_most_languages(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            index_path = os.path.join(save_dir, "index.db")
+            # dump and dump-al of the same day: "Ocean.json" sorts before
+            # "al-Ocean.json", but "al-the_x.json" before "the_x.json"
+            the_x = dict(make_talk_info("the_x", "2017-01-01", [], {
+                "en": ["Hello."], "ja": ["Konnichiwa."]}, ["0:01"]), talk_title="the x")
+            for talk_info in (TALKS[0], the_x):
+                english = dict(talk_info, talk_lang="en", transcript=talk_info["transcript"]["en"])
+                with JSONFileSink(save_dir) as sink:
+                    sink.write(english)
+                with JSONFileSink(save_dir, all_language=True) as sink:
+                    sink.write(talk_info)
+
+            self.assertEqual(sorted(os.listdir(save_dir)),
+                             ["Ocean.json", "al-Ocean.json", "al-the_x.json", "the_x.json"])
+            self.assertEqual(build_index(index_path, save_dir), 3)
+            with TranscriptIndex(index_path) as index:
+                self.assertEqual(len(index.search("深海", language="ja")), 2)
+                self.assertEqual(len(index.search("konnichiwa", language="ja")), 1)
+
+                # an older record does not replace the indexed one
+                with JSONLinesSink(save_dir) as sink:
+                    sink.write(dict(the_x, update_date="2017-12-31"))
+                self.assertEqual(index.add_dump(save_dir), 0)
+
+    def test_file_rewritten_on_the_same_date(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            index_path = os.path.join(save_dir, "index.db")
+            buggy = make_talk_info("t", "2017-01-01", [], {"en": ["Buggy."], "ja": ["Bagu."]}, [])
+            with JSONFileSink(save_dir, all_language=True) as sink:
+                sink.write(buggy)
+            self.assertEqual(build_index(index_path, save_dir), 1)
+
+            # e.g. re-extracted from the archive, which keeps the update date
+            with JSONFileSink(save_dir, all_language=True) as sink:
+                sink.write(dict(buggy, transcript={"en": ["Fixed text."], "ja": ["Bagu."]}))
+            self.assertEqual(build_index(index_path, save_dir), 1)
+
+            with TranscriptIndex(index_path) as index:
+                self.assertEqual(index.search("buggy"), [])
+                self.assertEqual(len(index.search("fixed")), 1)
+
+            # a later shard of the same day wins the tie
+            with JSONLinesSink(save_dir) as sink:
+                sink.write(dict(buggy, transcript={"en": ["Shard text."], "ja": ["Bagu."]}))
+            self.assertEqual(build_index(index_path, save_dir), 1)
+            with TranscriptIndex(index_path) as index:
+                self.assertEqual(len(index.search("shard")), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
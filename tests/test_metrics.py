@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.metrics import Metrics, MetricsWriter
+from ted_talks.cache import HTTPCache
+from ted_talks.scraper import TEDScraper
+from ted_talks.session import HTTPSession
+from tests.standin import StandInTEDServer
+
+import unittest
+import gzip
+import os
+import json
+import tempfile
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+        self.metrics.incr("requests", 3)
+        self.metrics.incr("bytes", 1024)
+        self.metrics.record_status(200)
+        self.metrics.record_status(200)
+        self.metrics.record_status(404)
+        for i in range(1, 101):
+            self.metrics.observe("fetch", i / 100)
+
+    def test_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["counters"], {"requests": 3, "bytes": 1024})
+        self.assertEqual(snapshot["http_status"], {"200": 2, "404": 1})
+
+        fetch = snapshot["latency"]["fetch"]
+        self.assertEqual(fetch["count"], 100)
+        self.assertEqual(fetch["p50"], 0.5)
+        self.assertEqual(fetch["p99"], 0.99)
+        self.assertEqual(fetch["max"], 1.0)
+
+    def test_prometheus(self):
+        text = self.metrics.to_prometheus()
+        self.assertIn("ted_scraper_requests_total 3\n", text)
+        self.assertIn('ted_scraper_http_status_total{code="404"} 1\n', text)
+        self.assertIn('ted_scraper_latency_seconds{stage="fetch",quantile="0.9"} 0.900000\n', text)
+        self.assertIn('ted_scraper_latency_seconds_count{stage="fetch"} 100\n', text)
+
+    def test_writer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "metrics.json")
+            with MetricsWriter(self.metrics, path, interval=0.01, format="json"):
+                self.metrics.incr("requests")
+
+            with open(path) as f:
+                self.assertEqual(json.load(f)["counters"]["requests"], 4)
+
+    def test_bytes_on_the_wire(self):
+        with StandInTEDServer() as server, tempfile.TemporaryDirectory() as cache_dir:
+            ts = TEDScraper(base_url=server.base_url,
+                            session=HTTPSession(cache=HTTPCache(cache_dir)))
+            for _ in range(2):
+                ts.fetch_page(server.base_url, "list")
+
+            counters = ts.metrics.snapshot()["counters"]
+            self.assertEqual(counters["bytes"], len(gzip.compress(server.pages["/talks"])))
+            self.assertEqual((counters["requests"], counters["cache_hits"]), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
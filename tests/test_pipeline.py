@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.pipeline import background
+
+import unittest
+
+
+class BackgroundTest(unittest.TestCase):
+
+    def test_keeps_order(self):
+        self.assertEqual(list(background(range(20), maxsize=2)), list(range(20)))
+
+    def test_producer_runs_bounded_ahead(self):
+        produced = []
+
+        def items():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        stage = background(items(), maxsize=2)
+        self.assertEqual(next(stage), 0)
+        stage.close()
+        self.assertLessEqual(len(produced), 5)
+
+    def test_exception_is_reraised(self):
+        def items():
+            yield 1
+            raise ValueError("broken stage")
+
+        stage = background(items())
+        self.assertEqual(next(stage), 1)
+        with self.assertRaises(ValueError):
+            next(stage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.ratelimit import RateLimiter, RetryPolicy, parse_retry_after
+
+import unittest
+import time
+
+URL = "https://www.ted.com/talks"
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_aimd(self):
+        limiter = RateLimiter(rate=4.0, min_rate=1.0, max_rate=5.0, increase=0.5)
+        limiter.on_success(URL)
+        self.assertEqual(limiter.get_rate(URL), 4.5)
+        limiter.on_throttle(URL)
+        self.assertEqual(limiter.get_rate(URL), 2.25)
+        for _ in range(10):
+            limiter.on_success(URL)
+        self.assertEqual(limiter.get_rate(URL), 5.0)
+        for _ in range(10):
+            limiter.on_throttle(URL)
+        self.assertEqual(limiter.get_rate(URL), 1.0)
+
+        # hosts are limited separately
+        self.assertEqual(limiter.get_rate("https://example.com/"), 4.0)
+
+    def test_acquire_waits_for_rate(self):
+        limiter = RateLimiter(rate=20.0, burst=0.05)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire(URL)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_retry_after_pauses_host(self):
+        limiter = RateLimiter(rate=20.0)
+        limiter.on_throttle(URL, retry_after=0.2)
+        start = time.monotonic()
+        limiter.acquire(URL)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def test_should_retry(self):
+        retry = RetryPolicy(max_retries=2)
+        self.assertTrue(retry.should_retry(0, 503))
+        self.assertTrue(retry.should_retry(1))
+        self.assertFalse(retry.should_retry(2, 503))
+        self.assertFalse(retry.should_retry(0, 404))
+
+    def test_delay(self):
+        retry = RetryPolicy(backoff=1.0, max_backoff=4.0)
+        for attempt in range(5):
+            self.assertLessEqual(retry.get_delay(attempt), 4.0)
+        self.assertGreaterEqual(retry.get_delay(0, retry_after=3), 3)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(parse_retry_after("Thu, 01 Jan 1970 00:01:40 GMT", now=40), 60.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.reader import CorpusReader, scan_record, INDEX_FILENAME
+from ted_talks.sinks import JSONFileSink, JSONLinesSink
+
+import unittest
+import json
+import os
+import tempfile
+import time
+
+
+def make_talk_info(name, posted_date, topics, transcript, update_date="2018-01-01"):
+    return {
+        "posted_date": posted_date,
+        "update_date": update_date,
+        "talk_title": name.title(),
+        "talk_link": "https://www.ted.com/talks/" + name,
+        "talk_topics": topics,
+        "transcript": transcript,
+        "time": ["0:12"],
+    }
+
+
+OCEAN = make_talk_info("ocean", "2017-05-01", ["Science"], {
+    "en": ["The deep sea is dark."], "ja": ["深海は暗い。"]})
+SPACE = make_talk_info("space", "2016-02-01", ["Science", "Space"], {"en": ["Stars."]})
+NONE = make_talk_info("none", "2015-01-01", [], {"none": "no transcript text found."})
+
+
+class ScanRecordTest(unittest.TestCase):
+
+    def test_spans(self):
+        for text in (json.dumps(OCEAN, indent=2), json.dumps(OCEAN, ensure_ascii=False)):
+            talk_info, spans = scan_record(text)
+            self.assertEqual(talk_info, OCEAN)
+            self.assertEqual({lang: json.loads(text[s:e]) for lang, (s, e) in spans.items()},
+                             OCEAN["transcript"])
+
+    def test_one_language(self):
+        text = json.dumps({"transcript": ["a", "b"], "talk_lang": "fr", "talk_link": "x"})
+        _, spans = scan_record(text)
+        s, e = spans["fr"]
+        self.assertEqual(json.loads(text[s:e]), ["a", "b"])
+
+    def test_not_an_object(self):
+        with self.assertRaises(ValueError):
+            scan_record("[1, 2]")
+
+
+class CorpusReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_dir = self.tmp_dir.name
+        with JSONFileSink(self.save_dir, all_language=True) as sink:
+            sink.write(OCEAN)
+        with JSONLinesSink(self.save_dir, compress=True) as sink:
+            sink.write(SPACE)
+        with JSONLinesSink(self.save_dir) as sink:
+            sink.write(NONE)
+            # a UTF-8 record written by another tool
+            sink._file.write((json.dumps(
+                make_talk_info("utf8", "2014-01-01", [], {"ja": ["日本語"], "en": ["Japanese"]}),
+                ensure_ascii=False) + "\n").encode("utf-8"))
+            sink._file.write(b'{"talk_link": "cut off')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_random_access(self):
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(len(reader), 4)
+            self.assertIn(OCEAN["talk_link"], reader)
+            self.assertEqual(reader.get(OCEAN["talk_link"]), OCEAN)
+            self.assertEqual(reader.get(SPACE["talk_link"]), SPACE)
+            self.assertEqual(reader.get_languages(OCEAN["talk_link"]), ["en", "ja"])
+            self.assertEqual(reader.get_transcript(OCEAN["talk_link"], "ja"), ["深海は暗い。"])
+            self.assertEqual(reader.get_transcript(SPACE["talk_link"], "en"), ["Stars."])
+            self.assertEqual(reader.get_transcript("https://www.ted.com/talks/utf8", "en"),
+                             ["Japanese"])
+            self.assertIsNone(reader.get_transcript(NONE["talk_link"], "none"))
+            with self.assertRaises(KeyError):
+                reader.get("https://www.ted.com/talks/missing")
+
+    def test_filters(self):
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual([ti["talk_link"] for ti in reader.iter_talks(topic="Science")],
+                             [OCEAN["talk_link"], SPACE["talk_link"]])
+            self.assertEqual([ti["talk_link"] for ti in reader.iter_talks(posted_until="2016-12-31")],
+                             [SPACE["talk_link"], NONE["talk_link"], "https://www.ted.com/talks/utf8"])
+            self.assertEqual(list(reader.iter_transcripts("ja", posted_since="2015-01-01")),
+                             [(OCEAN["talk_link"], ["深海は暗い。"])])
+
+    def test_cached_index(self):
+        CorpusReader(self.save_dir).close()
+        self.assertTrue(os.path.exists(os.path.join(self.save_dir, INDEX_FILENAME)))
+
+        # a new shard is seen after update()
+        with JSONLinesSink(self.save_dir) as sink:
+            sink.write(make_talk_info("new", "2019-01-01", [], {"en": ["New."]}))
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(len(reader), 4)
+            self.assertEqual(reader.update(), 1)
+            self.assertEqual(reader.get_transcript("https://www.ted.com/talks/new", "en"), ["New."])
+
+    def test_rewritten_file(self):
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(reader.get(OCEAN["talk_link"]), OCEAN)
+
+            # the talk is scraped again, the file is rewritten
+            time.sleep(0.01)
+            rescraped = dict(OCEAN, update_date="2018-02-01", transcript={"en": ["Longer text."]})
+            with JSONFileSink(self.save_dir, all_language=True) as sink:
+                sink.write(rescraped)
+            self.assertEqual(reader.get_transcript(OCEAN["talk_link"], "en"), ["Longer text."])
+            self.assertEqual(reader.get(OCEAN["talk_link"]), rescraped)
+
+    def test_latest_record_wins(self):
+        with JSONLinesSink(self.save_dir) as sink:
+            sink.write(dict(SPACE, update_date="2017-01-01", transcript={"en": ["Old."]}))
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(reader.get_transcript(SPACE["talk_link"], "en"), ["Stars."])
+
+    def test_record_with_most_languages(self):
+        # dump and dump-al of the same day, in both orders of the file names
+        the_x = dict(make_talk_info("the_x", "2017-01-01", [], {"en": ["Hello."], "ja": ["Yo."]}),
+                     talk_title="the x")
+        for talk_info in (OCEAN, the_x):
+            with JSONFileSink(self.save_dir) as sink:
+                sink.write(dict(talk_info, talk_lang="en", transcript=talk_info["transcript"]["en"]))
+        with JSONFileSink(self.save_dir, all_language=True) as sink:
+            sink.write(the_x)
+
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(reader.get_languages(OCEAN["talk_link"]), ["en", "ja"])
+            self.assertEqual(reader.get(the_x["talk_link"]), the_x)
+
+    def test_same_day_redump_wins(self):
+        with JSONLinesSink(self.save_dir) as sink:
+            sink.write(dict(SPACE, transcript={"en": ["More stars."]}))
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(reader.get_transcript(SPACE["talk_link"], "en"), ["More stars."])
+
+    def test_deleted_file(self):
+        with JSONFileSink(self.save_dir) as sink:
+            sink.write(dict(OCEAN, talk_lang="en", transcript=OCEAN["transcript"]["en"]))
+        with CorpusReader(self.save_dir) as reader:
+            self.assertEqual(reader.get_languages(OCEAN["talk_link"]), ["en", "ja"])
+
+            # the talk is still in the dump of one language
+            os.remove(os.path.join(self.save_dir, "al-Ocean.json"))
+            reader.update()
+            self.assertEqual(len(reader), 4)
+            self.assertEqual(reader.get_languages(OCEAN["talk_link"]), ["en"])
+            self.assertEqual(reader.get_transcript(OCEAN["talk_link"], "en"),
+                             OCEAN["transcript"]["en"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,89 @@
 # -*- coding: utf-8 -*-
 
-from ted_talks.scraper import TEDScraper
+from ted_talks.scraper import TEDScraper, TalkPages, TalkListing, PageFetchError
+from ted_talks.parsers import SoupParser, LxmlParser
+from ted_talks.checkpoint import Checkpoint
+from ted_talks.sinks import JSONLinesSink, read_jsonl
+from ted_talks.workqueue import WorkQueue
 
 import unittest
 import os
 import json
+import tempfile
+import time
+
+from urllib.error import HTTPError
+
+from bs4 import BeautifulSoup
+
+TALK_URL = "https://www.ted.com/talks/test_talk"
+
+TALK_HTML = """
+<div class="talk-topics"><ul>
+  <li class="talk-topics__item"><a href="/topics/education">Education</a></li>
+  <li class="talk-topics__item"><a href="/topics/creativity">Creativity</a></li>
+</ul></div>
+"""
+
+TRANSCRIPT_HTML = """
+<select class="talk-transcript__language">
+  <option value="en">English</option><option value="ja">Japanese</option>
+</select>
+<p class="talk-transcript__para">
+  <data class="talk-transcript__para__time">00:12</data>
+  <span class="talk-transcript__para__text">{}</span>
+</p>
+"""
+
+LIST_HTML = """
+<div class="talk-link"><div class="media__message">
+  <h4 class="h9 m5"><a href="/talks/test_talk"> Test talk </a></h4>
+  <div class="meta"><span class="meta__item"><span class="meta__val">Jan 2017</span></span></div>
+</div></div>
+<div class="talk-link"><div class="media__message">
+  <h4 class="h9 m5"><a href="/talks/other_talk">Other talk</a></h4>
+  <div class="meta"><span class="meta__item"><span class="meta__val">Dec 2016</span></span></div>
+</div></div>
+<div class="pagination">
+  <a class="pagination__next" href="/talks?page=2">Next</a>
+</div>
+"""
+
+OTHER_TALK_URL = "https://www.ted.com/talks/other_talk"
+
+OFFLINE_PAGES = {
+    TEDScraper.BASE_URL: LIST_HTML,
+    TEDScraper.BASE_URL + "?page=2": '<div class="talk-link">' + LIST_HTML.split('<div class="talk-link">')[2].replace(
+        '<a class="pagination__next" href="/talks?page=2">Next</a>', ""),
+    TALK_URL: TALK_HTML,
+    TALK_URL + "/transcript?language=en": TRANSCRIPT_HTML.format("Hello\nworld"),
+    TALK_URL + "/transcript?language=ja": TRANSCRIPT_HTML.format("Konnichiwa"),
+    OTHER_TALK_URL: TALK_HTML,
+    OTHER_TALK_URL + "/transcript?language=en": TRANSCRIPT_HTML.format("Other"),
+    OTHER_TALK_URL + "/transcript?language=ja": TRANSCRIPT_HTML.format("Hoka"),
+}
+
+
+class OfflineTEDScraper(TEDScraper):
+    """
+    TEDScraper serving the pages from OFFLINE_PAGES and counting the requests
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.fail_url = kwargs.pop("fail_url", None)
+        self.error_urls = kwargs.pop("error_urls", ())
+        self.error_status = kwargs.pop("error_status", 500)
+        self.pages = kwargs.pop("pages", OFFLINE_PAGES)
+        super().__init__(*args, **kwargs)
+        self.requested_urls = []
+
+    def _fetch_body(self, url):
+        if url == self.fail_url:
+            raise ConnectionError("connection lost: {}".format(url))
+        self.requested_urls.append(url)
+        if url in self.error_urls:
+            raise HTTPError(url, self.error_status, "HTTP Error", {}, None)
+        return self.pages[url].encode("utf-8")
 
 
 class TEDScraperTest(unittest.TestCase):
@@ -152,5 +231,478 @@ class TEDScraperTest(unittest.TestCase):
                 for v in data.values():
                     self.assertIsNot(len(v), 0)
 
+
+class TalkListingTest(unittest.TestCase):
+
+    def test_get_talk_listings(self):
+        ts = OfflineTEDScraper()
+        soup = BeautifulSoup(LIST_HTML, "lxml")
+
+        listings = ts.get_talk_listings(soup)
+        self.assertEqual(listings, [
+            TalkListing("Test talk", TALK_URL, "2017-01-01"),
+            TalkListing("Other talk", "https://www.ted.com/talks/other_talk", "2016-12-01"),
+        ])
+        self.assertEqual(ts.get_talk_titles(soup), ["Test talk", "Other talk"])
+        self.assertEqual(ts.get_talk_links(soup), [l.link for l in listings])
+        self.assertEqual(ts.get_talk_posted_date(soup), ["2017-01-01", "2016-12-01"])
+
+
+class ParserBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsers = [SoupParser(), SoupParser(strainer=True), LxmlParser()]
+
+    def assertSameOutput(self, kind, html):
+        outputs = [p.parse(kind, html.encode("utf-8"), TEDScraper.BASE_URL)
+                   for p in self.parsers]
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+        return outputs[0]
+
+    def test_list_page(self):
+        output = self.assertSameOutput("list", LIST_HTML)
+        self.assertEqual(len(output["talks"]), 2)
+        self.assertEqual(output["next_link"], "https://www.ted.com/talks?page=2")
+        self.assertEqual(output["last_page"], 2)
+
+    def test_list_page_last_page(self):
+        pagination = """
+        <div class="pagination">
+          <a class="pagination__item" href="/talks?page=2">2</a>
+          <span class="pagination__gap">...</span>
+          <a class="pagination__item" href="/talks?page=73">73</a>
+          <a class="pagination__next" href="/talks?page=2">Next</a>
+        </div>
+        """
+        output = self.assertSameOutput("list", pagination)
+        self.assertEqual(output["last_page"], 73)
+
+    def test_talk_page(self):
+        output = self.assertSameOutput("talk", TALK_HTML)
+        self.assertEqual(output["topics"], ["Education", "Creativity"])
+
+    def test_transcript_page(self):
+        output = self.assertSameOutput("transcript", OFFLINE_PAGES[TALK_URL + "/transcript?language=en"])
+        self.assertEqual(output, {
+            "transcript": ["Hello world"], "time": ["00:12"], "languages": ["en", "ja"]})
+
+    def test_transcript_page_with_script(self):
+        html = TRANSCRIPT_HTML.format(
+            "Hello <script>var x = 1;</script><style>p { color: red; }</style>world")
+        output = self.assertSameOutput("transcript", html)
+        self.assertEqual(output["transcript"], ["Hello world"])
+
+    def test_transcript_page_without_time(self):
+        html = TRANSCRIPT_HTML.replace(
+            '<data class="talk-transcript__para__time">00:12</data>', "")
+        output = self.assertSameOutput("transcript", html)
+        self.assertEqual(output["time"], ["no time data found."])
+
+
+class TalkPagesTest(unittest.TestCase):
+
+    def test_each_page_fetched_once(self):
+        ts = OfflineTEDScraper()
+        pages = TalkPages(ts, TALK_URL)
+
+        topics = pages.talk_topics()
+        transcript = ts.get_all_language_transcript(TALK_URL, pages)
+        t_time = pages.transcript_time()
+
+        self.assertEqual(topics, ["Education", "Creativity"])
+        self.assertEqual(transcript, {"en": ["Hello world"], "ja": ["Konnichiwa"]})
+        self.assertEqual(t_time, ["00:12"])
+        self.assertEqual(sorted(ts.requested_urls), [
+            TALK_URL,
+            TALK_URL + "/transcript?language=en",
+            TALK_URL + "/transcript?language=ja",
+        ])
+
+
+class TalkMetadataTest(unittest.TestCase):
+
+    def test_each_page_fetched_once(self):
+        ts = OfflineTEDScraper(max_workers=2)
+        metadata = ts.get_all_talk_metadata()
+
+        self.assertEqual(metadata, [
+            {"talk_title": "Test talk", "talk_link": TALK_URL, "posted_date": "2017-01-01",
+             "talk_topics": ["Education", "Creativity"], "page_url": TEDScraper.BASE_URL},
+            {"talk_title": "Other talk", "talk_link": OTHER_TALK_URL, "posted_date": "2016-12-01",
+             "talk_topics": ["Education", "Creativity"], "page_url": TEDScraper.BASE_URL},
+        ])
+        self.assertEqual(sorted(ts.requested_urls), sorted([
+            TEDScraper.BASE_URL, TEDScraper.BASE_URL + "?page=2", TALK_URL, OTHER_TALK_URL]))
+
+    def test_projections(self):
+        ts = OfflineTEDScraper()
+        metadata = ts.get_all_talk_metadata()
+        all_talk_links = [[TALK_URL, OTHER_TALK_URL], [OTHER_TALK_URL, "https://www.ted.com/talks/gone"]]
+        ts.requested_urls.clear()
+
+        self.assertEqual(ts.get_all_talk_titles(all_talk_links, metadata),
+                         [["Test talk", "Other talk"], ["Other talk", None]])
+        self.assertEqual(ts.get_all_talk_posted_date(metadata=metadata),
+                         [["2017-01-01", "2016-12-01"]])
+        self.assertEqual(ts.get_all_talk_topics(all_talk_links[:1], metadata),
+                         [[["Education", "Creativity"], ["Education", "Creativity"]]])
+        self.assertEqual(ts.requested_urls, [])
+
+        # crawled when not given, in the same shape
+        self.assertEqual(ts.get_all_talk_topics(all_talk_links[:1]),
+                         [[["Education", "Creativity"], ["Education", "Creativity"]]])
+        self.assertEqual(ts.get_all_talk_topics(),
+                         [[["Education", "Creativity"], ["Education", "Creativity"]]])
+
+    def test_posted_date_fetches_list_pages_once(self):
+        ts = OfflineTEDScraper()
+        all_talk_links = ts.get_all_talk_links()
+        ts.requested_urls.clear()
+
+        self.assertEqual(ts.get_all_talk_posted_date(all_talk_links),
+                         [["2017-01-01", "2016-12-01"], ["2016-12-01"]])
+        self.assertEqual(ts.requested_urls, [TEDScraper.BASE_URL, TEDScraper.BASE_URL + "?page=2"])
+
+
+class StreamingTest(unittest.TestCase):
+
+    def test_iter_talks(self):
+        ts = OfflineTEDScraper(max_workers=2)
+        talks = ts.iter_talks(all_language=True)
+
+        talk_info = next(talks)
+        self.assertEqual(talk_info["talk_link"], TALK_URL)
+        self.assertEqual(talk_info["transcript"], {"en": ["Hello world"], "ja": ["Konnichiwa"]})
+        self.assertNotIn(TEDScraper.BASE_URL + "?page=2", ts.requested_urls)
+
+        self.assertEqual([ti["talk_link"] for ti in talks], [OTHER_TALK_URL, OTHER_TALK_URL])
+
+    def test_metrics(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            ts = OfflineTEDScraper()
+            ts.dump_all_talk_info_al(save_dir)
+
+        snapshot = ts.metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["talks"], 2)
+        self.assertEqual(snapshot["latency"]["parse"]["count"], len(ts.requested_urls))
+        self.assertEqual(snapshot["latency"]["talk"]["count"], 2)
+        self.assertEqual(snapshot["latency"]["write"]["count"], 2)
+
+    def test_iter_transcripts(self):
+        ts = OfflineTEDScraper()
+        transcripts = ts.iter_transcripts([[TALK_URL], [OTHER_TALK_URL]])
+        self.assertEqual(list(transcripts), [["Hello world"], ["Other"]])
+
+
+class LanguageSelectionTest(unittest.TestCase):
+
+    def test_allow_list(self):
+        ts = OfflineTEDScraper(languages=["ja", "fr"])
+        self.assertEqual(ts.get_all_language_transcript(TALK_URL), {"ja": ["Konnichiwa"]})
+        self.assertNotIn(TALK_URL + "/transcript?language=fr", ts.requested_urls)
+
+    def test_concurrent_languages(self):
+        ts = OfflineTEDScraper(max_workers=2, language_workers=2)
+        talks = list(ts.iter_talks(all_language=True))
+        self.assertEqual(talks[0]["transcript"], {"en": ["Hello world"], "ja": ["Konnichiwa"]})
+        self.assertEqual(list(talks[0]["transcript"]), ["en", "ja"])
+
+    def test_top_languages(self):
+        lang_info = [
+            {"lang_type": "English", "lang_symbol": "en", "lang_talks": "2900"},
+            {"lang_type": "Japanese", "lang_symbol": "ja", "lang_talks": "2600"},
+            {"lang_type": "Klingon", "lang_symbol": "tlh", "lang_talks": ""},
+            {"lang_type": "French", "lang_symbol": "fr", "lang_talks": "2700"},
+        ]
+        self.assertEqual(TEDScraper.get_top_languages(2, lang_info), ["en", "fr"])
+
+
+class CountingParser(LxmlParser):
+    """
+    LxmlParser counting how many times it is pickled for the parse workers
+    """
+
+    pickled = 0
+
+    def __getstate__(self):
+        CountingParser.pickled += 1
+        return super().__getstate__()
+
+
+class ParsePoolTest(unittest.TestCase):
+
+    def test_parse_in_process_pool(self):
+        with OfflineTEDScraper(max_workers=2, parse_workers=2, parser="lxml") as ts:
+            talks = list(ts.iter_talks(all_language=True))
+
+        with OfflineTEDScraper() as ts:
+            expected = list(ts.iter_talks(all_language=True))
+
+        for talk_info in talks + expected:
+            talk_info.pop("update_date")
+        self.assertEqual(talks, expected)
+
+    def test_parser_sent_once_per_worker(self):
+        CountingParser.pickled = 0
+        with OfflineTEDScraper(parse_workers=2, parser=CountingParser()) as ts:
+            list(ts.iter_talks(all_language=True))
+        self.assertGreater(len(ts.requested_urls), 2)
+        self.assertLessEqual(CountingParser.pickled, 2)
+
+    def test_invalid_parse_workers(self):
+        with self.assertRaises(ValueError):
+            OfflineTEDScraper(parse_workers=0)
+
+
+class CompactTranscriptTest(unittest.TestCase):
+
+    def test_same_dump(self):
+        dumps = []
+        for compact in (False, True):
+            with tempfile.TemporaryDirectory() as save_dir:
+                ts = OfflineTEDScraper(compact_transcripts=compact)
+                ts.dump_all_talk_info_al(save_dir, sink=JSONLinesSink(save_dir))
+                ts.dump_talk_info(TEDScraper.BASE_URL, save_dir,
+                                  sink=JSONLinesSink(save_dir, prefix="en"))
+                dumps.append(list(read_jsonl(save_dir)) + list(read_jsonl(save_dir, prefix="en")))
+
+        self.assertEqual(dumps[0], dumps[1])
+        self.assertEqual(dumps[1][0]["transcript"], {"en": ["Hello world"], "ja": ["Konnichiwa"]})
+        self.assertEqual(dumps[1][0]["time"], ["00:12"])
+
+
+class DumpResumeTest(unittest.TestCase):
+
+    def test_resume_skips_finished_talks(self):
+        page_list = [TEDScraper.BASE_URL]
+        with tempfile.TemporaryDirectory() as save_dir:
+            # the first run dies on the second talk
+            ts = OfflineTEDScraper(fail_url=OTHER_TALK_URL)
+            with self.assertRaises(ConnectionError):
+                ts.dump_all_talk_info_al(save_dir, page_list)
+            self.assertEqual(os.listdir(save_dir).count("al-Test_talk.json"), 1)
+            self.assertNotIn("al-Other_talk.json", os.listdir(save_dir))
+
+            ts = OfflineTEDScraper()
+            ts.dump_all_talk_info_al(save_dir, resume=True)
+            self.assertIn("al-Other_talk.json", os.listdir(save_dir))
+            self.assertNotIn(TALK_URL, ts.requested_urls)
+
+            # every page is done, nothing is fetched again
+            ts = OfflineTEDScraper()
+            ts.dump_all_talk_info_al(save_dir, resume=True)
+            self.assertEqual(ts.requested_urls, [])
+
+
+class PaginationTest(unittest.TestCase):
+
+    def test_page_range_from_first_page(self):
+        ts = OfflineTEDScraper(max_workers=2)
+        pages = list(ts.iter_talk_list_pages())
+        self.assertEqual([pl for pl, _ in pages], [TEDScraper.BASE_URL, TEDScraper.BASE_URL + "?page=2"])
+        self.assertEqual(pages[1][1]["talks"][0].link, OTHER_TALK_URL)
+
+    def test_follow_next_links_if_not_recognized(self):
+        ts = OfflineTEDScraper()
+        first_page = ts.fetch_page(TEDScraper.BASE_URL, "list")
+        self.assertIsNotNone(ts._get_talk_page_range(first_page))
+
+        first_page["next_link"] = TEDScraper.BASE_URL + "?cursor=abc"
+        self.assertIsNone(ts._get_talk_page_range(first_page))
+
+        first_page["next_link"] = None
+        self.assertEqual(ts._get_talk_page_range(first_page), [])
+
+
+class DumpPipelineTest(unittest.TestCase):
+
+    def test_list_pages_are_fetched_once(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            ts = OfflineTEDScraper()
+            ts.dump_all_talk_info_al(save_dir)
+            self.assertIn("al-Test_talk.json", os.listdir(save_dir))
+            self.assertIn("al-Other_talk.json", os.listdir(save_dir))
+            self.assertEqual(ts.requested_urls.count(TEDScraper.BASE_URL), 1)
+            self.assertEqual(ts.requested_urls.count(TEDScraper.BASE_URL + "?page=2"), 1)
+
+            # the discovered pages are kept for the next run
+            ts = OfflineTEDScraper()
+            ts.dump_all_talk_info_al(save_dir, resume=True)
+            self.assertEqual(ts.requested_urls, [])
+
+    def test_dump_to_jsonl_sink(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            ts = OfflineTEDScraper()
+            with JSONLinesSink(save_dir, records_per_shard=1, compress=True) as sink:
+                ts.dump_all_talk_info_al(save_dir, sink=sink)
+
+            talks = list(read_jsonl(save_dir))
+            self.assertEqual([ti["talk_link"] for ti in talks], [TALK_URL, OTHER_TALK_URL])
+            self.assertFalse(any(f.endswith(".json") for f in os.listdir(save_dir)))
+
+            # the shards are read back by the incremental crawl
+            os.remove(os.path.join(save_dir, ".ted-scraper-checkpoint.jsonl"))
+            self.assertEqual(TEDScraper.load_known_talk_links(save_dir), {TALK_URL, OTHER_TALK_URL})
+
+
+class DistributedDumpTest(unittest.TestCase):
+
+    def test_work_queue(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            path = os.path.join(save_dir, "queue.db")
+            with WorkQueue(path, worker_id="a") as a, WorkQueue(path, worker_id="b") as b:
+                ts = OfflineTEDScraper()
+                self.assertEqual(ts.seed_work_queue(a), 2)
+                self.assertEqual(ts.requested_urls, [TEDScraper.BASE_URL])
+
+                # the first worker dies on its page, the second one takes over
+                with self.assertRaises(ConnectionError):
+                    OfflineTEDScraper(fail_url=TALK_URL).dump_queued_talk_info_al(a, save_dir)
+                self.assertEqual(OfflineTEDScraper().dump_queued_talk_info_al(b, save_dir), 2)
+                self.assertEqual(b.counts()["done"], 2)
+
+            self.assertIn("al-Test_talk.json", os.listdir(save_dir))
+            self.assertIn("al-Other_talk.json", os.listdir(save_dir))
+
+    def test_lease_lost(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            path = os.path.join(save_dir, "queue.db")
+            with WorkQueue(path, lease_time=0.05, worker_id="a") as a, \
+                    WorkQueue(path, worker_id="b") as b:
+                a.add([TEDScraper.BASE_URL])
+
+                class StalledTEDScraper(OfflineTEDScraper):
+                    def _write_talk_info(self, sink, talk_info):
+                        super()._write_talk_info(sink, talk_info)
+                        # the lease expires and the other worker claims the page
+                        time.sleep(0.1)
+                        b.claim()
+
+                self.assertEqual(StalledTEDScraper().dump_queued_talk_info_al(a, save_dir), 0)
+                self.assertEqual(b.counts()["leased"], 1)
+
+            self.assertIn("al-Test_talk.json", os.listdir(save_dir))
+            self.assertNotIn("al-Other_talk.json", os.listdir(save_dir))
+
+    def test_shards(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            for i in range(3):
+                OfflineTEDScraper().dump_all_talk_info_al(save_dir, shard=(i, 3))
+
+            self.assertIn("al-Test_talk.json", os.listdir(save_dir))
+            self.assertIn("al-Other_talk.json", os.listdir(save_dir))
+            self.assertIn(".ted-scraper-checkpoint-2of3.jsonl", os.listdir(save_dir))
+
+
+class FetchErrorTest(unittest.TestCase):
+
+    def test_list_page_error(self):
+        ts = OfflineTEDScraper(error_urls={TEDScraper.BASE_URL + "?page=2"})
+        pages = ts.iter_talk_list_pages()
+        self.assertEqual(next(pages)[0], TEDScraper.BASE_URL)
+        with self.assertRaises(PageFetchError) as cm:
+            next(pages)
+        self.assertEqual((cm.exception.url, cm.exception.status),
+                         (TEDScraper.BASE_URL + "?page=2", 500))
+
+        with tempfile.TemporaryDirectory() as save_dir:
+            ts = OfflineTEDScraper(error_urls={TEDScraper.BASE_URL})
+            with self.assertRaises(PageFetchError):
+                ts.dump_talk_info_al(TEDScraper.BASE_URL, save_dir)
+
+    def test_talk_page_error(self):
+        ts = OfflineTEDScraper(error_urls={TALK_URL}, error_status=404)
+        self.assertEqual(list(ts.iter_talk_topics([[TALK_URL, OTHER_TALK_URL]])),
+                         [[], ["Education", "Creativity"]])
+        self.assertEqual([talk["talk_topics"] for talk in ts.iter_talk_metadata()],
+                         [[], ["Education", "Creativity"]])
+
+    def test_transient_talk_page_error(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            # the retries of the session ran out on the transcript
+            ts = OfflineTEDScraper(error_urls={OTHER_TALK_URL + "/transcript?language=ja"},
+                                   error_status=503)
+            with self.assertRaises(HTTPError):
+                ts.dump_all_talk_info_al(save_dir)
+
+            self.assertIn("al-Test_talk.json", os.listdir(save_dir))
+            self.assertNotIn("al-Other_talk.json", os.listdir(save_dir))
+            with Checkpoint(save_dir) as checkpoint:
+                self.assertEqual(checkpoint.completed_talks, {TALK_URL})
+
+    def test_failed_page_is_not_claimed_again(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            path = os.path.join(save_dir, "queue.db")
+            with WorkQueue(path, worker_id="a") as a, WorkQueue(path, worker_id="b") as b:
+                OfflineTEDScraper().seed_work_queue(a)
+
+                ts = OfflineTEDScraper(error_urls={TEDScraper.BASE_URL})
+                self.assertEqual(ts.dump_queued_talk_info_al(a, save_dir), 1)
+                self.assertEqual(a.counts()["failed"], 1)
+
+                ts = OfflineTEDScraper()
+                self.assertEqual(ts.dump_queued_talk_info_al(b, save_dir), 0)
+                self.assertEqual(ts.requested_urls, [])
+
+
+class DumpNewTalksTest(unittest.TestCase):
+
+    def test_stop_at_first_known_page(self):
+        ts = OfflineTEDScraper()
+        self.assertEqual(ts.get_new_talk_listings({TALK_URL, OTHER_TALK_URL}), [])
+        self.assertEqual(ts.requested_urls, [TEDScraper.BASE_URL])
+
+        ts = OfflineTEDScraper()
+        new_listings = ts.get_new_talk_listings({OTHER_TALK_URL})
+        self.assertEqual([tl.link for tl in new_listings], [TALK_URL])
+        self.assertEqual(ts.requested_urls, [TEDScraper.BASE_URL, TEDScraper.BASE_URL + "?page=2"])
+
+    def test_pages_fetched_one_at_a_time(self):
+        pages = {}
+        for k in range(1, 5):
+            talks = "".join(
+                '<div class="talk-link"><h4 class="h9"><a href="/talks/t{}">T</a></h4>'
+                '<div class="meta"><span class="meta__val">Jan 2017</span></div></div>'.format(
+                    4 * k + i) for i in range(4))
+            pagination = "".join('<a href="/talks?page={0}">{0}</a>'.format(n) for n in range(1, 5))
+            if k < 4:
+                pagination += '<a class="pagination__next" href="/talks?page={}">Next</a>'.format(k + 1)
+            url = TEDScraper.BASE_URL + ("?page={}".format(k) if k > 1 else "")
+            pages[url] = talks + '<div class="pagination">{}</div>'.format(pagination)
+
+        # the talks of the third page are known
+        known_links = {"https://www.ted.com/talks/t{}".format(n) for n in range(12, 20)}
+        ts = OfflineTEDScraper(max_workers=4, pages=pages)
+        self.assertEqual(len(ts.get_new_talk_listings(known_links)), 8)
+        self.assertEqual(ts.requested_urls, [TEDScraper.BASE_URL] + [
+            TEDScraper.BASE_URL + "?page={}".format(k) for k in (2, 3)])
+
+    def test_known_links_of_checkpoint_and_files(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            with open(os.path.join(save_dir, "al-Other_talk.json"), "w") as f:
+                json.dump({"talk_link": OTHER_TALK_URL}, f)
+            # a full crawl restarted the checkpoint and died on its first talk
+            with Checkpoint(save_dir) as checkpoint:
+                checkpoint.mark_talk_done(TALK_URL)
+
+            self.assertEqual(TEDScraper.load_known_talk_links(save_dir),
+                             {TALK_URL, OTHER_TALK_URL})
+
+    def test_dump_new_talk_info_al(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            with open(os.path.join(save_dir, "al-Other_talk.json"), "w") as f:
+                json.dump({"talk_link": OTHER_TALK_URL}, f)
+
+            ts = OfflineTEDScraper()
+            ts.dump_new_talk_info_al(save_dir)
+            self.assertIn("al-Test_talk.json", os.listdir(save_dir))
+            self.assertNotIn(OTHER_TALK_URL, ts.requested_urls)
+
+            # the new talk is known from the checkpoint on the next run
+            self.assertEqual(TEDScraper.load_known_talk_links(save_dir),
+                             {TALK_URL, OTHER_TALK_URL})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.session import HTTPSession
+from ted_talks.archive import ArchiveWriter, iter_records
+from ted_talks.cache import HTTPCache
+from ted_talks.ratelimit import RateLimiter, RetryPolicy
+
+import unittest
+import gzip
+import os
+import tempfile
+import threading
+import zlib
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.error import HTTPError
+
+BODY = b"<html><body><p>hello TED</p></body></html>"
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    requests = []
+    busy_count = 0
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        Handler.requests.append(self.path)
+
+        if self.path == "/talks/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", str(len(BODY)))
+                self.end_headers()
+                self.wfile.write(BODY)
+        elif self.path == "/busy":
+            # throttled twice before serving the page
+            Handler.busy_count += 1
+            if Handler.busy_count <= 2:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self._send(200, BODY)
+        elif self.path == "/missing":
+            self._send(404, b"not found")
+        elif self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/gzip")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/gzip":
+            self._send(200, gzip.compress(BODY), "gzip")
+        elif self.path == "/deflate":
+            self._send(200, zlib.compress(BODY), "deflate")
+        else:
+            self._send(200, BODY)
+
+    def _send(self, status, body, encoding=None):
+        self.send_response(status)
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPSessionTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), Handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = "http://127.0.0.1:{}".format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.session = HTTPSession(connect_timeout=2, read_timeout=2)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_plain(self):
+        res = self.session.get(self.base_url + "/plain")
+        self.assertEqual(res.status, 200)
+        self.assertEqual(res.body, BODY)
+
+    def test_gzip_and_deflate(self):
+        res = self.session.get(self.base_url + "/gzip")
+        self.assertEqual(res.body, BODY)
+        self.assertEqual(res.wire_size, len(gzip.compress(BODY)))
+        self.assertEqual(self.session.get(self.base_url + "/deflate").body, BODY)
+
+    def test_redirect(self):
+        res = self.session.get(self.base_url + "/redirect")
+        self.assertEqual(res.url, self.base_url + "/gzip")
+        self.assertEqual(res.body, BODY)
+
+    def test_http_error(self):
+        with self.assertRaises(HTTPError) as cm:
+            self.session.get(self.base_url + "/missing")
+        self.assertEqual(cm.exception.code, 404)
+
+    def test_keep_alive(self):
+        Handler.connections.clear()
+        for _ in range(5):
+            self.session.get(self.base_url + "/plain")
+        self.assertEqual(len(Handler.connections), 1)
+
+    def test_cache_revalidation(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HTTPCache(cache_dir, ttl={"talk": 60})
+            archive = ArchiveWriter(os.path.join(cache_dir, "crawl.warc.gz"))
+            session = HTTPSession(cache=cache, archive=archive)
+            url = self.base_url + "/talks/etag"
+
+            Handler.requests.clear()
+            self.assertFalse(session.get(url).from_cache)
+            res = session.get(url)
+            self.assertTrue(res.from_cache)
+            self.assertEqual(res.body, BODY)
+            self.assertEqual(res.wire_size, 0)
+            self.assertEqual(len(Handler.requests), 1)
+
+            # expire the entry and revalidate it
+            cache.ttl["talk"] = 0
+            res = session.get(url)
+            self.assertTrue(res.from_cache)
+            self.assertEqual(res.body, BODY)
+            self.assertEqual(len(Handler.requests), 2)
+            session.close()
+
+            # the pages served by the cache are archived too
+            archive.close()
+            records = list(iter_records(archive.path))
+            self.assertEqual([r.body for r in records], [BODY] * 3)
+
+    def test_throttle_and_retry(self):
+        Handler.busy_count = 0
+        limiter = RateLimiter(rate=100.0, max_rate=200.0)
+        session = HTTPSession(rate_limiter=limiter, retry=RetryPolicy(backoff=0.01))
+
+        res = session.get(self.base_url + "/busy")
+        self.assertEqual(res.body, BODY)
+        self.assertEqual(Handler.busy_count, 3)
+        # halved twice, then increased once
+        self.assertAlmostEqual(limiter.get_rate(self.base_url), 25.1)
+
+        # 404 is not transient
+        Handler.requests.clear()
+        with self.assertRaises(HTTPError):
+            session.get(self.base_url + "/missing")
+        self.assertEqual(Handler.requests, ["/missing"])
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.sinks import JSONFileSink, JSONLinesSink, SQLiteSink, list_shards, read_jsonl
+
+import unittest
+import os
+import json
+import tempfile
+
+
+def make_talk_info(i):
+    return {"talk_title": "Talk {}/{}".format(i, i), "talk_link": "https://www.ted.com/talks/{}".format(i)}
+
+
+class JSONFileSinkTest(unittest.TestCase):
+
+    def test_file_per_talk(self):
+        with tempfile.TemporaryDirectory() as save_dir:
+            with JSONFileSink(save_dir, all_language=True) as sink:
+                sink.write(make_talk_info(1))
+
+            self.assertEqual(os.listdir(save_dir), ["al-Talk_1_1.json"])
+            with open(os.path.join(save_dir, "al-Talk_1_1.json")) as f:
+                self.assertEqual(json.load(f), make_talk_info(1))
+
+
+class JSONLinesSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_rotate_shards(self):
+        with JSONLinesSink(self.save_dir, records_per_shard=2) as sink:
+            for i in range(5):
+                sink.write(make_talk_info(i))
+
+        shards = [os.path.basename(s) for s in list_shards(self.save_dir)]
+        self.assertEqual(shards, ["talks-00000.jsonl", "talks-00001.jsonl", "talks-00002.jsonl"])
+        self.assertEqual(list(read_jsonl(self.save_dir)), [make_talk_info(i) for i in range(5)])
+
+        with open(os.path.join(self.save_dir, "talks-00000.jsonl")) as f:
+            self.assertNotIn(", ", f.readline())
+
+    def test_gzip_and_append(self):
+        with JSONLinesSink(self.save_dir, compress=True) as sink:
+            sink.write(make_talk_info(0))
+
+        # a new sink never overwrites the shards of a previous run
+        with JSONLinesSink(self.save_dir, compress=True) as sink:
+            sink.write(make_talk_info(1))
+
+        shards = [os.path.basename(s) for s in list_shards(self.save_dir)]
+        self.assertEqual(shards, ["talks-00000.jsonl.gz", "talks-00001.jsonl.gz"])
+        self.assertEqual(list(read_jsonl(self.save_dir)), [make_talk_info(0), make_talk_info(1)])
+
+    def test_truncated_line_is_skipped(self):
+        with JSONLinesSink(self.save_dir) as sink:
+            sink.write(make_talk_info(0))
+
+        with open(os.path.join(self.save_dir, "talks-00000.jsonl"), "a") as f:
+            f.write('{"talk_title": "Ta')
+
+        self.assertEqual(list(read_jsonl(self.save_dir)), [make_talk_info(0)])
+
+
+class SQLiteSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "talks.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_query_and_upsert(self):
+        talk_info = {
+            "talk_title": "Talk 1", "talk_link": "https://www.ted.com/talks/1",
+            "posted_date": "2017-01-01", "talk_topics": ["Education"],
+            "transcript": {"en": ["Hello", "world"], "ja": ["Konnichiwa"]},
+            "time": ["00:12", "no time data found."],
+        }
+        other_info = {
+            "talk_title": "Talk 2", "talk_link": "https://www.ted.com/talks/2",
+            "posted_date": "2016-12-01", "talk_lang": "en", "talk_topics": ["Science"],
+            "transcript": ["Other"], "time": ["00:05"],
+        }
+
+        with SQLiteSink(self.path) as sink:
+            sink.write(talk_info)
+            sink.write(other_info)
+
+        with SQLiteSink(self.path) as sink:
+            self.assertEqual(sink.find_talks(language="ja"), ["https://www.ted.com/talks/1"])
+            self.assertEqual(sink.find_talks(topic="Science"), ["https://www.ted.com/talks/2"])
+            self.assertEqual(sink.find_talks(language="en", posted_since="2017-01-01"),
+                             ["https://www.ted.com/talks/1"])
+            self.assertEqual(len(sink.find_talks()), 2)
+
+            rows = sink.conn.execute(
+                "SELECT time FROM transcripts WHERE talk_link = ? AND language = 'en' "
+                "ORDER BY para_num", (talk_info["talk_link"],)).fetchall()
+            self.assertEqual(rows, [("00:12",), (None,)])
+
+            # a re-scrape replaces the rows of the talk
+            talk_info["transcript"] = {"en": ["Hello again"]}
+            talk_info["talk_topics"] = ["Science"]
+            sink.write(talk_info)
+            self.assertEqual(sink.get_transcript(talk_info["talk_link"], "en"), ["Hello again"])
+            self.assertEqual(sink.find_talks(language="ja"), [])
+            self.assertEqual(len(sink.find_talks(topic="Science")), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
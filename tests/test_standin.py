@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.scraper import TEDScraper
+from ted_talks.parsers import SoupParser, LxmlParser, NO_TIME_DATA
+from ted_talks.ratelimit import RetryPolicy
+from ted_talks.session import HTTPSession
+from tests.standin import StandInTEDServer, load_fixtures
+
+import unittest
+import os
+import json
+import tempfile
+
+
+class StandInServerTest(unittest.TestCase):
+    """
+    End-to-end scraping of the fixture pages served by the stand-in server
+    """
+
+    def test_dump_all_talk_info_al(self):
+        with StandInTEDServer() as server, tempfile.TemporaryDirectory() as save_dir:
+            ts = TEDScraper(max_workers=4, base_url=server.base_url, session=HTTPSession())
+            ts.dump_all_talk_info_al(save_dir)
+
+            filenames = sorted(f for f in os.listdir(save_dir) if f.endswith(".json"))
+            self.assertEqual(len(filenames), 6)
+            with open(os.path.join(save_dir, "al-Do_schools_kill_creativity?.json")) as f:
+                talk_info = json.load(f)
+
+        self.assertEqual(talk_info["posted_date"], "2006-02-01")
+        self.assertEqual(talk_info["talk_topics"], ["Education", "Creativity", "Culture"])
+        self.assertEqual(list(talk_info["transcript"]), ["en", "ja", "fr"])
+        self.assertEqual(len(talk_info["time"]), len(talk_info["transcript"]["en"]))
+
+        # each list page is fetched once
+        self.assertEqual(server.requests.count("/talks"), 1)
+        self.assertEqual(server.requests.count("/talks?page=2"), 1)
+
+    def test_retry_injected_errors(self):
+        with StandInTEDServer(error_rate=0.3, seed=1) as server:
+            session = HTTPSession(retry=RetryPolicy(max_retries=10, backoff=0.001))
+            ts = TEDScraper(max_workers=2, base_url=server.base_url, session=session)
+            talks = list(ts.iter_talks())
+
+        self.assertGreater(server.errors, 0)
+        self.assertEqual(len(talks), 6)
+        self.assertEqual(talks[-1]["time"][-1], NO_TIME_DATA)
+
+    def test_get_languages(self):
+        with StandInTEDServer() as server:
+            lang_info = TEDScraper.get_languages(server.lang_url, HTTPSession())
+
+        self.assertEqual(lang_info[0], {"lang_type": "English", "lang_symbol": "en", "lang_talks": "2918"})
+        self.assertEqual(TEDScraper.get_top_languages(2, lang_info), ["en", "fr"])
+
+
+class FixturePagesTest(unittest.TestCase):
+
+    def test_parser_backends_agree(self):
+        parsers = [SoupParser(), SoupParser(strainer=True), LxmlParser()]
+        for path, html in load_fixtures().items():
+            if path.startswith("/talks?") or path == "/talks":
+                kind = "list"
+            elif "/transcript" in path:
+                kind = "transcript"
+            elif path.startswith("/talks/"):
+                kind = "talk"
+            else:
+                continue
+
+            outputs = [p.parse(kind, html, TEDScraper.BASE_URL) for p in parsers]
+            for output in outputs[1:]:
+                self.assertEqual(output, outputs[0], path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.parsers import NO_TIME_DATA
+from ted_talks.transcript import Transcript, parse_time, format_time, json_default
+
+import unittest
+import json
+import pickle
+
+
+class TimeTest(unittest.TestCase):
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time("0:12"), 12000)
+        self.assertEqual(parse_time("00:12"), 12000)
+        self.assertEqual(parse_time("12:34"), 754000)
+        self.assertEqual(parse_time("1:02:03"), 3723000)
+        self.assertIsNone(parse_time(NO_TIME_DATA))
+        self.assertIsNone(parse_time("1:2"))
+
+    def test_format_time(self):
+        self.assertEqual(format_time(12000), "0:12")
+        self.assertEqual(format_time(12000, minute_width=2), "00:12")
+        self.assertEqual(format_time(3723000), "1:02:03")
+
+
+class TranscriptTest(unittest.TestCase):
+
+    def test_accessors(self):
+        tr = Transcript(["Hello", "", "wörld 日本"], ["0:12", "0:35", "1:02:03"])
+
+        self.assertEqual(len(tr), 3)
+        self.assertEqual(tr[0], "Hello")
+        self.assertEqual(tr[-1], "wörld 日本")
+        self.assertEqual(tr[1:], ["", "wörld 日本"])
+        self.assertEqual(list(tr), ["Hello", "", "wörld 日本"])
+        self.assertEqual(tr.text, "Hellowörld 日本")
+        self.assertEqual(tr.get_time_ms(1), 35000)
+        self.assertEqual(tr.get_time(2), "1:02:03")
+        with self.assertRaises(IndexError):
+            tr[3]
+
+    def test_lossless_json(self):
+        cases = [
+            (["a", "b"], ["00:12", "00:35"]),
+            (["a", "b", "c"], ["0:12", NO_TIME_DATA]),
+            (["a"], [NO_TIME_DATA]),
+            (["a", "b"], ["0:12", "junk"]),
+            (["a", "b"], ["0:12", "00:35"]),
+            ([], []),
+        ]
+        for paragraphs, times in cases:
+            tr = Transcript(paragraphs, times)
+            data = tr.to_json()
+            self.assertEqual(data, {"transcript": paragraphs, "time": times})
+            self.assertEqual(Transcript.from_json(json.loads(json.dumps(data))), tr)
+
+    def test_missing_times(self):
+        tr = Transcript(["a", "b", "c"], ["0:12", NO_TIME_DATA])
+        self.assertTrue(tr.has_time())
+        self.assertEqual(tr.get_time(0), "0:12")
+        self.assertIsNone(tr.get_time(1))
+        self.assertFalse(Transcript(["a"]).has_time())
+
+    def test_pickle_and_json_default(self):
+        tr = Transcript(["a", "b"], ["0:12", "0:35"])
+        self.assertEqual(pickle.loads(pickle.dumps(tr)), tr)
+        self.assertEqual(json.dumps({"transcript": tr}, default=json_default),
+                         '{"transcript": ["a", "b"]}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+from ted_talks.workqueue import WorkQueue, parse_shard, in_shard
+
+import unittest
+import os
+import tempfile
+import time
+
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "queue.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_claim_in_order_once(self):
+        with WorkQueue(self.path, worker_id="a") as a, WorkQueue(self.path, worker_id="b") as b:
+            a.add(["p1", "p2"])
+            b.add(["p1", "p2"])
+
+            self.assertEqual(a.claim(), "p1")
+            self.assertEqual(b.claim(), "p2")
+            self.assertIsNone(a.claim())
+
+            self.assertTrue(a.complete("p1"))
+            self.assertFalse(a.complete("p2"))
+            self.assertEqual(a.counts(), {"pending": 0, "leased": 1, "done": 1, "failed": 0})
+
+    def test_expired_lease_is_claimed_again(self):
+        with WorkQueue(self.path, lease_time=0.05, worker_id="dead") as dead, \
+                WorkQueue(self.path, worker_id="alive") as alive:
+            dead.add(["p1"])
+            self.assertEqual(dead.claim(), "p1")
+            self.assertIsNone(alive.claim())
+
+            time.sleep(0.1)
+            self.assertEqual(alive.claim(), "p1")
+            self.assertFalse(dead.complete("p1"))
+            self.assertTrue(alive.complete("p1"))
+
+    def test_release(self):
+        with WorkQueue(self.path) as queue:
+            queue.add(["p1"])
+            queue.claim()
+            queue.release("p1")
+            self.assertEqual(queue.claim(), "p1")
+
+    def test_fail(self):
+        with WorkQueue(self.path) as queue:
+            queue.add(["p1", "p2"])
+            self.assertEqual(queue.claim(), "p1")
+            self.assertTrue(queue.fail("p1"))
+            self.assertEqual(queue.claim(), "p2")
+            self.assertIsNone(queue.claim())
+            self.assertEqual(queue.counts()["failed"], 1)
+
+
+class ShardTest(unittest.TestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("1/4"), (1, 4))
+        for shard in ["4/4", "1", "a/b", "0/0"]:
+            with self.assertRaises(ValueError):
+                parse_shard(shard)
+
+    def test_partition(self):
+        keys = ["https://www.ted.com/talks/{}".format(i) for i in range(100)]
+        shards = [[k for k in keys if in_shard(k, (i, 3))] for i in range(3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(keys))
+        self.assertTrue(all(len(shard) > 0 for shard in shards))
+
+
+if __name__ == '__main__':
+    unittest.main()